@@ -10,89 +10,226 @@
 """
 
 import pandas as pd
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
-from openpyxl.formatting.rule import ColorScaleRule, CellIsRule, FormulaRule
+from openpyxl.formatting.rule import ColorScaleRule, CellIsRule, FormulaRule, DataBarRule, Rule
+from openpyxl.styles.differential import DifferentialStyle
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.worksheet.table import Table, TableStyleInfo
 from openpyxl.chart import BarChart, LineChart, PieChart, Reference
 from openpyxl.drawing.image import Image
+from openpyxl.worksheet.hyperlink import Hyperlink
+from openpyxl.cell.cell import MergedCell
 from datetime import datetime, timedelta
 import json
-from jinja2 import Template
+import math
+import re
 import tempfile
 import os
+import queue
+import signal
+import multiprocessing
 import requests
+from contextlib import nullcontext
 import base64
 from io import BytesIO
 from PIL import Image as PILImage, ImageDraw, ImageFont
+from itertools import chain, islice
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from excel_utils import EXCEL_MAX_ROWS, COLUMN_LETTERS, range_address
+from pivot_engine import group_rows
+from downsampling import DOWNSAMPLING_METHODS, downsample_indices
+from chart_layout import ChartGridLayout, cm_to_emu, make_anchor, resolve_anchor_column
+from section_cache import SectionCache, capture_fragment, replay_fragment
+from data_providers import needs_resolving, resolve_section_data
+from data_sources import FileSource, attach_sources
+from report_writers import RowStoreWriter, create_writer
+from fast_xlsx_writer import TABLE_ROW_STYLES, SharedStringPool
+from style_registry import get_style_registry, style_key
+from template_environment import DATA_REFERENCE_PATTERN, get_template_environment, lookup_data_reference
+from workbook_templates import WorkbookTemplate, load_workbook_template
+from report_progress import DEFAULT_PROGRESS_INTERVAL, ProgressTracker, ReportCancelledError, image_size
+from report_profiler import DEFAULT_SAMPLE_INTERVAL, ReportProfiler
+
+
+# Максимальная длина имени листа и запрещенные в нем символы
+SHEET_TITLE_MAX_LENGTH = 31
+SHEET_TITLE_INVALID_CHARS = '[]:*?/\\'
+
+# Размер порции строк, из которой строится DataFrame при записи таблиц
+TABLE_CHUNK_SIZE = 50000
+
+# Типы секций, данные которых читаются потоково (остальные получают строки списком)
+STREAMING_SECTION_TYPES = ('table', 'pivot')
+
+# Значения enabled, выключающие секцию (например, подставленные из шаблона строкой)
+DISABLED_SECTION_VALUES = ('false', '0', '', 'no', 'none', 'off')
+
+# Первая строка данных секции на листе-продолжении (строка 1 - заголовок)
+CONTINUATION_FIRST_ROW = 2
+
+# Доля различных значений, до которой текстовая колонка хранится общими строками
+SHARED_STRINGS_MAX_UNIQUE_RATIO = 0.5
+
+# Функции итогов: номер функции SUBTOTAL, функция Excel, агрегация pandas
+SUBTOTAL_FUNCTIONS = {
+    'sum': (9, 'SUM', 'sum'),
+    'average': (1, 'AVERAGE', 'mean'),
+    'count': (2, 'COUNT', 'count'),
+    'counta': (3, 'COUNTA', 'counta'),
+    'max': (4, 'MAX', 'max'),
+    'min': (5, 'MIN', 'min'),
+    'stdev': (7, 'STDEV', 'std'),
+    'var': (10, 'VAR', 'var'),
+}
+
+# Накопитель значений группы сводки: сумма, количество чисел, количество значений,
+# минимум, максимум, среднее и сумма квадратов отклонений (для stdev и var)
+PIVOT_ACCUMULATOR = (0, 0, 0, None, None, 0.0, 0.0)
+
+# Максимум уровней группировки сводки: уровень 1 занимает секция, Excel допускает 7
+MAX_PIVOT_LEVELS = 6
+
+# Предельный объем изображений, добавляемых рендерером в image_cache при загрузке по URL, МБ
+IMAGE_CACHE_MAX_MB = 64
+
+# Бюджет точек графика: более длинные ряды прореживаются
+CHART_MAX_POINTS = 2000
+
+# Размер графика по умолчанию и промежуток между графиками сетки, см
+CHART_WIDTH_CM = 15
+CHART_HEIGHT_CM = 10
+CHART_GAP_CM = 0.5
+
+# Имя скрытого листа с данными графиков
+CHART_DATA_SHEET_TITLE = "Данные графиков"
+
+# Условное форматирование по умолчанию: цветовая шкала для числовых колонок
+DEFAULT_CONDITIONAL_FORMATTING = [{"type": "color_scale", "columns": "numeric"}]
+
+# Типы секций, которые отрисовываются в параллельных процессах (не ссылаются на другие секции)
+PARALLEL_SECTION_TYPES = ('table', 'grouped_data', 'pivot')
+
+# Ожидание PID процесса пула при отмене отчета (процесс еще запускается), секунды
+WORKER_START_TIMEOUT = 5
 
 
 class AdvancedExcelRenderer:
     """Расширенный рендерер Excel с продвинутыми возможностями"""
     
-    def __init__(self):
+    def __init__(self, max_rows_per_sheet=None, sheet_per_section=False, section_cache=None, image_cache=None,
+                 engine=None, section_workers=1, memory_budget_mb=None, style_registry=None, progress=None,
+                 progress_interval=DEFAULT_PROGRESS_INTERVAL, cancel_token=None, profile=False,
+                 profile_interval=DEFAULT_SAMPLE_INTERVAL):
+        """
+        Args:
+            max_rows_per_sheet: Максимум строк на листе, после которого секции
+                переносятся на листы-продолжения (по умолчанию - лимит Excel)
+            sheet_per_section: Размещать каждую секцию на отдельном листе
+                с листом-оглавлением
+            section_cache: SectionCache или путь к папке кеша отрисованных секций -
+                неизменившиеся секции не отрисовываются заново
+            image_cache: Словарь {URL: содержимое изображения или None} с заранее
+                загруженными изображениями; пополняется загрузками рендерера
+                (не более IMAGE_CACHE_MAX_MB)
+            engine: Бэкенд записи: "openpyxl", "fast" (строки данных таблиц и групп
+                пишутся в обход объектов Cell openpyxl), "xlsxwriter" (книга
+                записывается xlsxwriter в режиме constant_memory) или экземпляр ReportWriter
+                (по умолчанию "openpyxl", а с memory_budget_mb или section_workers - "fast")
+            section_workers: Процессов для параллельной отрисовки секций table,
+                grouped_data и pivot (1 - секции отрисовываются последовательно;
+                с движком openpyxl параллельная отрисовка не используется)
+            memory_budget_mb: Лимит памяти строк данных в МБ: при превышении готовые
+                строки выгружаются во временные файлы и читаются оттуда при сохранении
+            style_registry: StyleRegistry с именованными стилями книг
+                (по умолчанию - общий реестр процесса)
+            progress: Функция прогресса: получает словарь с номером секции, записанными
+                строками, объемом изображений и оценкой оставшегося времени
+            progress_interval: Строк данных между вызовами progress и проверками отмены
+            cancel_token: CancellationToken - отмененный отчет прерывается
+                исключением ReportCancelledError
+            profile: Профилировать построение каждого отчета: профиль доступен
+                в атрибуте profiler, а save_report записывает его рядом с файлом отчета
+            profile_interval: Интервал выборок стека профиля, секунды
+        """
+        section_workers = max(1, int(section_workers or 1))
+        if engine is None:
+            engine = 'fast' if memory_budget_mb or section_workers > 1 else 'openpyxl'
+        self.writer = create_writer(engine)
+        if memory_budget_mb:
+            if isinstance(self.writer, RowStoreWriter):
+                self.writer.memory_budget_mb = memory_budget_mb
+            else:
+                print(f"Предупреждение: memory_budget_mb не поддерживается движком '{self.writer.name}' "
+                      f"- строки хранятся в памяти")
+        
         self.wb = None
         self.ws = None
-        self.styles_created = False
+        self.style_registry = style_registry if style_registry is not None else get_style_registry()
+        self._styles_workbook = None
+        self._report_styles = {}
+        self._style_names = {}
+        self.max_rows_per_sheet = min(max_rows_per_sheet or EXCEL_MAX_ROWS, EXCEL_MAX_ROWS)
+        self.sheet_per_section = sheet_per_section
+        self.section_cache = SectionCache(section_cache) if isinstance(section_cache, str) else section_cache
+        self._fragment_recording = None
+        self.image_cache = image_cache if image_cache is not None else {}
+        self._image_cache_bytes = 0
+        self._table_count = 0
+        self._cf_plan = {}
+        self._cf_plan_key = None
+        self._cached_values = {}
+        self._data_sections = {}
+        self._chart_data_ws = None
+        self._chart_data_sheets = []
+        self._chart_data_row = 1
+        self._chart_anchors = []
+        self._base_titles = {}
+        self.engine = self.writer.name
+        self.section_workers = section_workers
+        if section_workers > 1 and not isinstance(self.writer, RowStoreWriter):
+            # Фрагменты процессов вставляются ячейками openpyxl - не быстрее последовательной отрисовки
+            print(f"Предупреждение: параллельная отрисовка секций не поддерживается движком '{self.writer.name}' "
+                  f"- секции отрисовываются последовательно")
+            self.section_workers = 1
+        self._prepared_fragments = {}
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.cancel_token = cancel_token
+        self._progress = ProgressTracker()
+        self.profile = profile
+        self.profile_interval = profile_interval
+        self.profiler = None
         
     def create_styles(self):
-        """Создание именованных стилей"""
-        if self.styles_created:
+        """Подключение именованных стилей реестра и стилей отчета к текущей книге"""
+        if self._styles_workbook is self.wb:
             return
             
-        # Стиль заголовка
-        header_style = NamedStyle(name="header_style")
-        header_style.font = Font(bold=True, size=14, color="FFFFFF")
-        header_style.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_style.alignment = Alignment(horizontal="center", vertical="center")
-        header_style.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        # Объекты стилей строятся реестром один раз на процесс
+        self._style_names = self.style_registry.attach(self.wb, self._report_styles)
+        self._styles_workbook = self.wb
         
-        # Стиль подзаголовка
-        subheader_style = NamedStyle(name="subheader_style")
-        subheader_style.font = Font(bold=True, size=12, color="000000")
-        subheader_style.fill = PatternFill(start_color="D9E2F3", end_color="D9E2F3", fill_type="solid")
-        subheader_style.alignment = Alignment(horizontal="left", vertical="center")
-        
-        # Стиль данных
-        data_style = NamedStyle(name="data_style")
-        data_style.font = Font(size=10)
-        data_style.alignment = Alignment(horizontal="left", vertical="center")
-        data_style.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Стиль числовых данных
-        number_style = NamedStyle(name="number_style")
-        number_style.font = Font(size=10)
-        number_style.alignment = Alignment(horizontal="right", vertical="center")
-        number_style.number_format = '#,##0.00'
-        number_style.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+    def _row_styles(self, section_data):
+        """
+        Имена стилей книги для чисел и остальных значений строк данных секции
         
-        # Добавляем стили в книгу
-        try:
-            self.wb.add_named_style(header_style)
-            self.wb.add_named_style(subheader_style)
-            self.wb.add_named_style(data_style)
-            self.wb.add_named_style(number_style)
-        except ValueError:
-            # Стили уже существуют
-            pass
-            
-        self.styles_created = True
+        Стили задаются в секции: "row_styles": {"number": "money", "text": "data_style"} -
+        имена стилей отчета (ключ "styles" данных отчета) или реестра.
+        """
+        row_styles = section_data.get('row_styles')
+        if not row_styles:
+            return TABLE_ROW_STYLES
+        
+        styles = []
+        for role, default in zip(('number', 'text'), TABLE_ROW_STYLES):
+            name = row_styles.get(role, default)
+            if name not in self._style_names:
+                print(f"Предупреждение: неизвестный стиль '{name}' в секции '{section_data.get('title', '')}'")
+                name = default
+            styles.append(self._style_names.get(name, name))
+        return tuple(styles)
     
     def create_collapsible_report(self, data, template_config=None):
         """
@@ -101,13 +238,38 @@ class AdvancedExcelRenderer:
         Args:
             data: Данные для отчета
             template_config: Конфигурация шаблона
-        """
-        self.wb = Workbook()
-        self.ws = self.wb.active
-        self.ws.title = "Сложный отчет"
         
-        self.create_styles()
+        Raises:
+            ReportCancelledError: Отчет отменен через cancel_token (книга не сохраняется)
+        """
+        self._start_profile()
+        with self._measure('render'):
+            self._start_workbook(data.get('styles'))
+            try:
+                return self._build_report(data)
+            except ReportCancelledError:
+                self._discard_workbook()
+                raise
+    
+    def _start_profile(self):
+        """Новый профиль для очередного отчета (при profile=True)"""
+        if self.profile:
+            method_classes = [cls.__name__ for cls in type(self).__mro__ if cls is not object]
+            self.profiler = ReportProfiler(self.profile_interval, method_classes)
+    
+    def _measure(self, phase):
+        """Профилирование этапа построения, выполняемого вызвавшим методом"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.measure(phase, depth=2)
+    
+    def _profile_section(self, section_data):
+        """Выборки профиля относятся к типу секции section_data (None - вне секций)"""
+        if self.profiler is not None:
+            self.profiler.section = section_data.get('type', 'table') if section_data is not None else None
         
+    def _build_report(self, data):
+        """Заголовок, метрики, секции и оформление новой книги"""
         current_row = 1
         
         # Заголовок отчета
@@ -119,14 +281,308 @@ class AdvancedExcelRenderer:
         
         # Детальные секции (сворачиваемые)
         if 'sections' in data:
-            for section in data['sections']:
-                current_row = self._add_collapsible_section(section, current_row)
+            # Выключенные секции пропускаются - их ленивые данные не читаются
+            sections = [section for section in data['sections'] if self._section_enabled(section)]
+            self._progress.start(len(sections), self._estimate_rows(sections))
+            if self.sheet_per_section:
+                current_row = self._add_sections_on_sheets(sections, current_row)
+            elif self.section_workers > 1:
+                current_row = self._add_sections_parallel(sections, current_row)
+            else:
+                for section in sections:
+                    current_row = self._render_section(section, current_row)
+            self._profile_section(None)
+        
+        # Листы с данными графиков - последние в книге
+        for data_ws in self._chart_data_sheets:
+            worksheets = self.wb.worksheets
+            self.wb.move_sheet(data_ws, len(worksheets) - 1 - worksheets.index(data_ws))
         
         # Добавляем автофильтры и форматирование
+        self._apply_conditional_formatting()
         self._apply_advanced_formatting()
+        self._apply_chart_layout()
         
         return self.wb
     
+    def _start_workbook(self, report_styles=None, workbook=None):
+        """
+        Новая книга с именованными стилями (и стилями отчета {имя: описание}) и сброс состояния отрисовки
+        
+        Args:
+            workbook: Готовая книга (копия книги-шаблона) - стили в нее не подключаются
+        """
+        self._report_styles = report_styles or {}
+        if workbook is None:
+            self.wb = Workbook()
+            self.ws = self.wb.active
+            self.ws.title = "Сложный отчет"
+        else:
+            self.wb = workbook
+            self.ws = workbook.active
+        self._table_count = 0
+        self._cf_plan = {}
+        self._cf_plan_key = None
+        self._cached_values = {}
+        self._data_sections = {}
+        self._chart_data_ws = None
+        self._chart_data_sheets = []
+        self._chart_data_row = 1
+        self._chart_anchors = []
+        self._base_titles = {}
+        self._prepared_fragments = {}
+        self._progress = ProgressTracker(self.progress, self.progress_interval, self.cancel_token)
+        self.writer.reset()
+        
+        if workbook is None:
+            self.create_styles()
+    
+    def _discard_workbook(self):
+        """Освобождение книги и хранилищ строк прерванного отчета"""
+        self.writer.reset()
+        self.wb = self.ws = None
+        self._cached_values = {}
+        self._data_sections = {}
+        self._chart_data_ws = None
+        self._chart_data_sheets = []
+        self._chart_anchors = []
+        self._base_titles = {}
+        self._prepared_fragments = {}
+    
+    @staticmethod
+    def _estimate_rows(sections):
+        """Оценка строк данных секций для прогресса (None - данные части секций читаются потоком)"""
+        total = 0
+        for section in sections:
+            section_type = section.get('type', 'table')
+            if section_type in ('table', 'pivot'):
+                items = [section]
+            elif section_type == 'grouped_data':
+                groups = section.get('groups')
+                items = [group for group in groups if isinstance(group, dict)] if isinstance(groups, list) else []
+            else:
+                continue
+            
+            for item in items:
+                data = item.get('data')
+                if isinstance(data, (list, pd.DataFrame)):
+                    total += len(data)
+                elif data is not None or item.get('source') is not None:
+                    return None
+        return total
+    
+    def _add_sections_parallel(self, sections, start_row):
+        """
+        Отрисовка секций с подготовкой независимых секций в параллельных процессах
+        
+        Секции PARALLEL_SECTION_TYPES отрисовываются в процессах пула на отдельных
+        книгах и возвращаются фрагментами. Фрагменты вставляются на лист в порядке
+        секций по мере готовности: строка каждой секции - следующая за предыдущей.
+        Графики, изображения, секции с SQL-источниками и фрагменты, которые
+        не помещаются на лист, отрисовываются здесь последовательно.
+        """
+        current_row = start_row
+        parallel = [self._parallel_eligible(section) and not self._section_cached(section) for section in sections]
+        workers = min(self.section_workers, sum(parallel))
+        if not workers:
+            for section in sections:
+                current_row = self._render_section(section, current_row)
+            return current_row
+        
+        # Секции передаются процессам один раз при запуске (при fork - без сериализации),
+        # задача процесса - только номер секции. Процессы сообщают свои PID для остановки при отмене.
+        context = multiprocessing.get_context()
+        worker_pids = context.Queue()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_section_worker,
+                                 initargs=(worker_pids, sections, self.max_rows_per_sheet, self.style_registry,
+                                           {name: spec for name, spec in self._report_styles.items()
+                                            if name in self._style_names})) as executor:
+            futures = [
+                executor.submit(_render_section_fragment, index) if eligible else None
+                for index, eligible in enumerate(parallel)
+            ]
+            
+            try:
+                for section, future in zip(sections, futures):
+                    if future is not None:
+                        self._progress.notify()
+                        self._profile_section(section)
+                        self._prepared_fragments[id(section)] = future.result()
+                    current_row = self._render_section(section, current_row)
+            except ReportCancelledError:
+                # Ожидающие секции снимаются, а отрисовываемые останавливаются вместе с процессами пула
+                executor.shutdown(wait=False, cancel_futures=True)
+                _terminate_section_workers(worker_pids, workers)
+                raise
+        
+        return current_row
+    
+    @staticmethod
+    def _parallel_eligible(section_data):
+        """Секция отрисовывается в отдельном процессе: не ссылается на другие секции, данные передаются в процесс"""
+        if not isinstance(section_data, dict) or section_data.get('type', 'table') not in PARALLEL_SECTION_TYPES:
+            return False
+        if section_data.get('image_columns'):
+            return False
+        
+        groups = section_data.get('groups')
+        items = [section_data] + ([group for group in groups if isinstance(group, dict)] if isinstance(groups, list) else [])
+        for item in items:
+            source = item.get('source')
+            if isinstance(source, dict) and source.get('type') == 'sql':
+                # Соединения пула не передаются в другой процесс
+                return False
+            data = item.get('data')
+            if needs_resolving(data) and not isinstance(data, (FileSource, pd.DataFrame)):
+                return False
+        return True
+    
+    def _section_cached(self, section_data):
+        """Фрагмент секции уже есть в кеше секций"""
+        if self.section_cache is None:
+            return False
+        key = self._section_key(attach_sources(section_data))
+        return key is not None and key in self.section_cache
+    
+    def _section_key(self, section_data):
+        """Хеш секции для кеша секций: стили строк входят в него именами стилей книги и описаниями"""
+        row_styles = section_data.get('row_styles')
+        if row_styles:
+            section_data = dict(section_data, row_styles={
+                role: (self._style_names.get(name), self._style_spec_key(name)) for role, name in row_styles.items()
+            })
+        return self.section_cache.section_key(section_data)
+    
+    def _style_spec_key(self, name):
+        """Ключ описания стиля реестра или отчета (None - неизвестный стиль)"""
+        if name in self.style_registry:
+            return self.style_registry.spec_key(name)
+        spec = self._report_styles.get(name)
+        return style_key(spec) if spec is not None else None
+    
+    def _add_sections_on_sheets(self, sections, start_row):
+        """Размещение каждой секции на отдельном листе с оглавлением на главном листе"""
+        index_ws = self.ws
+        
+        index_ws.cell(row=start_row, column=1, value="📑 СОДЕРЖАНИЕ")
+        index_ws.cell(row=start_row, column=1).style = "subheader_style"
+        index_ws.merge_cells(f'A{start_row}:F{start_row}')
+        
+        current_row = start_row + 1
+        
+        for section in sections:
+            section_title = section.get('title', 'Секция')
+            
+            self.ws = self.wb.create_sheet(self._unique_sheet_title(section_title))
+            section_ws = self.ws
+            self._render_section(section, 1)
+            
+            # Ссылка на лист секции в оглавлении
+            link_cell = index_ws.cell(row=current_row, column=1, value=section_title)
+            link_cell.hyperlink = Hyperlink(
+                ref=link_cell.coordinate,
+                location=f"{self._quote_sheet_title(section_ws.title)}!A1",
+                display=section_title
+            )
+            link_cell.font = Font(color="0563C1", underline="single")
+            
+            # Количество листов, занятых секцией (с учетом продолжений)
+            sheets_used = len(self._section_sheets(section_ws))
+            if sheets_used > 1:
+                index_ws.cell(row=current_row, column=2, value=f"листов: {sheets_used}")
+            
+            current_row += 1
+        
+        self.ws = index_ws
+        return current_row + 1
+    
+    @staticmethod
+    def _section_enabled(section_data):
+        """Секция включена (ключ enabled отсутствует или истинен)"""
+        if not isinstance(section_data, dict):
+            return True
+        enabled = section_data.get('enabled', True)
+        if isinstance(enabled, str):
+            return enabled.strip().lower() not in DISABLED_SECTION_VALUES
+        return bool(enabled)
+    
+    def _section_sheets(self, section_ws):
+        """Лист секции и ее листы-продолжения (без служебных листов данных графиков)"""
+        sheets = self.wb.worksheets
+        return [ws for ws in sheets[sheets.index(section_ws):] if ws not in self._chart_data_sheets]
+    
+    def _unique_sheet_title(self, title):
+        """Допустимое и уникальное в книге имя листа"""
+        clean_title = ''.join('_' if char in SHEET_TITLE_INVALID_CHARS else char for char in str(title))
+        clean_title = clean_title.strip("'").strip() or "Лист"
+        clean_title = clean_title[:SHEET_TITLE_MAX_LENGTH]
+        
+        existing = {ws.title.lower() for ws in self.wb.worksheets}
+        candidate = clean_title
+        counter = 2
+        while candidate.lower() in existing:
+            suffix = f" ({counter})"
+            candidate = clean_title[:SHEET_TITLE_MAX_LENGTH - len(suffix)] + suffix
+            counter += 1
+        
+        return candidate
+    
+    @staticmethod
+    def _quote_sheet_title(title):
+        """Имя листа в кавычках для ссылок вида 'Лист'!A1"""
+        return "'" + title.replace("'", "''") + "'"
+    
+    def _start_continuation_sheet(self, section_title=None):
+        """
+        Создание листа-продолжения, когда на текущем листе закончились строки
+        
+        Args:
+            section_title: Заголовок продолжаемой секции (повторяется в первой строке)
+        
+        Returns:
+            Номер первой свободной строки на новом листе
+        """
+        # Листы-продолжения называются по первому листу цепочки: "Отчет (2)", "Отчет (3)"
+        base_title = self._base_titles.get(self.ws, self.ws.title)
+        self.ws = self.wb.create_sheet(self._unique_sheet_title(base_title))
+        self._base_titles[self.ws] = base_title
+        
+        if section_title is None:
+            return 1
+        
+        self.ws.cell(row=1, column=1, value=f"▼ {section_title} (продолжение)")
+        self.ws.cell(row=1, column=1).style = "subheader_style"
+        self.ws.merge_cells('A1:F1')
+        
+        return CONTINUATION_FIRST_ROW
+    
+    def _ensure_rows_available(self, start_row, rows_needed, section_title=None):
+        """Переход на лист-продолжение, если блок из rows_needed строк не помещается на листе"""
+        if start_row + rows_needed - 1 <= self.max_rows_per_sheet:
+            return start_row
+        
+        return self._start_continuation_sheet(section_title)
+    
+    def _next_table_name(self):
+        """Уникальное в пределах книги имя таблицы Excel"""
+        self._table_count += 1
+        return f"Table{self._table_count}"
+    
+    @staticmethod
+    def _iter_chunks(data, chunk_size=TABLE_CHUNK_SIZE):
+        """Разбиение строк данных на порции фиксированного размера"""
+        if isinstance(data, list):
+            for offset in range(0, len(data), chunk_size):
+                yield data[offset:offset + chunk_size]
+            return
+        
+        iterator = iter(data)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    
     def _add_report_header(self, data, start_row):
         """Добавление заголовка отчета"""
         title = data.get('title', 'Сложный отчет')
@@ -172,16 +628,131 @@ class AdvancedExcelRenderer:
         
         return current_row + 3
     
+    def _render_section(self, section_data, start_row):
+        """Отрисовка секции или вставка ее фрагмента из кеша секций или из процесса пула"""
+        prepared = self._prepared_fragments.pop(id(section_data), None)
+        self._progress.start_section(section_data.get('title', 'Секция'))
+        self._profile_section(section_data)
+        
+        # Описания source заменяются поставщиками строк: их отпечаток (размер
+        # и время изменения файла) входит в ключ кеша секции
+        section_data = attach_sources(section_data)
+        
+        if prepared is not None and start_row + prepared['height'] - 1 <= self.max_rows_per_sheet:
+            self._replay_section_fragment(section_data, prepared, start_row)
+            self._progress.advance(prepared['height'])
+            key = self._section_key(section_data) if self.section_cache is not None else None
+            if key is not None:
+                self.section_cache.put(key, prepared)
+            return start_row + prepared['height']
+        
+        if self.section_cache is None:
+            return self._add_collapsible_section(section_data, start_row)
+        
+        key = self._section_key(section_data)
+        if key is None:
+            # Ленивые данные без отпечатка: секция отрисовывается без кеша
+            return self._add_collapsible_section(section_data, start_row)
+        
+        fragment = self.section_cache.get(key)
+        if fragment is not None and start_row + fragment['height'] - 1 <= self.max_rows_per_sheet:
+            self._replay_section_fragment(section_data, fragment, start_row)
+            self._progress.advance(fragment['height'])
+            return start_row + fragment['height']
+        
+        next_row, fragment = self._render_and_capture(section_data, start_row)
+        if fragment is not None:
+            self.section_cache.put(key, fragment)
+        return next_row
+    
+    def _render_and_capture(self, section_data, start_row):
+        """
+        Отрисовка секции с сохранением результата во фрагмент
+        
+        Returns:
+            (следующая строка, фрагмент или None - секция не кешируется)
+        """
+        ws = self.ws
+        cells_before = len(ws._cells)
+        images_before = len(ws._images)
+        charts_before = len(ws._charts)
+        sheets_before = len(self.wb.worksheets)
+        tables_before = set(ws.tables)
+        merges_before = {merged.coord for merged in ws.merged_cells.ranges}
+        cached_values_before = len(self._cached_values)
+        fast_store = self.writer.row_store(ws)
+        
+        self._fragment_recording = []
+        try:
+            next_row = self._add_collapsible_section(section_data, start_row)
+        finally:
+            conditional_formatting, self._fragment_recording = self._fragment_recording, None
+        
+        # Кешируются секции, целиком оставшиеся на своем листе и без графиков
+        # (графики ссылаются на данные других секций и листов)
+        if self.ws is not ws or len(self.wb.worksheets) != sheets_before or len(ws._charts) != charts_before:
+            return next_row, None
+        
+        fragment = capture_fragment(ws, start_row, next_row, cells_before, images_before,
+                                    tables_before, merges_before, fast_store)
+        if fragment is None:
+            return next_row, None
+        
+        fragment['conditional_formatting'] = [
+            (table_key, rules, first_row - start_row, last_row - start_row)
+            for table_key, rules, first_row, last_row in conditional_formatting
+        ]
+        fragment['cached_values'] = [
+            (row - start_row, col_idx, value)
+            for (_, row, col_idx), value in islice(self._cached_values.items(), cached_values_before, None)
+        ]
+        data_section = self._data_sections.get(section_data.get('id'))
+        if data_section is not None and data_section['parts'][0][0] is ws and \
+                data_section['parts'][0][1] >= start_row:
+            _, header_row, last_row = data_section['parts'][0]
+            fragment['data_section'] = (header_row - start_row, last_row - start_row,
+                                        data_section['columns'], data_section['numeric_columns'])
+        
+        return next_row, fragment
+    
+    def _replay_section_fragment(self, section_data, fragment, start_row):
+        """Вставка сохраненного фрагмента секции на текущий лист"""
+        replay_fragment(self.ws, fragment, start_row, self._next_table_name, self.writer.row_store(self.ws))
+        
+        for table_key, rules, first_row, last_row in fragment['conditional_formatting']:
+            self._plan_conditional_ranges(self.ws, table_key, rules, start_row + first_row, start_row + last_row)
+        
+        for row_offset, col_idx, value in fragment['cached_values']:
+            self._cached_values[(id(self.ws), start_row + row_offset, col_idx)] = value
+        
+        if 'data_section' in fragment:
+            header_row, last_row, columns, numeric_columns = fragment['data_section']
+            data = section_data.get('data')
+            self._data_sections[section_data['id']] = {
+                'parts': [(self.ws, start_row + header_row, start_row + last_row)],
+                'columns': columns,
+                'numeric_columns': numeric_columns,
+                'data': data if isinstance(data, list) else None
+            }
+    
     def _add_collapsible_section(self, section_data, start_row):
         """Добавление сворачиваемой секции"""
         section_title = section_data.get('title', 'Секция')
         section_type = section_data.get('type', 'table')
         is_collapsed = section_data.get('collapsed', False)
         
+        # Ленивые источники данных читаются только сейчас, когда секция отрисовывается
+        stream = section_type in STREAMING_SECTION_TYPES and not section_data.get('image_columns')
+        section_data = resolve_section_data(section_data, stream=stream)
+        
         # Заголовок секции с кнопкой сворачивания
         collapse_symbol = "▼" if not is_collapsed else "▶"
         header_text = f"{collapse_symbol} {section_title}"
         
+        # Заголовок и хотя бы одна строка секции должны поместиться на лист
+        start_row = self._ensure_rows_available(start_row, 2)
+        section_ws = self.ws
+        
         self.ws.cell(row=start_row, column=1, value=header_text)
         self.ws.cell(row=start_row, column=1).style = "subheader_style"
         self.ws.merge_cells(f'A{start_row}:F{start_row}')
@@ -192,6 +763,8 @@ class AdvancedExcelRenderer:
             current_row = self._add_table_with_filters(section_data, section_start_row)
         elif section_type == 'grouped_data':
             current_row = self._add_grouped_data(section_data, section_start_row)
+        elif section_type == 'pivot':
+            current_row = self._add_pivot_section(section_data, section_start_row)
         elif section_type == 'chart':
             current_row = self._add_chart_section(section_data, section_start_row)
         elif section_type == 'image':
@@ -202,7 +775,16 @@ class AdvancedExcelRenderer:
             current_row = section_start_row
         
         # Настройка группировки для сворачивания
-        if current_row > section_start_row:
+        if self.ws is not section_ws:
+            # Секция перенесена на листы-продолжения: группируем ее часть на каждом листе
+            for ws in self._section_sheets(section_ws):
+                if ws is section_ws:
+                    self._setup_row_grouping(section_start_row, self.writer.last_row(ws), hidden=is_collapsed, ws=ws)
+                elif ws is self.ws:
+                    self._setup_row_grouping(CONTINUATION_FIRST_ROW, current_row - 1, hidden=is_collapsed, ws=ws)
+                else:
+                    self._setup_row_grouping(CONTINUATION_FIRST_ROW, self.writer.last_row(ws), hidden=is_collapsed, ws=ws)
+        elif current_row > section_start_row:
             self._setup_row_grouping(section_start_row, current_row - 1, hidden=is_collapsed)
         
         return current_row + 1
@@ -212,15 +794,23 @@ class AdvancedExcelRenderer:
         data = section_data.get('data', [])
         image_columns = section_data.get('image_columns', [])
         
-        if not data:
+        if isinstance(data, Iterator):
+            # Итератор строк: первая строка читается для проверки формата и возвращается в поток
+            first_row = next(data, None)
+            if first_row is None:
+                return start_row
+            first_rows = [first_row]
+            data = chain(first_rows, data)
+        elif not data:
             return start_row
-        
-        # Проверяем, что data - это список словарей
-        if not isinstance(data, list):
+        elif not isinstance(data, list):
+            # Проверяем, что data - это список словарей
             print(f"Предупреждение: неверный формат данных в секции '{section_data.get('title', 'Unknown')}' - ожидается список")
             return start_row
+        else:
+            first_rows = data
             
-        if not data or not isinstance(data[0], dict):
+        if not isinstance(first_rows[0], dict):
             print(f"Предупреждение: пустые данные или неверный формат в секции '{section_data.get('title', 'Unknown')}'")
             return start_row
 
@@ -228,25 +818,131 @@ class AdvancedExcelRenderer:
         if image_columns:
             return self._add_table_with_images(section_data, start_row)
 
-        df = pd.DataFrame(data)
+        section_title = section_data.get('title', 'Секция')
         
-        # Заголовки таблицы
-        for col_idx, column in enumerate(df.columns, 1):
-            cell = self.ws.cell(row=start_row, column=col_idx, value=column)
+        # Заголовок таблицы и хотя бы одна строка данных должны поместиться на лист
+        header_row = self._ensure_rows_available(start_row, 2, section_title)
+        row_idx = header_row + 1
+        columns = None
+        first_chunk_df = None
+        table_parts = []
+        write_row = self.writer.write_row
+        row_styles = self._row_styles(section_data)
+        progress_interval = self._progress.interval
+        pending_rows = 0
+        
+        # Данные пишутся порциями: DataFrame строится только для текущей порции
+        for chunk in self._iter_chunks(data):
+            if columns is None:
+                df = pd.DataFrame(chunk)
+                columns = list(df.columns)
+                first_chunk_df = df
+                self._write_table_header(columns, header_row)
+                
+                # Пулы общих строк для колонок с малым числом различных значений
+                string_storage = self._plan_string_storage(section_data, df)
+                string_pools = [SharedStringPool() if string_storage.get(column) == 'shared' else None
+                                for column in columns]
+                has_string_pools = any(pool is not None for pool in string_pools)
+            else:
+                df = pd.DataFrame(chunk, columns=columns)
+            
+            for row_data in dataframe_to_rows(df, index=False, header=False):
+                if row_idx > self.max_rows_per_sheet:
+                    # Лист заполнен: продолжаем таблицу на новом листе с повтором заголовков
+                    table_parts.append((self.ws, header_row, row_idx - 1))
+                    header_row = self._start_continuation_sheet(section_title)
+                    self._write_table_header(columns, header_row)
+                    self.ws.freeze_panes = f"A{header_row + 1}"
+                    row_idx = header_row + 1
+                
+                if has_string_pools:
+                    # Одинаковые строки колонки - один объект SharedString в таблице общих строк книги
+                    row_data = [pool[value] if pool is not None and type(value) is str else value
+                                for pool, value in zip(string_pools, row_data)]
+                write_row(self.ws, row_idx, 1, row_data, row_styles)
+                row_idx += 1
+        
+                # Прогресс и отмена - раз в progress_interval строк
+                pending_rows += 1
+                if pending_rows == progress_interval:
+                    self._progress.advance(pending_rows)
+                    pending_rows = 0
+        
+        self._progress.advance(pending_rows)
+        table_parts.append((self.ws, header_row, row_idx - 1))
+        
+        # Диапазон таблицы доступен графикам по id секции
+        if section_data.get('id') is not None:
+            self._data_sections[section_data['id']] = {
+                'parts': table_parts,
+                'columns': columns,
+                'numeric_columns': [column for column in columns
+                                    if pd.api.types.is_numeric_dtype(first_chunk_df[column])],
+                'data': data if isinstance(data, list) else None
+            }
+        
+        # Каждая часть таблицы оформляется на своем листе отдельно
+        for ws, part_header_row, part_last_row in table_parts:
+            self._add_excel_table(ws, columns, part_header_row, part_last_row)
+            self._plan_conditional_formatting(section_data, first_chunk_df, part_header_row + 1, part_last_row, ws=ws)
+        
+        return row_idx
+    
+    def _plan_string_storage(self, section_data, df):
+        """
+        Выбор способа хранения строк для текстовых колонок таблицы
+        
+        Режимы: "shared" - общие строки (значение записывается в таблицу общих строк
+        книги один раз, ячейки ссылаются на него индексом), "inline" - строка хранится
+        в каждой ячейке. Задаются ключом секции string_storage: словарем {колонка: режим}
+        или строкой "auto"/"shared"/"inline" для всех колонок. В режиме "auto" общие
+        строки выбираются для колонок, где доля различных значений не превышает
+        SHARED_STRINGS_MAX_UNIQUE_RATIO. Движок openpyxl всегда пишет строки в ячейках.
+        
+        Returns:
+            Словарь {колонка: "shared" | "inline"} для текстовых колонок
+        """
+        setting = section_data.get('string_storage', 'auto')
+        if setting != 'auto' and not isinstance(self.writer, RowStoreWriter):
+            print(f"Предупреждение: string_storage не поддерживается движком '{self.engine}' "
+                  f"- строки хранятся в ячейках")
+        text_columns = [column for column in df.columns if pd.api.types.is_string_dtype(df[column])]
+        
+        if isinstance(setting, dict):
+            per_column = setting
+            default_mode = per_column.get('*', 'auto')
+        else:
+            per_column = {}
+            default_mode = setting
+        
+        storage = {}
+        for column in text_columns:
+            mode = per_column.get(column, default_mode)
+            if mode == 'auto':
+                values = df[column].dropna()
+                unique_ratio = values.nunique() / len(values) if len(values) else 1.0
+                mode = 'shared' if unique_ratio <= SHARED_STRINGS_MAX_UNIQUE_RATIO else 'inline'
+            storage[column] = mode
+        
+        return storage
+    
+    def _write_table_header(self, columns, header_row):
+        """Запись строки заголовков таблицы"""
+        for col_idx, column in enumerate(columns, 1):
+            cell = self.ws.cell(row=header_row, column=col_idx, value=column)
             cell.style = "header_style"
         
-        # Данные таблицы
-        for row_idx, row_data in enumerate(dataframe_to_rows(df, index=False, header=False), start_row + 1):
-            for col_idx, value in enumerate(row_data, 1):
-                cell = self.ws.cell(row=row_idx, column=col_idx, value=value)
-                if isinstance(value, (int, float)):
-                    cell.style = "number_style"
-                else:
-                    cell.style = "data_style"
+    def _add_excel_table(self, ws, columns, header_row, last_row):
+        """Создание таблицы Excel с автофильтрами"""
+        table_range = range_address(header_row, 1, last_row, len(columns))
+        table = Table(displayName=self._next_table_name(), ref=table_range)
         
-        # Создание таблицы Excel с автофильтрами
-        table_range = f"A{start_row}:{chr(64 + len(df.columns))}{start_row + len(df)}"
-        table = Table(displayName=f"Table{start_row}", ref=table_range)
+        # Колонки таблицы задаются сразу: иначе при сохранении openpyxl читает
+        # заголовки через ws[ref] и создает ячейки для всего диапазона таблицы
+        table._initialise_columns()
+        for table_column, column in zip(table.tableColumns, columns):
+            table_column.name = str(column)
         
         # Стиль таблицы
         style = TableStyleInfo(
@@ -258,12 +954,7 @@ class AdvancedExcelRenderer:
         )
         table.tableStyleInfo = style
         
-        self.ws.add_table(table)
-        
-        # Условное форматирование для числовых колонок
-        self._apply_conditional_formatting(df, start_row)
-        
-        return start_row + len(df) + 1
+        ws.add_table(table)
     
     def _add_grouped_data(self, section_data, start_row):
         """Добавление группированных данных с многоуровневым сворачиванием"""
@@ -274,6 +965,16 @@ class AdvancedExcelRenderer:
             return start_row
         
         current_row = start_row
+        section_title = section_data.get('title', 'Секция')
+        row_styles = self._row_styles(section_data)
+        
+        # Итоги: формулы Excel по диапазонам строк групп
+        section_subtotals = self._normalize_subtotals(section_data.get('subtotals'))
+        subtotal_mode = section_data.get('subtotal_mode', 'subtotal')
+        total_frames = []       # Данные групп для расчета кешированных значений итогов
+        total_rows = []         # (лист, строка, {колонка: (номер колонки, функция)}, индекс группы или None)
+        total_ranges = {}       # Колонка -> [(лист, номер колонки, первая строка, последняя строка)]
+        total_groups = {}       # Колонка -> индексы групп с этой колонкой
         
         for group in groups:
             if not isinstance(group, dict):
@@ -283,6 +984,12 @@ class AdvancedExcelRenderer:
             group_title = group.get('title', 'Группа')
             group_data = group.get('data', [])
             is_collapsed = group.get('collapsed', False)
+            group_subtotals = self._normalize_subtotals(group.get('subtotals', section_subtotals))
+            
+            # Группа переносится на лист-продолжение целиком, если не помещается на текущем
+            rows_needed = len(group_data) + 2 + bool(group_subtotals) if isinstance(group_data, list) else 1
+            rows_needed = min(rows_needed, self.max_rows_per_sheet - CONTINUATION_FIRST_ROW + 1)
+            current_row = self._ensure_rows_available(current_row, rows_needed, section_title)
             
             # Заголовок группы (уровень 1)
             collapse_symbol = "▼" if not is_collapsed else "▶"
@@ -303,126 +1010,910 @@ class AdvancedExcelRenderer:
             
             # Данные группы
             df = pd.DataFrame(group_data)
+            columns = list(df.columns)
+            self._write_group_columns(columns, group_start_row)
             
-            # Заголовки
-            for col_idx, column in enumerate(df.columns, 2):  # Смещение для отступа
-                cell = self.ws.cell(row=group_start_row, column=col_idx, value=column)
-                cell.font = Font(bold=True, size=9)
-                cell.fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
+            # Группа, которая не помещается на лист, продолжается на листе-продолжении
+            # с повтором заголовка группы и заголовков колонок
+            parts = []  # (лист, строка заголовков колонок, последняя строка данных)
+            part_header_row = group_start_row
+            row_idx = group_start_row + 1
+            pending_rows = 0
+            for row_data in dataframe_to_rows(df, index=False, header=False):
+                if row_idx > self.max_rows_per_sheet:
+                    parts.append((self.ws, part_header_row, row_idx - 1))
+                    title_row = self._start_continuation_sheet(section_title)
+                    self.ws.cell(row=title_row, column=1, value=f"  {collapse_symbol} {group_title} (продолжение)")
+                    self.ws.cell(row=title_row, column=1).font = Font(bold=True, size=11)
+                    part_header_row = title_row + 1
+                    self._write_group_columns(columns, part_header_row)
+                    row_idx = part_header_row + 1
             
-            # Данные
-            for row_idx, row_data in enumerate(dataframe_to_rows(df, index=False, header=False), group_start_row + 1):
-                for col_idx, value in enumerate(row_data, 2):
-                    cell = self.ws.cell(row=row_idx, column=col_idx, value=value)
-                    if isinstance(value, (int, float)):
-                        cell.style = "number_style"
-                    else:
-                        cell.style = "data_style"
+                self.writer.write_row(self.ws, row_idx, 2, row_data, row_styles)
+                row_idx += 1
+                pending_rows += 1
+                if pending_rows == self._progress.interval:
+                    self._progress.advance(pending_rows)
+                    pending_rows = 0
+            self._progress.advance(pending_rows)
+            parts.append((self.ws, part_header_row, row_idx - 1))
             
-            current_row = group_start_row + len(df) + 1
+            current_row = row_idx
+            data_ranges = [(ws, first_row + 1, last_row) for ws, first_row, last_row in parts]
             
-            # Группировка строк группы (уровень 2)
-            if current_row > group_start_row:
-                self._setup_row_grouping(group_start_row, current_row - 1, level=2, hidden=is_collapsed)
+            for ws, part_header_row, part_last_row in parts:
+                # Условное форматирование группы (правило из группы или из секции)
+                self._plan_conditional_formatting(group if 'conditional_formatting' in group else section_data,
+                                                  df, part_header_row + 1, part_last_row, col_offset=2, ws=ws)
             
+                # Группировка строк группы (уровень 2)
+                self._setup_row_grouping(part_header_row, part_last_row, level=2, hidden=is_collapsed, ws=ws)
+            
+            if group_subtotals or section_subtotals:
+                group_index = len(total_frames)
+                total_frames.append(df)
+                
+                for column in section_subtotals:
+                    if column in columns:
+                        col_idx = columns.index(column) + 2
+                        total_ranges.setdefault(column, []).extend(
+                            (ws, col_idx, first_row, last_row) for ws, first_row, last_row in data_ranges)
+                        total_groups.setdefault(column, []).append(group_index)
+                
+                # Строка итогов группы остается видимой при сворачивании группы
+                # (группа без колонок итогов строки итогов не получает)
+                row_functions = {column: (columns.index(column) + 2, function)
+                                 for column, function in group_subtotals.items() if column in columns}
+                if row_functions:
+                    current_row = self._ensure_rows_available(current_row, 1, section_title)
+                    self._write_subtotal_row(
+                        current_row, f"  Σ Итого: {group_title}",
+                        {col_idx: self._subtotal_formula(
+                            function, [(ws, col_idx, first_row, last_row) for ws, first_row, last_row in data_ranges],
+                            subtotal_mode)
+                         for col_idx, function in row_functions.values()}
+                    )
+                    total_rows.append((self.ws, current_row, row_functions, group_index))
+                    current_row += 1
+            
+            current_row += 1
+        
+        # Общий итог секции по строкам всех групп
+        if section_subtotals and total_ranges and section_data.get('grand_total', True):
+            current_row = self._ensure_rows_available(current_row, 1, section_title)
+            row_functions = {column: (total_ranges[column][0][1], function)
+                             for column, function in section_subtotals.items() if column in total_ranges}
+            # Один диапазон от первой до последней строки - только если колонка есть во всех
+            # группах между ними: иначе в него попали бы значения других колонок
+            self._write_subtotal_row(
+                current_row, section_data.get('grand_total_label', "Σ Итого по секции"),
+                {col_idx: self._subtotal_formula(
+                    function, total_ranges[column], subtotal_mode,
+                    single_span=total_groups[column][-1] - total_groups[column][0] + 1 == len(total_groups[column]))
+                 for column, (col_idx, function) in row_functions.items()}
+            )
+            total_rows.append((self.ws, current_row, row_functions, None))
             current_row += 1
         
+        if total_rows:
+            self._cache_subtotal_values(total_frames, total_rows)
+        
         return current_row
     
-    def _add_chart_section(self, section_data, start_row):
-        """Добавление секции с графиком"""
-        chart_type = section_data.get('chart_type', 'bar')
-        data = section_data.get('data', [])
+    def _write_group_columns(self, columns, row):
+        """Строка заголовков колонок группы (со смещением на колонку для отступа)"""
+        for col_idx, column in enumerate(columns, 2):
+            cell = self.ws.cell(row=row, column=col_idx, value=column)
+            cell.font = Font(bold=True, size=9)
+            cell.fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
+    
+    @staticmethod
+    def _normalize_subtotals(subtotals):
+        """
+        Приведение настройки итогов к словарю {колонка: функция}
+        
+        Допустимы словарь {колонка: функция}, список колонок (функция sum)
+        или False/None для отключения итогов.
+        """
+        if not subtotals:
+            return {}
+        if isinstance(subtotals, dict):
+            return {column: str(function).lower() for column, function in subtotals.items()}
+        if isinstance(subtotals, str):
+            return {subtotals: 'sum'}
+        return {column: 'sum' for column in subtotals}
+    
+    def _subtotal_formula(self, function, ranges, mode='subtotal', single_span=True):
+        """
+        Формула итога по диапазонам колонки
+        
+        В режиме "subtotal" используется SUBTOTAL: итоги учитывают автофильтр, а общий
+        итог не учитывает вложенные итоги групп. В режиме "plain" - SUM/AVERAGE/...
+        
+        Args:
+            function: Имя функции из SUBTOTAL_FUNCTIONS
+            ranges: Список (лист, номер колонки, первая строка, последняя строка)
+            mode: "subtotal" или "plain"
+            single_span: Диапазоны одной колонки листа можно заменить одним диапазоном
+                от первой до последней строки (между ними нет значений других колонок)
+        """
+        if function not in SUBTOTAL_FUNCTIONS:
+            print(f"Неподдерживаемая функция итогов: {function}, используется sum")
+            function = 'sum'
+        function_code, excel_function, _ = SUBTOTAL_FUNCTIONS[function]
+        
+        same_column = len({(id(ws), col_idx) for ws, col_idx, _, _ in ranges}) == 1
+        if mode == 'subtotal' and function != 'counta' and single_span and same_column and ranges[0][0] is self.ws:
+            # Вложенные SUBTOTAL и текст заголовков групп внутри диапазона не учитываются,
+            # поэтому достаточно одного диапазона от первой до последней строки
+            col_idx = ranges[0][1]
+            references = [range_address(ranges[0][2], col_idx, ranges[-1][3], col_idx)]
+        else:
+            references = []
+            for ws, col_idx, first_row, last_row in ranges:
+                reference = range_address(first_row, col_idx, last_row, col_idx)
+                if ws is not self.ws:
+                    reference = f"{self._quote_sheet_title(ws.title)}!{reference}"
+                references.append(reference)
+        
+        self.wb.calculation.fullCalcOnLoad = True
+        if mode == 'subtotal':
+            return f"=SUBTOTAL({function_code},{','.join(references)})"
+        return f"={excel_function}({','.join(references)})"
+    
+    def _write_subtotal_row(self, row, label, formulas):
+        """Запись строки итогов: подпись в первой колонке и формулы в колонках данных"""
+        self.ws.cell(row=row, column=1, value=label)
+        self.ws.cell(row=row, column=1).font = Font(bold=True, size=10)
+        
+        for col_idx, formula in formulas.items():
+            cell = self.ws.cell(row=row, column=col_idx, value=formula)
+            cell.style = "number_style"
+            cell.font = Font(bold=True, size=10)
+    
+    def _cache_subtotal_values(self, frames, total_rows):
+        """
+        Расчет значений формул итогов за один векторизованный проход
+        
+        Excel пересчитывает формулы при открытии, рассчитанные значения используются
+        рендерером (например, при автоподборе ширины колонок вместо текста формул).
+        """
+        if not frames:
+            return
+        
+        combined = pd.concat(frames, keys=range(len(frames)))
+        needed = {}
+        for _, _, row_functions, _ in total_rows:
+            for column, (_, function) in row_functions.items():
+                needed.setdefault(column, set()).add(SUBTOTAL_FUNCTIONS.get(function, SUBTOTAL_FUNCTIONS['sum'])[2])
+        
+        per_group = {}
+        overall = {}
+        for column, aggregations in needed.items():
+            values = combined[column]
+            numeric = pd.to_numeric(values, errors='coerce')
+            grouped = numeric.groupby(level=0)
+            for aggregation in aggregations:
+                if aggregation == 'counta':
+                    per_group[(column, aggregation)] = values.groupby(level=0).count()
+                    overall[(column, aggregation)] = values.count()
+                else:
+                    per_group[(column, aggregation)] = grouped.agg(aggregation)
+                    overall[(column, aggregation)] = numeric.agg(aggregation)
+        
+        for ws, row, row_functions, group_index in total_rows:
+            for column, (col_idx, function) in row_functions.items():
+                aggregation = SUBTOTAL_FUNCTIONS.get(function, SUBTOTAL_FUNCTIONS['sum'])[2]
+                if group_index is None:
+                    value = overall[(column, aggregation)]
+                else:
+                    value = per_group[(column, aggregation)].get(group_index)
+                if hasattr(value, 'item'):
+                    value = value.item()
+                self._cached_values[(id(ws), row, col_idx)] = value
+    
+    def _add_pivot_section(self, section_data, start_row):
+        """
+        Добавление сводки: многоуровневая группировка плоских строк по ключам group_by
         
-        # Проверяем данные
-        if not isinstance(data, list) or not data:
-            print(f"Предупреждение: пустые данные или неверный формат в графике '{section_data.get('title', 'Unknown')}'")
+        Группа каждого уровня выводится строкой заголовка, вложенными строками и строкой
+        итогов с формулами SUBTOTAL. Строки пишутся за один проход по упорядоченным данным.
+        """
+        section_title = section_data.get('title', 'Секция')
+        group_by = section_data.get('group_by', [])
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        
+        if not group_by:
+            print(f"Предупреждение: не заданы колонки group_by в секции '{section_title}'")
             return start_row
-            
-        if not isinstance(data[0], dict):
-            print(f"Предупреждение: неверный формат данных графика в секции '{section_data.get('title', 'Unknown')}'")
+        
+        if len(group_by) > MAX_PIVOT_LEVELS:
+            print(f"Предупреждение: Excel поддерживает не более {MAX_PIVOT_LEVELS} уровней группировки "
+                  f"в секции, лишние уровни секции '{section_title}' не используются")
+            group_by = group_by[:MAX_PIVOT_LEVELS]
+        
+        try:
+            detail_columns, rows = group_rows(
+                section_data.get('data', []), group_by,
+                columns=section_data.get('columns'),
+                presorted=section_data.get('presorted', False),
+                sort=section_data.get('sort', True)
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Предупреждение: неверный формат данных сводки '{section_title}': {e}")
             return start_row
         
-        df = pd.DataFrame(data)
+        if detail_columns is None:
+            return start_row
         
-        # Добавляем данные для графика
-        for row_idx, row_data in enumerate(dataframe_to_rows(df, index=False, header=True), start_row):
-            for col_idx, value in enumerate(row_data, 1):
-                self.ws.cell(row=row_idx, column=col_idx, value=value)
-        
-        # Создаем график
-        if chart_type == 'bar':
-            chart = BarChart()
-        elif chart_type == 'line':
-            chart = LineChart()
-        elif chart_type == 'pie':
-            chart = PieChart()
+        levels = len(group_by)
+        show_details = section_data.get('show_details', True)
+        collapse_level = section_data.get('collapse_level')
+        aggregates = {}
+        for column, function in self._normalize_subtotals(section_data.get('aggregates')).items():
+            if column not in detail_columns:
+                continue
+            if function not in SUBTOTAL_FUNCTIONS:
+                print(f"Неподдерживаемая функция итогов: {function}, используется sum")
+                function = 'sum'
+            aggregates[column] = (detail_columns.index(column) + 2, function)
+        
+        # Корневая группа (для общего итога секции) и открытые группы уровней
+        stack = []
+        row_styles = self._row_styles(section_data)
+        write_row = self.writer.write_row
+        state = {
+            'row': self._ensure_rows_available(start_row, 2, section_title),
+            'hidden_from_level': None if collapse_level is None else collapse_level + 2,
+            'stack': stack,
+            'group_by': group_by,
+            'detail_columns': detail_columns,
+            'title': section_title,
+            'outline': None,  # Незаписанная серия строк одного уровня: [лист, первая, последняя, уровень, скрыты]
+        }
+        self._write_pivot_header(group_by, detail_columns, state['row'])
+        state['row'] += 1
+        
+        stack.append(self._open_pivot_group(None, -1, state))
+        progress_interval = self._progress.interval
+        pending_rows = 0
+        
+        for boundary, keys, values in rows:
+            # Закрываем завершившиеся группы, начиная с самой глубокой
+            while len(stack) - 1 > boundary:
+                self._close_pivot_group(stack.pop(), stack[-1], aggregates, show_details, state)
+            
+            # Открываем новые группы
+            for level in range(len(stack) - 1, levels):
+                self._next_pivot_row(state)
+                row = state['row']
+                self.ws.cell(row=row, column=1, value=f"{'  ' * (level + 1)}▼ {keys[level]}")
+                self.ws.cell(row=row, column=1).font = Font(bold=True, size=11 if level == 0 else 10)
+                self._set_pivot_row_level(row, level + 1, state)
+                state['row'] += 1
+                stack.append(self._open_pivot_group(keys[level], level, state))
+            
+            # Значения агрегируемых колонок накапливаются в самой глубокой группе
+            accumulators = stack[-1]['accumulators']
+            for column, (col_idx, _) in aggregates.items():
+                self._accumulate_pivot_value(accumulators.setdefault(column, list(PIVOT_ACCUMULATOR)),
+                                             values[col_idx - 2])
+            
+            if show_details:
+                self._next_pivot_row(state)
+                row = state['row']
+                write_row(self.ws, row, 2, values, row_styles)
+                self._set_pivot_row_level(row, levels + 1, state)
+                state['row'] += 1
+        
+            pending_rows += 1
+            if pending_rows == progress_interval:
+                self._progress.advance(pending_rows)
+                pending_rows = 0
+        
+        self._progress.advance(pending_rows)
+        while len(stack) > 1:
+            self._close_pivot_group(stack.pop(), stack[-1], aggregates, show_details, state)
+        
+        root = stack.pop()
+        if section_data.get('grand_total', True):
+            self._close_pivot_group(root, None, aggregates, show_details, state)
+        self._flush_pivot_outline(state)
+        
+        return state['row']
+    
+    def _write_pivot_header(self, group_by, detail_columns, row):
+        """Строка заголовков сводки: ключи группировки и детальные колонки"""
+        cell = self.ws.cell(row=row, column=1, value=" / ".join(str(key) for key in group_by))
+        cell.style = "header_style"
+        for col_idx, column in enumerate(detail_columns, 2):
+            cell = self.ws.cell(row=row, column=col_idx, value=column)
+            cell.style = "header_style"
+    
+    def _open_pivot_group(self, key, level, state):
+        """Открытие группы сводки: ее строки начинаются со следующей строки листа"""
+        return {
+            'key': key,
+            'level': level,
+            'segments': [[self.ws, state['row'], None]],  # Части группы на разных листах
+            'accumulators': {},
+        }
+    
+    def _next_pivot_row(self, state):
+        """Переход на лист-продолжение, если строки закончились, с разрывом частей открытых групп"""
+        if state['row'] <= self.max_rows_per_sheet:
+            return
+        
+        for group in state['stack']:
+            group['segments'][-1][2] = state['row'] - 1
+        
+        state['row'] = self._start_continuation_sheet(state['title'])
+        self._write_pivot_header(state['group_by'], state['detail_columns'], state['row'])
+        state['row'] += 1
+        
+        for group in state['stack']:
+            group['segments'].append([self.ws, state['row'], None])
+    
+    def _set_pivot_row_level(self, row, level, state):
+        """
+        Уровень группировки строки сводки (уровень 1 - строки секции)
+        
+        Соседние строки одного уровня передаются бэкенду записи одним диапазоном.
+        """
+        hidden = state['hidden_from_level'] is not None and level >= state['hidden_from_level']
+        outline = state['outline']
+        if outline is not None and outline[0] is self.ws and outline[2] == row - 1 and outline[3:] == [level, hidden]:
+            outline[2] = row
+            return
+        
+        self._flush_pivot_outline(state)
+        state['outline'] = [self.ws, row, row, level, hidden]
+    
+    def _flush_pivot_outline(self, state):
+        """Запись накопленной серии строк одного уровня группировки"""
+        outline = state['outline']
+        if outline is not None:
+            self.writer.group_rows(*outline)
+            state['outline'] = None
+    
+    @staticmethod
+    def _accumulate_pivot_value(accumulator, value):
+        """Накопление значения группы (PIVOT_ACCUMULATOR; среднее и отклонения - по Уэлфорду)"""
+        if value is None or value != value:  # None или NaN
+            return
+        accumulator[2] += 1
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            accumulator[0] += value
+            accumulator[1] += 1
+            accumulator[3] = value if accumulator[3] is None else min(accumulator[3], value)
+            accumulator[4] = value if accumulator[4] is None else max(accumulator[4], value)
+            delta = value - accumulator[5]
+            accumulator[5] += delta / accumulator[1]
+            accumulator[6] += delta * (value - accumulator[5])
+    
+    @staticmethod
+    def _pivot_aggregate_value(accumulator, function):
+        """Значение итога по накопленным значениям группы"""
+        if accumulator is None:
+            return None
+        total, count, count_all, minimum, maximum, _, squares = accumulator
+        if function == 'sum':
+            return total
+        if function == 'average':
+            return total / count if count else None
+        if function == 'count':
+            return count
+        if function == 'counta':
+            return count_all
+        if function == 'min':
+            return minimum
+        if function == 'max':
+            return maximum
+        if function == 'var':
+            return squares / (count - 1) if count > 1 else None
+        if function == 'stdev':
+            return math.sqrt(squares / (count - 1)) if count > 1 else None
+        return None
+    
+    def _close_pivot_group(self, group, parent, aggregates, show_details, state):
+        """Закрытие группы сводки: строка итогов и передача накопленных значений родителю"""
+        group['segments'][-1][2] = state['row'] - 1
+        
+        if parent is not None:
+            for column, accumulator in group['accumulators'].items():
+                parent_accumulator = parent['accumulators'].setdefault(column, list(PIVOT_ACCUMULATOR))
+                # Объединение средних и сумм квадратов отклонений двух групп (Чан и др.)
+                count = parent_accumulator[1] + accumulator[1]
+                if accumulator[1]:
+                    delta = accumulator[5] - parent_accumulator[5]
+                    parent_accumulator[6] += accumulator[6] + delta * delta * parent_accumulator[1] * accumulator[1] / count
+                    parent_accumulator[5] += delta * accumulator[1] / count
+                parent_accumulator[0] += accumulator[0]
+                parent_accumulator[1] = count
+                parent_accumulator[2] += accumulator[2]
+                for position, choose in ((3, min), (4, max)):
+                    if accumulator[position] is not None:
+                        parent_accumulator[position] = accumulator[position] if parent_accumulator[position] is None \
+                            else choose(parent_accumulator[position], accumulator[position])
+        
+        if not aggregates:
+            return
+        
+        self._next_pivot_row(state)
+        
+        row = state['row']
+        level = group['level']
+        if level < 0:
+            label = "Σ Итого по секции"
         else:
-            chart = BarChart()
+            label = f"{'  ' * (level + 1)}Σ Итого: {group['key']}"
+        
+        values = {}
+        for column, (col_idx, function) in aggregates.items():
+            value = self._pivot_aggregate_value(group['accumulators'].get(column), function)
+            segments = [(ws, col_idx, first, last) for ws, first, last in group['segments'] if last >= first]
+            if show_details and segments:
+                values[col_idx] = self._subtotal_formula(function, segments, 'subtotal')
+                self._cached_values[(id(self.ws), row, col_idx)] = value
+            else:
+                values[col_idx] = value
         
-        # Настройка данных графика
-        data_range = Reference(self.ws, min_col=2, min_row=start_row + 1, 
-                              max_col=len(df.columns), max_row=start_row + len(df))
-        categories = Reference(self.ws, min_col=1, min_row=start_row + 1, 
-                              max_row=start_row + len(df))
+        self._write_subtotal_row(row, label, values)
+        self._set_pivot_row_level(row, level + 1 if level >= 0 else 1, state)
+        state['row'] += 1
+    
+    def _add_chart_section(self, section_data, start_row):
+        """
+        Добавление секции с графиком или сеткой графиков
         
-        chart.add_data(data_range, titles_from_data=True)
+        Секция описывает один график или содержит список charts, который
+        раскладывается сеткой по layout: {"columns": графиков в ряду, "gap": промежуток, см}.
+        Строки под секцию резервируются по реальной высоте графиков.
+        
+        Источник данных графика:
+        - data_ref: id табличной секции - график ссылается на уже записанную таблицу
+        - data: собственные данные графика, записываются рядом с графиком
+          или на скрытый лист данных (data_sheet: true; для сетки - всегда)
+        Ряды длиннее max_points прореживаются методом downsample ('lttb' или 'minmax').
+        """
+        section_title = section_data.get('title', 'Секция')
+        is_grid = 'charts' in section_data
+        specs = section_data['charts'] if is_grid else [section_data]
+        layout = section_data.get('layout', {})
+        
+        # Данные всех графиков: ссылки на записанные диапазоны или данные для записи рядом с графиком
+        charts = []
+        inline_df = None
+        for spec in specs:
+            chart_title = spec.get('title', section_title)
+            source = self._chart_source(spec, chart_title)
+            if source is None:
+                continue
+            placement, df, category_column, value_columns = source
+            if placement is None:
+                if is_grid or spec.get('data_sheet', False):
+                    placement = self._write_chart_data(df, chart_title)
+                    if placement is None:
+                        continue
+                else:
+                    inline_df = df
+            charts.append((spec, placement, category_column, value_columns))
+        
+        if not charts:
+            return start_row
+        
+        # Раскладка графиков по их размерам
+        sizes = [
+            (cm_to_emu(spec.get('width', CHART_WIDTH_CM)), cm_to_emu(spec.get('height', CHART_HEIGHT_CM)))
+            for spec, *_ in charts
+        ]
+        grid = ChartGridLayout(layout.get('columns', 1), layout.get('gap', CHART_GAP_CM))
+        positions, rows_needed = grid.place(sizes)
+        
+        # Данные единственного графика пишутся слева, график - через колонку после них
+        first_col = 1
+        if inline_df is not None and len(inline_df) + 1 > self.max_rows_per_sheet - CONTINUATION_FIRST_ROW + 1:
+            # Данные не помещаются рядом с графиком даже на листе-продолжении - пишутся на лист данных
+            spec, _, category_column, value_columns = charts[0]
+            placement = self._write_chart_data(inline_df, spec.get('title', section_title))
+            if placement is None:
+                return start_row
+            charts[0] = (spec, placement, category_column, value_columns)
+            inline_df = None
+        if inline_df is not None:
+            rows_needed = max(rows_needed, len(inline_df) + 1)
+        start_row = self._ensure_rows_available(start_row, rows_needed, section_title)
+        if inline_df is not None:
+            spec, _, category_column, value_columns = charts[0]
+            charts[0] = (spec, self._write_chart_rows(self.ws, inline_df, start_row), category_column, value_columns)
+            first_col = len(inline_df.columns) + 2
+        
+        for (spec, placement, category_column, value_columns), (width, height), (row_offset, x_offset) in \
+                zip(charts, sizes, positions):
+            chart = self._build_chart(spec, placement, category_column, value_columns, is_grid)
+            anchor = make_anchor(start_row + row_offset, first_col, width, height)
+            self.ws.add_chart(chart, anchor)
+            # Колонка и отступ привязки определяются после автоподбора ширины колонок
+            self._chart_anchors.append((self.ws, anchor, first_col, x_offset))
+        
+        return start_row + rows_needed
+    
+    def _chart_source(self, spec, chart_title):
+        """
+        Подготовка данных графика
+        
+        Returns:
+            (placement, df, category_column, value_columns): placement - записанный
+            диапазон данных (таблица-источник или лист данных) либо None, если данные df
+            (прореженные) нужно записать рядом с графиком; None - график построить нельзя
+        """
+        chart_type = spec.get('chart_type', 'bar')
+        data_ref = spec.get('data_ref')
+        
+        if data_ref is not None:
+            source = self._data_sections.get(data_ref)
+            if source is None:
+                print(f"Предупреждение: таблица '{data_ref}' для графика '{chart_title}' не найдена "
+                      f"(секция-таблица с таким id должна быть выше графика)")
+                return None
+            columns = source['columns']
+            data = source['data']
+            rows_count = sum(last_row - header_row for _, header_row, last_row in source['parts'])
+        else:
+            data = spec.get('data', [])
+            
+            # Проверяем данные
+            if not isinstance(data, list) or not data:
+                print(f"Предупреждение: пустые данные или неверный формат в графике '{chart_title}'")
+                return None
+            
+            if not isinstance(data[0], dict):
+                print(f"Предупреждение: неверный формат данных графика в секции '{chart_title}'")
+                return None
+            
+            columns = list(data[0].keys())
+            rows_count = len(data)
+        
+        # Колонка категорий и колонки рядов (по умолчанию - первая и все остальные)
+        category_column = spec.get('category_column', columns[0])
+        overlay_columns = spec.get('overlay', {}).get('value_columns', [])
+        default_values = source['numeric_columns'] if data_ref is not None else columns
+        value_columns = spec.get('value_columns') or \
+            [column for column in default_values if column not in (category_column, *overlay_columns)]
+        
+        chart_columns = [category_column] + value_columns + [c for c in overlay_columns if c not in value_columns]
+        missing = [column for column in chart_columns if column not in columns]
+        if missing or not value_columns:
+            print(f"Предупреждение: колонки графика '{chart_title}' отсутствуют в данных: {', '.join(missing) or 'ряды'}")
+            return None
+            
+        # Прореживание длинных рядов (кроме круговых диаграмм)
+        max_points = spec.get('max_points', CHART_MAX_POINTS)
+        downsample = bool(max_points) and chart_type != 'pie' and rows_count > max_points
+        
+        # Копия данных пишется на один лист вместе со строкой заголовков
+        sheet_points = self.max_rows_per_sheet - 1
+        if (downsample or data_ref is None) and rows_count > sheet_points:
+            if chart_type == 'pie':
+                print(f"Предупреждение: данные графика '{chart_title}' не помещаются на лист "
+                      f"({rows_count} строк при max_rows_per_sheet={self.max_rows_per_sheet})")
+                return None
+            max_points = min(max_points or sheet_points, sheet_points)
+            downsample = True
+        
+        if data_ref is not None and not downsample:
+            # График ссылается на диапазон таблицы без копирования данных
+            ws, header_row, last_row = source['parts'][0]
+            if len(source['parts']) > 1:
+                print(f"Предупреждение: таблица '{data_ref}' занимает несколько листов - "
+                      f"график '{chart_title}' строится по первому листу")
+            column_index = {column: idx for idx, column in enumerate(columns, 1)}
+            return (ws, header_row, last_row, column_index), None, category_column, value_columns
+        
+        if data is None:
+            print(f"Предупреждение: данные таблицы '{data_ref}' недоступны для прореживания - "
+                  f"график '{chart_title}' не построен")
+            return None
+            
+        df = pd.DataFrame(data, columns=columns)[chart_columns]
+        if downsample:
+            method = spec.get('downsample', 'lttb')
+            if method not in DOWNSAMPLING_METHODS:
+                print(f"Предупреждение: неизвестный метод прореживания '{method}' в графике '{chart_title}', "
+                      f"используется lttb (доступны: {', '.join(DOWNSAMPLING_METHODS)})")
+                method = 'lttb'
+            df = self._downsample_chart_data(df, max_points, method)
+        
+        # Данные, на которые ссылается таблица, пишутся на скрытый лист
+        if data_ref is not None:
+            placement = self._write_chart_data(df, chart_title)
+            return (placement, None, category_column, value_columns) if placement is not None else None
+        
+        return None, df, category_column, value_columns
+        
+    @staticmethod
+    def _create_chart(chart_type):
+        """Создание графика по типу"""
+        if chart_type == 'line':
+            return LineChart()
+        if chart_type == 'pie':
+            return PieChart()
+        return BarChart()
+    
+    def _build_chart(self, spec, placement, category_column, value_columns, with_title=False):
+        """
+        Построение графика по записанным данным
+        
+        Ключ overlay добавляет к графику второй график по тем же категориям
+        (например, линию поверх столбцов): {"chart_type": "line", "value_columns": [...],
+        "secondary_axis": true, "axis_title": "..."}.
+        """
+        chart_type = spec.get('chart_type', 'bar')
+        chart = self._create_chart(chart_type)
+        data_ws, header_row, last_row, column_index = placement
+        
+        # Настройка данных графика: ряды берутся вместе с заголовками колонок
+        categories = Reference(data_ws, min_col=column_index[category_column], min_row=header_row + 1,
+                               max_row=last_row)
+        for column in value_columns:
+            chart.add_data(Reference(data_ws, min_col=column_index[column], min_row=header_row, max_row=last_row),
+                           titles_from_data=True)
         chart.set_categories(categories)
         
-        # Размещение графика
-        chart.width = 15
-        chart.height = 10
-        self.ws.add_chart(chart, f"H{start_row}")
+        if 'chart_title' in spec or with_title:
+            chart.title = spec.get('chart_title', spec.get('title'))
+        if spec.get('y_axis_title') and chart_type != 'pie':
+            chart.y_axis.title = spec['y_axis_title']
+        
+        overlay = spec.get('overlay')
+        if overlay:
+            if chart_type == 'pie' or overlay.get('chart_type') == 'pie':
+                print(f"Предупреждение: круговая диаграмма не комбинируется с другими графиками - "
+                      f"overlay графика '{spec.get('title', '')}' пропущен")
+                return chart
+            
+            second = self._create_chart(overlay.get('chart_type', 'line'))
+            for column in overlay.get('value_columns', []):
+                second.add_data(Reference(data_ws, min_col=column_index[column], min_row=header_row,
+                                          max_row=last_row), titles_from_data=True)
+            second.set_categories(categories)
+            
+            if overlay.get('secondary_axis', True):
+                # Вспомогательная ось значений справа
+                second.y_axis.axId = 200
+                second.y_axis.crosses = 'max'
+                second.y_axis.majorGridlines = None
+            if overlay.get('axis_title'):
+                second.y_axis.title = overlay['axis_title']
+            chart += second
+        
+        return chart
+    
+    @staticmethod
+    def _downsample_chart_data(df, max_points, method):
+        """Прореживание строк данных графика до бюджета точек"""
+        categories = df.iloc[:, 0]
+        if pd.api.types.is_numeric_dtype(categories):
+            x = categories.to_numpy(dtype=float)
+        elif pd.api.types.is_datetime64_any_dtype(categories):
+            x = categories.astype('int64').to_numpy(dtype=float)
+        else:
+            x = None  # Категории-строки: точки равномерны по оси
+        
+        series = [pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float) for column in df.columns[1:]]
+        indices = downsample_indices(x, series, max_points, method)
+        return df.iloc[indices]
+    
+    def _write_chart_rows(self, ws, df, start_row):
+        """Запись данных графика с заголовками, начиная со строки start_row"""
+        for row_idx, row_data in enumerate(dataframe_to_rows(df, index=False, header=True), start_row):
+            for col_idx, value in enumerate(row_data, 1):
+                ws.cell(row=row_idx, column=col_idx, value=value)
+        
+        column_index = {column: idx for idx, column in enumerate(df.columns, 1)}
+        return ws, start_row, start_row + len(df), column_index
+    
+    def _write_chart_data(self, df, section_title):
+        """Запись данных графика на скрытый лист данных (заполненный лист продолжается следующим)"""
+        if len(df) + 1 > self.max_rows_per_sheet:
+            print(f"Предупреждение: данные графика '{section_title}' не помещаются на лист данных графиков")
+            return None
+        
+        if self._chart_data_ws is None or self._chart_data_row + len(df) > self.max_rows_per_sheet:
+            self._chart_data_ws = self.wb.create_sheet(self._unique_sheet_title(CHART_DATA_SHEET_TITLE))
+            self._chart_data_ws.sheet_state = 'hidden'
+            self._chart_data_sheets.append(self._chart_data_ws)
+            self._chart_data_row = 1
         
-        return start_row + len(df) + 15  # Учитываем высоту графика
+        placement = self._write_chart_rows(self._chart_data_ws, df, self._chart_data_row)
+        self._chart_data_row = placement[2] + 2  # Пустая строка между наборами данных
+        return placement
     
-    def _setup_row_grouping(self, start_row, end_row, level=1, hidden=False):
+    def _setup_row_grouping(self, start_row, end_row, level=1, hidden=False, ws=None):
         """Настройка группировки строк с кнопками сворачивания"""
         if start_row >= end_row:
             return
             
-        # Устанавливаем уровень группировки для каждой строки
-        for row in range(start_row, end_row + 1):
-            self.ws.row_dimensions[row].outline_level = level
-            if hidden:
-                self.ws.row_dimensions[row].hidden = True
+        ws = ws or self.ws
+        end_row = min(end_row, self.max_rows_per_sheet)
+        self.writer.group_rows(ws, start_row, end_row, level, hidden)
     
-    def _apply_conditional_formatting(self, df, start_row):
-        """Применение условного форматирования"""
-        for col_idx, column in enumerate(df.columns, 1):
-            if df[column].dtype in ['int64', 'float64']:
-                # Цветовая шкала для числовых данных
-                range_str = f"{chr(64 + col_idx)}{start_row + 1}:{chr(64 + col_idx)}{start_row + len(df)}"
-                rule = ColorScaleRule(
-                    start_type='min', start_color='F8696B',
-                    mid_type='percentile', mid_value=50, mid_color='FFEB9C',
-                    end_type='max', end_color='63BE7B'
+    def _plan_conditional_formatting(self, section_data, df, first_row, last_row, col_offset=1, ws=None):
+        """
+        Планирование условного форматирования диапазона данных таблицы
+        
+        Правила не добавляются на лист сразу: диапазоны одинаковых правил соседних
+        таблиц одинаковой структуры собираются в одно правило с несколькими диапазонами
+        (см. _apply_conditional_formatting).
+        
+        Args:
+            section_data: Секция (или группа) с необязательной спецификацией conditional_formatting
+            df: Данные таблицы (используются только колонки и их типы)
+            first_row: Первая строка данных
+            last_row: Последняя строка данных
+            col_offset: Номер колонки, с которой начинается таблица
+            ws: Лист (по умолчанию текущий)
+        """
+        ws = ws or self.ws
+        if last_row < first_row:
+            return
+        
+        spec = section_data.get('conditional_formatting', DEFAULT_CONDITIONAL_FORMATTING)
+        if not spec:
+            return
+        if isinstance(spec, dict):
+            spec = [spec]
+        
+        columns = list(df.columns)
+        numeric_columns = set(df.select_dtypes(include='number').columns)
+        
+        rules = []
+        for rule_spec in spec:
+            selector = rule_spec.get('columns', rule_spec.get('column', 'numeric'))
+            if selector == 'numeric':
+                selected = [column for column in columns if column in numeric_columns]
+            elif selector == 'all':
+                selected = columns
+            elif isinstance(selector, (list, tuple)):
+                selected = [column for column in columns if column in selector]
+            else:
+                selected = [column for column in columns if column == selector]
+            
+            rules.extend((rule_spec, columns.index(column) + col_offset) for column in selected)
+        
+        self._plan_conditional_ranges(ws, (tuple(columns), col_offset), rules, first_row, last_row)
+    
+    def _plan_conditional_ranges(self, ws, table_key, rules, first_row, last_row):
+        """
+        Добавление диапазонов строк first_row..last_row в план условного форматирования
+        
+        Args:
+            ws: Лист
+            table_key: Структура таблицы (колонки, первая колонка)
+            rules: Список (правило, номер колонки)
+            first_row: Первая строка данных
+            last_row: Последняя строка данных
+        """
+        # Соседние таблицы одинаковой структуры на одном листе объединяются
+        plan_key = (id(ws), table_key)
+        if plan_key != self._cf_plan_key:
+            self._apply_conditional_formatting()
+            self._cf_plan_key = plan_key
+        
+        for rule_spec, col_idx in rules:
+            rule_key = (id(ws), self._conditional_rule_signature(rule_spec), col_idx)
+            if rule_spec.get('merge', True) is False:
+                # Правило не объединяется с правилами других таблиц (в том числе групп той же секции)
+                rule_key += (first_row,)
+            ranges = self._cf_plan.setdefault(rule_key, (ws, rule_spec, []))[2]
+            ranges.append(range_address(first_row, col_idx, last_row, col_idx))
+        
+        if self._fragment_recording is not None:
+            self._fragment_recording.append((table_key, rules, first_row, last_row))
+    
+    @staticmethod
+    def _conditional_rule_signature(rule_spec):
+        """Ключ правила условного форматирования без учета выбора колонок"""
+        params = {key: value for key, value in rule_spec.items() if key not in ('column', 'columns')}
+        return json.dumps(params, sort_keys=True, default=str)
+    
+    def _apply_conditional_formatting(self):
+        """Добавление запланированных правил условного форматирования на листы"""
+        for ws, rule_spec, ranges in self._cf_plan.values():
+            rule = self._build_conditional_rule(rule_spec, ranges[0].split(':')[0])
+            if rule is not None:
+                ws.conditional_formatting.add(' '.join(ranges), rule)
+        
+        self._cf_plan = {}
+        self._cf_plan_key = None
+    
+    def _build_conditional_rule(self, rule_spec, first_cell):
+        """Создание правила openpyxl по спецификации условного форматирования"""
+        rule_type = rule_spec.get('type', 'color_scale')
+        
+        if rule_type == 'color_scale':
+            if rule_spec.get('mid_color', 'FFEB9C') is None:
+                return ColorScaleRule(
+                    start_type='min', start_color=rule_spec.get('start_color', 'F8696B'),
+                    end_type='max', end_color=rule_spec.get('end_color', '63BE7B')
                 )
-                self.ws.conditional_formatting.add(range_str, rule)
+            return ColorScaleRule(
+                start_type='min', start_color=rule_spec.get('start_color', 'F8696B'),
+                mid_type='percentile', mid_value=rule_spec.get('mid_percentile', 50),
+                mid_color=rule_spec.get('mid_color', 'FFEB9C'),
+                end_type='max', end_color=rule_spec.get('end_color', '63BE7B')
+            )
+        
+        fill = PatternFill(start_color=rule_spec.get('fill', 'FFC7CE'),
+                           end_color=rule_spec.get('fill', 'FFC7CE'), fill_type='solid')
+        font = Font(color=rule_spec.get('font_color', '9C0006'))
+        
+        if rule_type == 'data_bar':
+            return DataBarRule(start_type='min', end_type='max',
+                               color=rule_spec.get('color', '638EC6'),
+                               showValue=rule_spec.get('show_value', True))
+        elif rule_type == 'cell_is':
+            value = rule_spec.get('value', 0)
+            values = value if isinstance(value, (list, tuple)) else [value]
+            formula = [f'"{item}"' if isinstance(item, str) else str(item) for item in values]
+            return CellIsRule(operator=rule_spec.get('operator', 'greaterThan'), formula=formula,
+                              fill=fill, font=font)
+        elif rule_type == 'top_n':
+            return Rule(type='top10', rank=rule_spec.get('rank', 10),
+                        percent=rule_spec.get('percent', False),
+                        bottom=rule_spec.get('bottom', False),
+                        dxf=DifferentialStyle(fill=fill, font=font))
+        elif rule_type == 'formula':
+            # {cell} - первая ячейка диапазона, относительно которой вычисляется формула
+            formula = str(rule_spec.get('formula', '')).replace('{cell}', first_cell).lstrip('=')
+            return FormulaRule(formula=[formula], fill=fill, font=font)
+        
+        print(f"Неподдерживаемый тип условного форматирования: {rule_type}")
+        return None
     
     def _apply_advanced_formatting(self):
         """Применение продвинутого форматирования"""
-        # Автоподбор ширины колонок
-        for column in self.ws.columns:
-            max_length = 0
-            column_letter = None
-            
-            for cell in column:
-                # Пропускаем объединенные ячейки
-                if hasattr(cell, 'column_letter'):
-                    column_letter = cell.column_letter
-                    try:
-                        if cell.value and len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-            
-            if column_letter:
-                adjusted_width = min(max_length + 2, 50)
-                self.ws.column_dimensions[column_letter].width = adjusted_width
+        # Автоподбор ширины колонок на всех листах отчета
+        for ws in self.wb.worksheets:
+            self._autofit_columns(ws)
         
         # Закрепление области
-        self.ws.freeze_panes = 'A4'
+        self.wb.worksheets[0].freeze_panes = 'A4'
+    
+    def _apply_chart_layout(self):
+        """Привязка графиков к колонкам по их смещению (после автоподбора ширины колонок)"""
+        for ws, anchor, first_col, x_offset in self._chart_anchors:
+            resolve_anchor_column(anchor, ws, first_col, x_offset)
+    
+    def _autofit_columns(self, ws):
+        """Автоподбор ширины колонок листа"""
+        max_lengths = {}
+            
+        for (row, col_idx), cell in ws._cells.items():
+            # Пропускаем объединенные ячейки
+            if isinstance(cell, MergedCell):
+                continue
+            max_lengths.setdefault(col_idx, 0)
+            value = cell._value
+            if cell.data_type == 'f':
+                # Для формул учитываем рассчитанное значение, а не текст формулы
+                value = self._cached_values.get((id(ws), row, col_idx))
+                value = f"{value:,.2f}" if isinstance(value, (int, float)) else None
+            if value and len(str(value)) > max_lengths[col_idx]:
+                max_lengths[col_idx] = len(str(value))
+            
+        # Строки хранилищ бэкенда не создают ячеек - их длины считаются по значениям
+        for col_idx, length in self.writer.column_lengths(ws).items():
+            max_lengths[col_idx] = max(max_lengths.get(col_idx, 0), length)
+        
+        if not max_lengths:
+            return
+        
+        # Колонки без значений внутри заполненного диапазона получают минимальную ширину
+        for col_idx in range(min(max_lengths), max(max_lengths) + 1):
+            adjusted_width = min(max_lengths.get(col_idx, 0) + 2, 50)
+            ws.column_dimensions[COLUMN_LETTERS[col_idx]].width = adjusted_width
     
     def _add_image_section(self, section_data, start_row):
         """Добавление секции с изображением"""
@@ -455,7 +1946,7 @@ class AdvancedExcelRenderer:
                 excel_img.height = height
                 
                 # Добавляем изображение в лист
-                self.ws.add_image(excel_img, anchor)
+                self._add_media(excel_img, anchor)
                 
                 # Добавляем описание если есть
                 if description:
@@ -493,11 +1984,27 @@ class AdvancedExcelRenderer:
             print(f"Неподдерживаемый тип рисования: {drawing_type}")
             return start_row + 2
     
+    def _add_media(self, image, anchor):
+        """Изображение на текущем листе (объем изображений учитывается в прогрессе)"""
+        self.ws.add_image(image, anchor)
+        self._progress.add_media(image_size(image))
+    
     def _load_image_from_url(self, url):
         """Загрузка изображения из URL"""
+        if url in self.image_cache:
+            content = self.image_cache[url]
+            if content is None:
+                print(f"Ошибка загрузки изображения из URL {url}: изображение не было загружено")
+                return None
+            return Image(BytesIO(content))
+        
         try:
             response = requests.get(url, timeout=10)
             response.raise_for_status()
+            # Загрузки кешируются в пределах IMAGE_CACHE_MAX_MB, сверх него изображения не запоминаются
+            if self._image_cache_bytes + len(response.content) <= IMAGE_CACHE_MAX_MB * 1024 * 1024:
+                self.image_cache[url] = response.content
+                self._image_cache_bytes += len(response.content)
             return Image(BytesIO(response.content))
         except Exception as e:
             print(f"Ошибка загрузки изображения из URL {url}: {e}")
@@ -541,6 +2048,7 @@ class AdvancedExcelRenderer:
             return start_row
 
         df = pd.DataFrame(data)
+        number_style, other_style = self._row_styles(section_data)
         
         # Заголовки таблицы
         for col_idx, column in enumerate(df.columns, 1):
@@ -589,14 +2097,14 @@ class AdvancedExcelRenderer:
                             excel_img.height = img_height
                             
                             # Добавляем изображение в ячейку
-                            cell_address = f"{chr(64 + col_idx)}{current_row}"
-                            self.ws.add_image(excel_img, cell_address)
+                            col_letter = COLUMN_LETTERS[col_idx]
+                            cell_address = f"{col_letter}{current_row}"
+                            self._add_media(excel_img, cell_address)
                             
                             # Устанавливаем высоту строки
                             row_height = max(row_height, img_height + 10)
                             
                             # Устанавливаем ширину колонки
-                            col_letter = chr(64 + col_idx)
                             current_width = self.ws.column_dimensions[col_letter].width or 10
                             new_width = max(current_width, (img_width / 7) + 2)
                             self.ws.column_dimensions[col_letter].width = new_width
@@ -612,14 +2120,18 @@ class AdvancedExcelRenderer:
                     # Обычные данные
                     cell.value = value
                     if isinstance(value, (int, float)):
-                        cell.style = "number_style"
+                        cell.style = number_style
                     else:
-                        cell.style = "data_style"
+                        cell.style = other_style
             
             # Устанавливаем высоту строки
             self.ws.row_dimensions[current_row].height = row_height
             current_row += 1
         
+            if (row_idx + 1) % self._progress.interval == 0:
+                self._progress.advance(self._progress.interval)
+        
+        self._progress.advance(len(df) % self._progress.interval)
         return current_row + 1
     
     def _create_diagram(self, config, start_row):
@@ -666,7 +2178,7 @@ class AdvancedExcelRenderer:
             excel_img.width = img_width // 2  # Масштабируем для Excel
             excel_img.height = img_height // 2
             
-            self.ws.add_image(excel_img, f'B{start_row}')
+            self._add_media(excel_img, f'B{start_row}')
             
         except Exception as e:
             print(f"Ошибка добавления диаграммы в Excel: {e}")
@@ -873,7 +2385,7 @@ class AdvancedExcelRenderer:
             excel_img.width = img_width // 2
             excel_img.height = img_height // 2
             
-            self.ws.add_image(excel_img, f'B{start_row}')
+            self._add_media(excel_img, f'B{start_row}')
             
         except Exception as e:
             print(f"Ошибка добавления инфографики в Excel: {e}")
@@ -1019,21 +2531,111 @@ class AdvancedExcelRenderer:
             excel_img.width = img_width // 2
             excel_img.height = img_height // 2
             
-            self.ws.add_image(excel_img, f'B{start_row}')
+            self._add_media(excel_img, f'B{start_row}')
             
         except Exception as e:
             print(f"Ошибка добавления пользовательского рисунка в Excel: {e}")
         
         return start_row + int(img_height / 30) + 2
 
+    def fill_template(self, template, data):
+        """
+        Отчет по книге-шаблону .xlsx: копия шаблона, заполненная данными
+        
+        Шаблон читается один раз на процесс; для каждого отчета копируется книга
+        шаблона, рендерятся ячейки с {{ ... }}, заполняются именованные ячейки,
+        а строки данных (список, DataFrame или итератор) пишутся в таблицы Excel
+        и именованные диапазоны шаблона с их оформлением.
+        
+        Args:
+            template: Путь к файлу шаблона или WorkbookTemplate
+            data: Данные отчета {имя: значение или строки}
+        
+        Returns:
+            Заполненная книга (сохраняется save_report)
+        """
+        self._start_profile()
+        with self._measure('template'):
+            return self._fill_template(template, data)
+    
+    def _fill_template(self, template, data):
+        """Копия книги-шаблона, заполненная данными (профилируемая часть fill_template)"""
+        if not isinstance(template, WorkbookTemplate):
+            template = load_workbook_template(template)
+        if self.writer.name == 'xlsxwriter':
+            print("Предупреждение: движок 'xlsxwriter' записывает книгу заново - "
+                  "настройки печати и именованные диапазоны шаблона не сохраняются")
+        
+        self._start_workbook(workbook=template.clone())
+        try:
+            template.fill(self.wb, data, self.writer, progress=self._progress)
+        except ReportCancelledError:
+            self._discard_workbook()
+            raise
+        return self.wb
+    
     def save_report(self, filename):
-        """Сохранение отчета"""
-        self.wb.save(filename)
+        """Сохранение отчета (с profile=True профиль записывается рядом с файлом отчета)"""
+        try:
+            self._progress.set_phase('save')
+        except ReportCancelledError:
+            self._discard_workbook()
+            raise
+        with self._measure('save'):
+            self.writer.save(self.wb, filename)
+        self._progress.set_phase('done')
+        
+        if self.profiler is not None and isinstance(filename, (str, os.PathLike)):
+            self.profiler.write(filename)
         return filename
 
 
-def create_complex_report_template():
-    """Создание шаблона для сложного отчета"""
+# Секции отчета, лимит строк листа, реестр и стили отчета в процессе пула параллельной отрисовки
+_worker_sections = None
+_worker_max_rows = None
+_worker_style_registry = None
+_worker_report_styles = None
+
+
+def _init_section_worker(worker_pids, sections, max_rows_per_sheet, style_registry, report_styles):
+    """Инициализация процесса пула параллельной отрисовки секций (PID процесса - в очередь worker_pids)"""
+    global _worker_sections, _worker_max_rows, _worker_style_registry, _worker_report_styles
+    worker_pids.put(os.getpid())
+    _worker_sections = sections
+    _worker_max_rows = max_rows_per_sheet
+    _worker_style_registry = style_registry
+    _worker_report_styles = report_styles
+
+
+def _terminate_section_workers(worker_pids, count):
+    """Остановка count процессов пула по PID из очереди worker_pids"""
+    for _ in range(count):
+        try:
+            pid = worker_pids.get(timeout=WORKER_START_TIMEOUT)
+        except queue.Empty:
+            return  # Процесс не запустился за отведенное время
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass  # Процесс уже завершился
+
+
+def _render_section_fragment(index):
+    """Отрисовка секции на отдельной книге во фрагмент (выполняется в процессе пула)"""
+    renderer = AdvancedExcelRenderer(max_rows_per_sheet=_worker_max_rows, engine='fast',
+                                     style_registry=_worker_style_registry)
+    renderer._start_workbook(_worker_report_styles)
+    _, fragment = renderer._render_and_capture(attach_sources(_worker_sections[index]), 1)
+    return fragment
+
+
+def create_complex_report_template(save_path='complex_report_template.json'):
+    """
+    Создание шаблона для сложного отчета
+    
+    Args:
+        save_path: Файл для сохранения конфигурации шаблона (None - не сохранять)
+    """
     template_data = {
         "title": "{{report_title}}",
         "subtitle": "Период: {{period_start}} - {{period_end}} | Создан: {{creation_date}}",
@@ -1075,8 +2677,9 @@ def create_complex_report_template():
     }
     
     # Сохраняем конфигурацию шаблона
-    with open('complex_report_template.json', 'w', encoding='utf-8') as f:
-        json.dump(template_data, f, ensure_ascii=False, indent=2)
+    if save_path:
+        with open(save_path, 'w', encoding='utf-8') as f:
+            json.dump(template_data, f, ensure_ascii=False, indent=2)
     
     return template_data
 
@@ -1173,19 +2776,28 @@ def generate_sample_data():
     }
 
 
-def render_template_with_data(template_data, context_data):
-    """Рендеринг шаблона с данными используя Jinja2"""
+def render_template_with_data(template_data, context_data, environment=None):
+    """
+    Рендеринг шаблона с данными используя Jinja2
+    
+    Строка, целиком состоящая из ссылки на данные ("{{detailed_analytics}}"),
+    заменяется самим значением из контекста (списком, числом, словарем),
+    остальные строки с разметкой Jinja2 рендерятся в строку.
+    Для многократного рендеринга больших шаблонов см. template_compiler.
+    
+    Args:
+        template_data: Шаблон отчета
+        context_data: Данные для подстановки
+        environment: TemplateEnvironment (по умолчанию - общее окружение процесса)
+    """
+    if environment is None:
+        environment = get_template_environment()
     
     def render_recursive(obj, context):
         """Рекурсивный рендеринг объекта"""
         if isinstance(obj, str):
             if "{{" in obj or "{%" in obj:
-                try:
-                    template = Template(obj)
-                    return template.render(**context)
-                except Exception as e:
-                    print(f"Ошибка рендеринга шаблона: {e}")
-                    return obj
+                return environment.render_value(obj, context)
             return obj
         elif isinstance(obj, dict):
             return {key: render_recursive(value, context) for key, value in obj.items()}
@@ -1194,33 +2806,5 @@ def render_template_with_data(template_data, context_data):
         else:
             return obj
     
-    # Сначала обрабатываем простые подстановки
-    rendered = render_recursive(template_data, context_data)
-    
-    # Затем обрабатываем прямые ссылки на данные
-    def resolve_data_references(obj, context):
-        """Разрешение прямых ссылок на данные"""
-        if isinstance(obj, str):
-            # Проверяем, является ли строка ссылкой на данные
-            if obj.startswith("{{") and obj.endswith("}}"):
-                key = obj[2:-2].strip()
-                # Поддержка вложенных ключей (например, summary.total_revenue)
-                try:
-                    value = context
-                    for part in key.split('.'):
-                        value = value[part]
-                    return value
-                except (KeyError, TypeError):
-                    print(f"Не найден ключ: {key}")
-                    return obj
-            return obj
-        elif isinstance(obj, dict):
-            return {key: resolve_data_references(value, context) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [resolve_data_references(item, context) for item in obj]
-        else:
-            return obj
-    
-    return resolve_data_references(rendered, context_data)
-
-
+    return render_recursive(template_data, context_data)
+    
\ No newline at end of file
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Асинхронный рендеринг отчетов для сервисов на asyncio
+
+Изображения по URL загружаются заранее и параллельно (aiohttp, если установлен,
+иначе requests в потоках), построение книги и рисование PIL выполняются
+в пуле исполнителей, не блокируя цикл событий. Для каждого отчета можно задать
+таймаут; отмена или таймаут останавливают построение книги при ближайшей проверке
+токена отмены в циклах записи строк.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import requests
+
+from advanced_report_generator import AdvancedExcelRenderer, render_template_with_data
+from report_progress import CancellationToken, ReportCancelledError
+
+try:
+    import aiohttp
+except ImportError:  # Загрузка через requests в потоках
+    aiohttp = None
+
+
+# Таймаут загрузки одного изображения, секунды
+IMAGE_DOWNLOAD_TIMEOUT = 10
+
+# Одновременных загрузок изображений на отчет
+MAX_CONCURRENT_DOWNLOADS = 8
+
+
+def collect_image_urls(report_data):
+    """URL изображений секций-изображений и колонок с изображениями в таблицах отчета"""
+    urls = []
+    
+    for section in report_data.get('sections', []):
+        if not isinstance(section, dict):
+            continue
+        
+        image_config = section.get('image_config') or {}
+        if section.get('type') == 'image' and image_config.get('type', 'url') == 'url' and image_config.get('source'):
+            urls.append(image_config['source'])
+        
+        image_columns = section.get('image_columns') or []
+        data = section.get('data')
+        if not image_columns or not isinstance(data, list):
+            continue
+        
+        for row in data:
+            if not isinstance(row, dict):
+                continue
+            for column in image_columns:
+                value = row.get(column)
+                if isinstance(value, dict):
+                    if value.get('type', 'url') == 'url' and value.get('source'):
+                        urls.append(value['source'])
+                elif value and str(value).startswith('http'):
+                    urls.append(str(value))
+    
+    # Порядок сохраняется, повторы загружаются один раз
+    return list(dict.fromkeys(urls))
+
+
+def _render_report(report_data, renderer_options, image_cache, cancel_token=None):
+    """Построение книги и сохранение в память (выполняется в пуле исполнителей)"""
+    renderer = AdvancedExcelRenderer(cancel_token=cancel_token, image_cache=image_cache, **renderer_options)
+    renderer.create_collapsible_report(report_data)
+    
+    buffer = BytesIO()
+    renderer.save_report(buffer)
+    return buffer.getvalue()
+
+
+class AsyncExcelRenderer:
+    """Асинхронная обертка над AdvancedExcelRenderer"""
+    
+    def __init__(self, executor=None, max_concurrent_downloads=MAX_CONCURRENT_DOWNLOADS,
+                 image_timeout=IMAGE_DOWNLOAD_TIMEOUT, cancel_token=None, image_cache=None, **renderer_options):
+        """
+        Args:
+            executor: Пул исполнителей для построения книги (по умолчанию - пул
+                потоков цикла событий). В пуле процессов отчет нельзя остановить
+                после начала построения.
+            max_concurrent_downloads: Одновременных загрузок изображений на отчет
+            image_timeout: Таймаут загрузки одного изображения, секунды
+            cancel_token: CancellationToken, отменяющий все отчеты этого рендерера
+                (вместе с собственной отменой каждого отчета при таймауте)
+            image_cache: Заранее загруженные изображения {URL: содержимое}: не загружаются
+                повторно; загрузки отчетов в этот словарь не добавляются
+            renderer_options: Остальные параметры конструктора AdvancedExcelRenderer
+        """
+        self.executor = executor
+        self.max_concurrent_downloads = max_concurrent_downloads
+        self.image_timeout = image_timeout
+        self.cancel_token = cancel_token
+        self.image_cache = image_cache or {}
+        self.renderer_options = renderer_options
+    
+    async def render(self, report_data, timeout=None):
+        """
+        Построение отчета
+        
+        Args:
+            report_data: Данные отчета (как для create_collapsible_report)
+            timeout: Предельное время построения отчета в секундах
+        
+        Returns:
+            Содержимое файла отчета (bytes)
+        
+        Raises:
+            asyncio.TimeoutError: Отчет не построен за timeout секунд
+        """
+        return await asyncio.wait_for(self._render(report_data), timeout)
+    
+    async def render_template(self, template_data, context_data, timeout=None):
+        """Подстановка данных в шаблон и построение отчета"""
+        async def render():
+            loop = asyncio.get_running_loop()
+            report_data = await loop.run_in_executor(
+                self.executor, render_template_with_data, template_data, context_data
+            )
+            return await self._render(report_data)
+        
+        return await asyncio.wait_for(render(), timeout)
+    
+    async def save_report(self, report_data, filename, timeout=None):
+        """Построение отчета и запись в файл"""
+        content = await self.render(report_data, timeout)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_file, filename, content)
+        return filename
+    
+    @staticmethod
+    def _write_file(filename, content):
+        with open(filename, 'wb') as report_file:
+            report_file.write(content)
+    
+    async def _render(self, report_data):
+        """Загрузка изображений и построение книги в пуле исполнителей"""
+        # Изображения загружаются в словарь отчета: между отчетами хранятся только переданные заранее
+        urls = [url for url in collect_image_urls(report_data) if url not in self.image_cache]
+        image_cache = dict(self.image_cache, **await self.prefetch_images(urls))
+        
+        # Токен отмены не передается в другой процесс
+        if isinstance(self.executor, ProcessPoolExecutor):
+            cancel_token = None
+        else:
+            cancel_token = CancellationToken(parent=self.cancel_token)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor, _render_report, report_data, self.renderer_options, image_cache, cancel_token
+        )
+        
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Поток исполнителя не прерывается - построение останавливается токеном отмены
+            if cancel_token is not None:
+                cancel_token.cancel()
+            raise
+    
+    async def prefetch_images(self, urls):
+        """
+        Параллельная загрузка изображений
+        
+        Returns:
+            Словарь {URL: содержимое или None, если загрузить не удалось}
+        """
+        if not urls:
+            return {}
+        
+        semaphore = asyncio.Semaphore(self.max_concurrent_downloads)
+        
+        if aiohttp is not None:
+            timeout = aiohttp.ClientTimeout(total=self.image_timeout)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                contents = await asyncio.gather(
+                    *(self._download_aiohttp(session, semaphore, url) for url in urls)
+                )
+        else:
+            contents = await asyncio.gather(*(self._download_requests(semaphore, url) for url in urls))
+        
+        return dict(zip(urls, contents))
+    
+    async def _download_aiohttp(self, session, semaphore, url):
+        """Загрузка изображения через aiohttp"""
+        async with semaphore:
+            try:
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    return await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Ошибка загрузки изображения из URL {url}: {e}")
+                return None
+    
+    async def _download_requests(self, semaphore, url):
+        """Загрузка изображения через requests в отдельном потоке"""
+        async with semaphore:
+            try:
+                response = await asyncio.to_thread(requests.get, url, timeout=self.image_timeout)
+                response.raise_for_status()
+                return response.content
+            except requests.RequestException as e:
+                print(f"Ошибка загрузки изображения из URL {url}: {e}")
+                return None
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк генерации больших отчетов
+Измеряет время рендеринга и сохранения, пиковую память процесса и размер файла.
+Каждый сценарий запускается в отдельном процессе, чтобы пиковая память не смешивалась.
+Сценарии strings-* сравнивают хранение строк таблицы (движок fast),
+engine-* - движки записи (ячейки в секунду),
+budget-* - те же движки с лимитом памяти строк 64 МБ.
+С ключом --template-copies сравнивает рекурсивную подстановку данных в шаблон
+с предкомпилированным шаблоном.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from advanced_report_generator import (AdvancedExcelRenderer, create_complex_report_template,
+                                       generate_sample_data, render_template_with_data)
+from template_compiler import compile_template
+
+
+# Сценарии: (параметры рендерера, параметры секции)
+SCENARIOS = {
+    "strings-auto": ({"engine": "fast"}, {"string_storage": "auto"}),
+    "strings-shared": ({"engine": "fast"}, {"string_storage": "shared"}),
+    "strings-inline": ({"engine": "fast"}, {"string_storage": "inline"}),
+    "engine-openpyxl": ({"engine": "openpyxl"}, {}),
+    "engine-fast": ({"engine": "fast"}, {}),
+    "engine-xlsxwriter": ({"engine": "xlsxwriter"}, {}),
+    "budget-fast": ({"engine": "fast", "memory_budget_mb": 64}, {}),
+    "budget-xlsxwriter": ({"engine": "xlsxwriter", "memory_budget_mb": 64}, {}),
+}
+
+
+def generate_detailed_analytics(rows, seed=42):
+    """Генерация строк в формате detailed_analytics из generate_sample_data()"""
+    rnd = random.Random(seed)
+    products = ["Смартфон", "Ноутбук", "Куртка", "Книга"]
+    statuses = ["Выполнен", "В обработке", "Отменен"]
+    base_date = datetime(2024, 1, 1)
+    
+    return [
+        {
+            "order_id": f"ORD-{1000 + i}",
+            "customer": f"Клиент {i + 1}",
+            "product": rnd.choice(products),
+            "amount": rnd.randint(500, 5000),
+            "date": (base_date + timedelta(days=rnd.randint(1, 365))).strftime("%d.%m.%Y"),
+            "status": rnd.choice(statuses)
+        }
+        for i in range(rows)
+    ]
+
+
+def peak_memory_mb():
+    """Пиковая резидентная память текущего процесса в МБ"""
+    if resource is None:
+        return float('nan')
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS - байты
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+def run_scenario(name, rows, output_dir, results):
+    """Запуск одного сценария (в отдельном процессе)"""
+    renderer_options, section_options = SCENARIOS[name]
+    
+    data = generate_detailed_analytics(rows)
+    memory_after_data = peak_memory_mb()
+    
+    report = {
+        "title": f"Бенчмарк: {name}",
+        "sections": [
+            dict({"title": "Детальная аналитика", "type": "table", "data": data}, **section_options)
+        ]
+    }
+    
+    started = time.perf_counter()
+    renderer = AdvancedExcelRenderer(**renderer_options)
+    renderer.create_collapsible_report(report)
+    rendered = time.perf_counter()
+    
+    filename = os.path.join(output_dir, f"benchmark_{name}.xlsx")
+    renderer.save_report(filename)
+    saved = time.perf_counter()
+    
+    results.put({
+        "scenario": name,
+        "rows": rows,
+        "render_s": rendered - started,
+        "save_s": saved - rendered,
+        "data_mb": memory_after_data,
+        "peak_mb": peak_memory_mb(),
+        "file_mb": os.path.getsize(filename) / (1024 * 1024),
+        "cells_per_s": rows * len(data[0]) / (saved - started) if data else 0.0,
+    })
+
+
+def run_template_benchmark(copies, repeats=20):
+    """Сравнение render_template_with_data и скомпилированного шаблона"""
+    template = create_complex_report_template(save_path=None)
+    template["sections"] = [
+        dict(section, title=f"{section['title']} {i + 1}")
+        for i in range(copies) for section in template["sections"]
+    ]
+    context = generate_sample_data()
+    
+    started = time.perf_counter()
+    for _ in range(repeats):
+        render_template_with_data(template, context)
+    recursive = (time.perf_counter() - started) / repeats
+    
+    started = time.perf_counter()
+    compiled = compile_template(template)
+    compile_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for _ in range(repeats):
+        compiled.render(context)
+    rendered = (time.perf_counter() - started) / repeats
+    
+    print(f"📏 Секций в шаблоне: {len(template['sections']):,}")
+    print(f"{'Рекурсивно, мс':>15} {'Компиляция, мс':>15} {'Компил., мс':>12} {'Ускорение':>10}")
+    print(f"{recursive * 1000:>15.2f} {compile_time * 1000:>15.2f} {rendered * 1000:>12.2f} "
+          f"{recursive / rendered:>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк генерации больших отчетов")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Количество строк таблицы")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS),
+                        help="Запускаемые сценарии")
+    parser.add_argument("--output-dir", default=None, help="Папка для файлов отчетов")
+    parser.add_argument("--template-copies", type=int, default=None,
+                        help="Сравнить рендеринг шаблона из стольких копий секций примера (без сценариев)")
+    args = parser.parse_args()
+    
+    if args.template_copies:
+        run_template_benchmark(args.template_copies)
+        return
+    
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="report_benchmark_")
+    os.makedirs(output_dir, exist_ok=True)
+    
+    print(f"📏 Строк: {args.rows:,}, файлы: {output_dir}")
+    print(f"{'Сценарий':<18} {'Рендер, с':>10} {'Сохр., с':>10} {'Данные, МБ':>11} {'Пик, МБ':>9} {'Файл, МБ':>9} {'Ячеек/с':>10}")
+    
+    for name in args.scenarios:
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run_scenario, args=(name, args.rows, output_dir, results))
+        process.start()
+        process.join()
+        
+        if process.exitcode != 0:
+            print(f"{name:<18} ❌ завершился с кодом {process.exitcode}")
+            continue
+        
+        result = results.get()
+        print(f"{result['scenario']:<18} {result['render_s']:>10.2f} {result['save_s']:>10.2f} "
+              f"{result['data_mb']:>11.1f} {result['peak_mb']:>9.1f} {result['file_mb']:>9.1f} {result['cells_per_s']:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
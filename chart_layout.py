@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Раскладка графиков на листе
+
+Размеры графиков задаются в сантиметрах и переводятся в EMU (English Metric Units,
+единицы разметки DrawingML). По реальной высоте графиков рассчитывается, сколько
+строк листа они занимают, а по ширине - смещение каждого графика в сетке.
+Горизонтальное смещение переводится в колонку и отступ внутри нее только после
+автоподбора ширины колонок, поэтому графики стоят вплотную независимо от данных.
+"""
+
+import math
+
+from openpyxl.drawing.spreadsheet_drawing import OneCellAnchor, AnchorMarker
+from openpyxl.drawing.xdr import XDRPositiveSize2D
+
+from excel_utils import COLUMN_LETTERS, EXCEL_MAX_COLUMNS
+
+
+EMU_PER_CM = 360000
+EMU_PER_PIXEL = 9525
+EMU_PER_POINT = 12700
+
+# Высота строки и ширина колонки листа по умолчанию
+DEFAULT_ROW_HEIGHT = 15  # пункты
+DEFAULT_COLUMN_WIDTH_PIXELS = 64
+
+# Ширина цифры шрифта по умолчанию (Calibri 11) в пикселях
+MAX_DIGIT_WIDTH_PIXELS = 7
+
+
+def cm_to_emu(value):
+    """Перевод сантиметров в EMU"""
+    return int(round(value * EMU_PER_CM))
+
+
+def column_width_emu(ws, col_idx):
+    """Ширина колонки листа в EMU с учетом заданной ширины"""
+    letter = COLUMN_LETTERS[col_idx]
+    # Обращение к column_dimensions создает запись, поэтому сначала проверяем наличие
+    width = ws.column_dimensions[letter].width if letter in ws.column_dimensions else None
+    if not width:
+        return DEFAULT_COLUMN_WIDTH_PIXELS * EMU_PER_PIXEL
+    
+    # Формула Excel перевода ширины в символах в пиксели
+    pixels = int((256 * width + int(128 / MAX_DIGIT_WIDTH_PIXELS)) / 256 * MAX_DIGIT_WIDTH_PIXELS)
+    return pixels * EMU_PER_PIXEL
+
+
+def rows_for_height(height_emu, row_height=DEFAULT_ROW_HEIGHT):
+    """Количество строк листа, которые занимает объект высотой height_emu"""
+    return max(1, math.ceil(height_emu / (row_height * EMU_PER_POINT)))
+
+
+class ChartGridLayout:
+    """Раскладка графиков сеткой: columns графиков в ряд, ряды друг под другом"""
+    
+    def __init__(self, columns=1, gap_cm=0.5):
+        """
+        Args:
+            columns: Количество графиков в ряду сетки
+            gap_cm: Промежуток между графиками в сантиметрах
+        """
+        self.columns = max(1, int(columns))
+        self.gap = cm_to_emu(gap_cm)
+    
+    def place(self, sizes):
+        """
+        Расчет положения графиков
+        
+        Args:
+            sizes: Список размеров графиков (ширина, высота) в EMU
+        
+        Returns:
+            (positions, rows): positions - список (смещение в строках, смещение по X в EMU)
+            для каждого графика, rows - количество строк, занятых сеткой
+        """
+        positions = []
+        row_offset = 0
+        
+        for first in range(0, len(sizes), self.columns):
+            grid_row = sizes[first:first + self.columns]
+            x_offset = 0
+            for width, _ in grid_row:
+                positions.append((row_offset, x_offset))
+                x_offset += width + self.gap
+            
+            # Следующий ряд сетки начинается ниже самого высокого графика ряда
+            row_height = max(height for _, height in grid_row)
+            row_offset += rows_for_height(row_height + self.gap)
+        
+        return positions, row_offset
+
+
+def make_anchor(row, col_idx, width_emu, height_emu):
+    """Привязка графика к ячейке с размером в EMU (строка и колонка с 1)"""
+    anchor = OneCellAnchor()
+    anchor._from = AnchorMarker(col=col_idx - 1, row=row - 1)
+    anchor.ext = XDRPositiveSize2D(cx=width_emu, cy=height_emu)
+    return anchor
+
+
+def resolve_anchor_column(anchor, ws, first_col, x_offset):
+    """
+    Перевод горизонтального смещения от колонки first_col в колонку и отступ привязки
+    
+    Вызывается после автоподбора ширины колонок листа.
+    """
+    col_idx = first_col
+    while col_idx < EXCEL_MAX_COLUMNS:
+        width = column_width_emu(ws, col_idx)
+        if x_offset < width:
+            break
+        x_offset -= width
+        col_idx += 1
+    
+    anchor._from.col = col_idx - 1
+    anchor._from.colOff = int(x_offset)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Общие фикстуры тестов: построение отчета и чтение итогов SUBTOTAL
+"""
+
+import re
+
+import pytest
+from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries
+
+from advanced_report_generator import AdvancedExcelRenderer
+
+
+# Движки записи, на которых проверяется одинаковый результат
+ENGINES = ('openpyxl', 'fast', 'xlsxwriter')
+
+SUBTOTAL_PATTERN = re.compile(r"^=SUBTOTAL\(9,(.+)\)$")
+
+
+def labelled_rows(wb):
+    """{подпись в колонке A: (лист, строка)} по всем листам"""
+    labels = {}
+    for ws in wb.worksheets:
+        for (cell,) in ws.iter_rows(max_col=1):
+            if isinstance(cell.value, str):
+                labels[cell.value.strip()] = (ws, cell.row)
+    return labels
+
+
+def subtotal_sum(wb, formula_ws, formula):
+    """Значение формулы SUBTOTAL(9, ...) листа formula_ws: сумма чисел диапазонов без вложенных итогов"""
+    match = SUBTOTAL_PATTERN.match(formula)
+    assert match, formula
+    
+    total = 0
+    for reference in match.group(1).split(','):
+        sheet, _, address = reference.rpartition('!')
+        ws = wb[sheet.strip("'").replace("''", "'")] if sheet else formula_ws
+        min_col, min_row, max_col, max_row = range_boundaries(address)
+        for row in ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col,
+                                values_only=True):
+            total += sum(value for value in row if isinstance(value, (int, float)))
+    return total
+
+
+def workbook_snapshot(wb):
+    """Значения, стили, объединения, группировка строк, таблицы и условное форматирование листов"""
+    snapshot = []
+    for ws in wb.worksheets:
+        cells = [(cell.coordinate, cell.value, cell.style, cell.number_format)
+                 for row in ws.iter_rows() for cell in row if cell.value is not None or cell.has_style]
+        rows = {index: (dimension.outline_level, bool(dimension.hidden))
+                for index, dimension in ws.row_dimensions.items() if dimension.outline_level or dimension.hidden}
+        snapshot.append({
+            'title': ws.title,
+            'cells': cells,
+            'merged': sorted(str(merged) for merged in ws.merged_cells.ranges),
+            'rows': rows,
+            'tables': sorted((table.displayName, table.ref) for table in ws.tables.values()),
+            'conditional_formatting': sorted(str(cf.sqref) for cf in ws.conditional_formatting),
+        })
+    return snapshot
+
+
+@pytest.fixture
+def render_report(tmp_path):
+    """Функция: построение, сохранение и чтение отчета из секций"""
+    def render(sections, engine='openpyxl', **options):
+        renderer = AdvancedExcelRenderer(engine=engine, **options)
+        renderer.create_collapsible_report({'title': "Отчет", 'sections': sections})
+        path = tmp_path / f"{engine}.xlsx"
+        renderer.save_report(path)
+        return load_workbook(path)
+    return render
+
+
+@pytest.fixture
+def subtotal_at():
+    """Функция: значение итога в строке с подписью label (колонка column)"""
+    def value(wb, label, column):
+        ws, row = labelled_rows(wb)[label]
+        return subtotal_sum(wb, ws, ws.cell(row=row, column=column).value)
+    return value
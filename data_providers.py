@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Ленивые источники данных секций
+
+Значение контекста шаблона может быть не только списком строк, но и функцией,
+итератором или поставщиком данных (DataProvider). Ссылка "{{key}}" подставляет
+в секцию сам источник, а строки читаются только когда рендерер дошел до секции,
+и передаются в таблицу порциями. Данные выключенных секций не загружаются вовсе.
+"""
+
+from collections.abc import Iterable, Iterator
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+class UncacheableDataError(TypeError):
+    """Данные без стабильного отпечатка: результат с ними не кешируется"""
+
+
+class DataProvider:
+    """
+    Базовый поставщик строк секции
+    
+    Наследники реализуют rows() - итератор словарей строк - и, если источник
+    можно идентифицировать без чтения, fingerprint() для кешей отчетов и секций.
+    """
+    
+    def rows(self):
+        """Итератор строк (словарей)"""
+        raise NotImplementedError
+    
+    def fingerprint(self):
+        """Стабильный отпечаток данных или None, если его нельзя получить без чтения"""
+        return None
+    
+    def __iter__(self):
+        return iter(self.rows())
+
+
+class CallableProvider(DataProvider):
+    """Поставщик, вызывающий функцию при обращении к данным"""
+    
+    def __init__(self, function, *args, fingerprint=None, **kwargs):
+        """
+        Args:
+            function: Функция, возвращающая список, итератор строк или DataFrame
+            args, kwargs: Аргументы функции
+            fingerprint: Отпечаток данных (например, версия или время обновления источника)
+        """
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self._fingerprint = fingerprint
+    
+    def rows(self):
+        return resolve_data(self.function(*self.args, **self.kwargs))
+    
+    def fingerprint(self):
+        return self._fingerprint
+
+
+def resolve_data(value):
+    """
+    Данные секции из ленивого источника
+    
+    Returns:
+        Список или итератор строк; прочие значения возвращаются без изменений
+    """
+    if isinstance(value, DataProvider):
+        return value.rows()
+    if callable(value) and not isinstance(value, type):
+        return resolve_data(value())
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return value.to_dict('records')
+    return value
+
+
+def needs_resolving(value):
+    """Значение - ленивый источник или DataFrame, а не готовый список строк"""
+    return isinstance(value, (DataProvider, Iterator)) or (callable(value) and not isinstance(value, type)) or \
+        (pd is not None and isinstance(value, pd.DataFrame))
+
+
+def resolve_section_data(section_data, stream=False):
+    """
+    Секция с прочитанными ленивыми источниками: data секции, ее групп и графиков
+    
+    Args:
+        section_data: Секция отчета
+        stream: data секции можно оставить итератором (таблицы и сводки пишутся потоково),
+            иначе строки собираются в список
+    
+    Исходная секция не изменяется; если ленивых источников нет, она и возвращается.
+    """
+    resolved = section_data
+    if needs_resolving(section_data.get('data')):
+        data = resolve_data(section_data['data'])
+        resolved = dict(section_data, data=_as_stream(data) if stream else _as_list(data))
+    
+    for nested_key in ('groups', 'charts'):
+        nested = section_data.get(nested_key)
+        if isinstance(nested, list) and any(isinstance(item, dict) and needs_resolving(item.get('data')) for item in nested):
+            if resolved is section_data:
+                resolved = dict(section_data)
+            resolved[nested_key] = [
+                dict(item, data=_as_list(resolve_data(item['data'])))
+                if isinstance(item, dict) and needs_resolving(item.get('data')) else item
+                for item in nested
+            ]
+    
+    return resolved
+
+
+def _as_stream(rows):
+    """Строки списком или итератором (прочие итерируемые источники - через iter)"""
+    if isinstance(rows, (list, Iterator, str, bytes, dict)) or not isinstance(rows, Iterable):
+        return rows
+    return iter(rows)
+
+
+def _as_list(rows):
+    """Строки списком (итераторы и прочие итерируемые источники читаются целиком)"""
+    if isinstance(rows, (list, str, bytes, dict)) or not isinstance(rows, Iterable):
+        return rows
+    return list(rows)
+
+
+def fingerprint_default(value):
+    """
+    Функция default для json.dumps при вычислении ключей кешей
+    
+    Поставщики представлены своим отпечатком; функции, итераторы и поставщики
+    без отпечатка делают значение некешируемым (UncacheableDataError).
+    """
+    if isinstance(value, DataProvider):
+        fingerprint = value.fingerprint()
+        if fingerprint is None:
+            raise UncacheableDataError(f"У поставщика данных {type(value).__name__} нет отпечатка")
+        return {'provider': type(value).__name__, 'fingerprint': fingerprint}
+    if isinstance(value, Iterator) or callable(value):
+        raise UncacheableDataError(f"Ленивые данные без отпечатка: {type(value).__name__}")
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return value.to_dict('records')
+    return str(value)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Источники данных секций: файлы и SQL-запросы
+
+Секция может вместо data содержать описание источника:
+
+    "source": {"format": "parquet", "path": "sales.parquet",
+               "columns": ["region", "sales"], "filters": [["sales", ">", 1000]]}
+
+Файл читается порциями во время отрисовки секции: декодируются только нужные
+колонки (columns и колонки фильтров), строки отбираются фильтрами до передачи
+в таблицу. С pyarrow Parquet читается через отображение файла в память
+с пропуском групп строк по статистике, CSV и JSON Lines - потоково;
+без pyarrow CSV и JSON Lines читаются порциями через pandas.
+
+Источник "type": "sql" выполняет запрос через DB-API соединение из пула
+(register_connection) и передает строки в таблицу порциями fetchmany:
+
+    "source": {"type": "sql", "connection": "warehouse",
+               "query": "SELECT region, sales FROM orders WHERE year = ?", "params": [2024]}
+"""
+
+import operator
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from data_providers import DataProvider
+
+try:
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.csv as pa_csv
+    import pyarrow.fs as pa_fs
+except ImportError:  # Чтение через pandas
+    pa_dataset = None
+
+
+# Строк в одной порции чтения
+SOURCE_CHUNK_SIZE = 50000
+
+# Форматы файлов по расширению
+SOURCE_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+# Строк в одной выборке fetchmany
+SQL_BATCH_SIZE = 5000
+
+# Соединений в пуле по умолчанию
+CONNECTION_POOL_SIZE = 4
+
+# Пулы соединений процесса по имени
+_connection_pools = {}
+_pools_lock = threading.Lock()
+
+# Операции фильтров: [колонка, операция, значение]
+FILTER_OPERATORS = {
+    '==': operator.eq,
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': None,
+    'not in': None,
+}
+
+
+class FileSource(DataProvider):
+    """Строки файла CSV, Parquet или JSON Lines с отбором колонок и строк"""
+    
+    def __init__(self, path, format=None, columns=None, filters=None, chunk_size=SOURCE_CHUNK_SIZE,
+                 delimiter=',', encoding='utf-8'):
+        """
+        Args:
+            path: Путь к файлу
+            format: "csv", "parquet" или "jsonl" (по умолчанию - по расширению файла)
+            columns: Колонки таблицы (по умолчанию все колонки файла)
+            filters: Условия отбора строк [[колонка, операция, значение], ...],
+                операции: ==, !=, <, <=, >, >=, in, not in
+            chunk_size: Строк в одной порции чтения
+            delimiter, encoding: Разделитель и кодировка CSV
+        
+        Raises:
+            ValueError: Неизвестный формат или неверный фильтр
+        """
+        self.path = path
+        self.format = (format or SOURCE_FORMATS.get(os.path.splitext(path)[1].lower(), '')).lower()
+        if self.format not in set(SOURCE_FORMATS.values()):
+            raise ValueError(f"Неизвестный формат файла источника: {path}")
+        
+        self.columns = list(columns) if columns else None
+        self.filters = [tuple(condition) for condition in filters or []]
+        for condition in self.filters:
+            if len(condition) != 3 or condition[1] not in FILTER_OPERATORS:
+                raise ValueError(f"Неверный фильтр источника {path}: {list(condition)}")
+        
+        self.chunk_size = chunk_size
+        self.delimiter = delimiter
+        self.encoding = encoding
+    
+    def fingerprint(self):
+        """Путь, размер и время изменения файла и параметры отбора"""
+        stat = os.stat(self.path)
+        return {
+            'path': os.path.abspath(self.path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'format': self.format,
+            'columns': self.columns,
+            'filters': self.filters,
+        }
+    
+    def rows(self):
+        for frame in self.frames():
+            yield from frame.to_dict('records')
+    
+    def frames(self):
+        """Порции строк файла (DataFrame) после отбора колонок и строк"""
+        if pa_dataset is not None and self._pyarrow_format() is not None:
+            return self._frames_pyarrow()
+        return self._frames_pandas()
+    
+    def _pyarrow_format(self):
+        if self.format == 'parquet':
+            return 'parquet'
+        if self.format == 'csv':
+            return pa_dataset.CsvFileFormat(
+                parse_options=pa_csv.ParseOptions(delimiter=self.delimiter),
+                read_options=pa_csv.ReadOptions(encoding=self.encoding)
+            )
+        # Формат JSON в pyarrow.dataset есть не во всех версиях
+        json_format = getattr(pa_dataset, 'JsonFileFormat', None)
+        return json_format() if json_format is not None else None
+    
+    def _frames_pyarrow(self):
+        """Чтение через pyarrow.dataset: фильтры применяются при сканировании файла"""
+        dataset = pa_dataset.dataset(
+            self.path,
+            format=self._pyarrow_format(),
+            filesystem=pa_fs.LocalFileSystem(use_mmap=True)
+        )
+        batches = dataset.to_batches(
+            columns=self.columns,
+            filter=self._filter_expression(),
+            batch_size=self.chunk_size
+        )
+        for batch in batches:
+            if batch.num_rows:
+                yield batch.to_pandas()
+    
+    def _filter_expression(self):
+        """Фильтры как выражение pyarrow (None - без фильтров)"""
+        expression = None
+        for column, op, value in self.filters:
+            field = pa_dataset.field(column)
+            if op == 'in':
+                condition = field.isin(value)
+            elif op == 'not in':
+                condition = ~field.isin(value)
+            else:
+                condition = FILTER_OPERATORS[op](field, value)
+            expression = condition if expression is None else expression & condition
+        return expression
+    
+    def _frames_pandas(self):
+        """Чтение порциями через pandas с отбором строк в каждой порции"""
+        needed = self._needed_columns()
+        
+        if self.format == 'csv':
+            chunks = pd.read_csv(self.path, usecols=needed, chunksize=self.chunk_size,
+                                 sep=self.delimiter, encoding=self.encoding)
+        elif self.format == 'jsonl':
+            chunks = pd.read_json(self.path, lines=True, chunksize=self.chunk_size,
+                                  dtype=False, convert_dates=False, encoding=self.encoding)
+        else:
+            # Parquet без pyarrow: pandas использует другой установленный движок (fastparquet)
+            frame = pd.read_parquet(self.path, columns=needed, filters=self.filters or None)
+            chunks = (frame.iloc[offset:offset + self.chunk_size]
+                      for offset in range(0, len(frame), self.chunk_size))
+        
+        with_filters = bool(self.filters)
+        for chunk in chunks:
+            if needed is not None:
+                chunk = chunk.reindex(columns=needed)
+            if with_filters:
+                chunk = chunk[self._filter_mask(chunk)]
+            if self.columns is not None:
+                chunk = chunk[self.columns]
+            if len(chunk):
+                yield chunk
+    
+    def _needed_columns(self):
+        """Колонки для чтения: колонки таблицы и колонки фильтров"""
+        if self.columns is None:
+            return None
+        return list(dict.fromkeys(self.columns + [column for column, _, _ in self.filters]))
+    
+    def _filter_mask(self, frame):
+        """Маска строк порции, удовлетворяющих всем фильтрам"""
+        mask = pd.Series(True, index=frame.index)
+        for column, op, value in self.filters:
+            series = frame[column]
+            if op in ('in', 'not in'):
+                condition = series.isin(value)
+                if op == 'not in':
+                    condition = ~condition
+            else:
+                condition = FILTER_OPERATORS[op](series, value)
+            mask &= condition
+        return mask
+
+
+class ConnectionPool:
+    """Пул DB-API соединений, общий для секций и отчетов"""
+    
+    def __init__(self, factory, max_size=CONNECTION_POOL_SIZE):
+        """
+        Args:
+            factory: Функция без аргументов, открывающая соединение DB-API
+                (для sqlite3 в нескольких потоках - с check_same_thread=False)
+            max_size: Наибольшее число открытых соединений
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+    
+    @contextmanager
+    def connection(self):
+        """Соединение из пула (ожидание, если все соединения заняты)"""
+        self._slots.acquire()
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self.factory()
+            
+            try:
+                yield connection
+            except BaseException:
+                # Соединение в неизвестном состоянии в пул не возвращается
+                self._close(connection)
+                raise
+            self._idle.put(connection)
+        finally:
+            self._slots.release()
+    
+    def close(self):
+        """Закрытие свободных соединений"""
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+    
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def register_connection(name, factory, max_size=CONNECTION_POOL_SIZE):
+    """
+    Регистрация именованного пула соединений для источников "type": "sql"
+    
+    Args:
+        name: Имя соединения в описаниях source
+        factory: Функция без аргументов, открывающая соединение DB-API
+        max_size: Наибольшее число открытых соединений
+    
+    Returns:
+        ConnectionPool
+    """
+    pool = ConnectionPool(factory, max_size)
+    with _pools_lock:
+        previous = _connection_pools.get(name)
+        _connection_pools[name] = pool
+    if previous is not None:
+        previous.close()
+    return pool
+
+
+def get_connection_pool(connection):
+    """
+    Пул соединений по имени, пулу или функции открытия соединения
+    
+    Raises:
+        ValueError: Соединение с таким именем не зарегистрировано
+    """
+    if isinstance(connection, ConnectionPool):
+        return connection
+    if callable(connection):
+        # Функция открытия соединения получает свой пул при первом использовании
+        with _pools_lock:
+            pool = _connection_pools.get(connection)
+            if pool is None:
+                pool = _connection_pools[connection] = ConnectionPool(connection)
+        return pool
+    
+    pool = _connection_pools.get(connection)
+    if pool is None:
+        raise ValueError(f"Соединение '{connection}' не зарегистрировано (см. register_connection)")
+    return pool
+
+
+class SqlSource(DataProvider):
+    """Результат SQL-запроса, читаемый порциями fetchmany"""
+    
+    def __init__(self, connection, query, params=None, batch_size=SQL_BATCH_SIZE, fingerprint=None):
+        """
+        Args:
+            connection: Имя зарегистрированного соединения, ConnectionPool
+                или функция, открывающая соединение DB-API
+            query: Текст запроса
+            params: Параметры запроса (в стиле параметров драйвера)
+            batch_size: Строк в одной выборке fetchmany
+            fingerprint: Отпечаток данных (например, версия витрины); без него
+                секция с запросом не кешируется
+        """
+        self.pool = get_connection_pool(connection)
+        self.query = query
+        self.params = params
+        self.batch_size = batch_size
+        self._fingerprint = fingerprint
+    
+    def fingerprint(self):
+        if self._fingerprint is None:
+            return None
+        return {'query': self.query, 'params': self.params, 'version': self._fingerprint}
+    
+    def rows(self):
+        """Строки запроса; соединение возвращается в пул после чтения последней строки"""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                if self.params is None:
+                    cursor.execute(self.query)
+                else:
+                    cursor.execute(self.query, self.params)
+                
+                # Заголовки колонок - из описания результата
+                columns = [description[0] for description in cursor.description or []]
+                while True:
+                    batch = cursor.fetchmany(self.batch_size)
+                    if not batch:
+                        break
+                    for row in batch:
+                        yield dict(zip(columns, row))
+            finally:
+                cursor.close()
+
+
+def open_source(spec):
+    """
+    Поставщик строк по описанию источника секции
+    
+    Args:
+        spec: Словарь source секции: файл (path, format, columns, filters и параметры
+            чтения) или запрос ("type": "sql", connection, query, params, batch_size)
+    
+    Raises:
+        ValueError: Неверное описание источника
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"Неверное описание источника данных: {spec}")
+    
+    options = dict(spec)
+    source_type = options.pop('type', 'file')
+    if source_type == 'sql':
+        if not options.get('query'):
+            raise ValueError(f"В описании SQL-источника нет запроса: {spec}")
+        return SqlSource(**options)
+    
+    if source_type != 'file' or not options.get('path'):
+        raise ValueError(f"В описании источника данных нет пути к файлу: {spec}")
+    return FileSource(**options)
+
+
+def attach_sources(section_data):
+    """
+    Секция с поставщиками строк вместо описаний source (в самой секции, ее группах и графиках)
+    
+    Исходная секция не изменяется. Файлы при этом не читаются: поставщик открывает
+    файл, только когда секция отрисовывается.
+    """
+    resolved = _attach_source(section_data)
+    
+    for nested_key in ('groups', 'charts'):
+        nested = section_data.get(nested_key)
+        if isinstance(nested, list) and any(isinstance(item, dict) and 'source' in item for item in nested):
+            if resolved is section_data:
+                resolved = dict(section_data)
+            resolved[nested_key] = [_attach_source(item) if isinstance(item, dict) else item
+                                    for item in nested]
+    
+    return resolved
+
+
+def _attach_source(section_data):
+    spec = section_data.get('source')
+    if spec is None or 'data' in section_data:
+        return section_data
+    
+    try:
+        provider = open_source(spec)
+        provider.fingerprint()  # Проверка, что файл источника существует
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Предупреждение: источник данных секции '{section_data.get('title', 'Unknown')}' недоступен: {e}")
+        provider = []
+    
+    resolved = dict(section_data, data=provider)
+    del resolved['source']
+    return resolved
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Прореживание рядов данных для графиков
+
+Графики по большим рядам строятся не по всем точкам, а по выборке заданного
+размера, сохраняющей форму ряда:
+- LTTB (Largest-Triangle-Three-Buckets) - для линий и трендов
+- min-max - минимум и максимум каждого интервала, сохраняет все пики
+"""
+
+import numpy as np
+
+
+# Методы прореживания
+DOWNSAMPLING_METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Индексы точек, выбранных алгоритмом Largest-Triangle-Three-Buckets
+    
+    Args:
+        x: Значения по оси X (числа, монотонно возрастающие)
+        y: Значения ряда
+        max_points: Количество точек в результате (не меньше 3)
+    
+    Returns:
+        Массив индексов выбранных точек по возрастанию
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    size = len(y)
+    
+    if max_points >= size or max_points < 3:
+        return np.arange(size)
+    
+    # Первая и последняя точки сохраняются, остальные делятся на корзины
+    bucket_size = (size - 2) / (max_points - 2)
+    edges = (np.arange(max_points - 1) * bucket_size).astype(np.int64) + 1
+    edges[-1] = size - 1
+    
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = size - 1
+    selected = 0
+    
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        
+        # Третья вершина треугольника - среднее следующей корзины (для последней - последняя точка)
+        if bucket + 2 < len(edges):
+            next_start, next_end = end, edges[bucket + 2]
+            next_x = x[next_start:next_end].mean()
+            next_y = y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        
+        # Удвоенная площадь треугольника для каждой точки корзины
+        areas = np.abs(
+            (x[selected] - next_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (next_y - y[selected])
+        )
+        selected = start + int(areas.argmax())
+        indices[bucket + 1] = selected
+    
+    return indices
+
+
+def min_max_indices(y, max_points):
+    """
+    Индексы минимума и максимума каждого интервала ряда
+    
+    Args:
+        y: Значения ряда
+        max_points: Предельное количество точек в результате
+    
+    Returns:
+        Массив индексов выбранных точек по возрастанию
+    """
+    y = np.asarray(y, dtype=float)
+    size = len(y)
+    
+    if max_points >= size or max_points < 4:
+        return np.arange(size)
+    
+    # Первая и последняя точки плюс по две точки на интервал
+    buckets = (max_points - 2) // 2
+    edges = np.linspace(1, size - 1, buckets + 1).astype(np.int64)
+    
+    indices = [0, size - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        bucket = y[start:end]
+        if np.isnan(bucket).all():
+            continue
+        indices.append(start + int(np.nanargmin(bucket)))
+        indices.append(start + int(np.nanargmax(bucket)))
+    
+    return np.unique(indices)
+
+
+def downsample_indices(x, series, max_points, method='lttb'):
+    """
+    Общая для всех рядов графика выборка точек
+    
+    Бюджет точек делится между рядами, выбранные индексы объединяются,
+    так что все ряды строятся по одним и тем же категориям.
+    
+    Args:
+        x: Значения по оси X или None (используются номера точек)
+        series: Список рядов значений одинаковой длины
+        max_points: Бюджет точек на график
+        method: 'lttb' или 'minmax'
+    
+    Returns:
+        Массив индексов выбранных точек по возрастанию
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Неизвестный метод прореживания: {method}. "
+                         f"Доступны: {', '.join(DOWNSAMPLING_METHODS)}")
+    
+    size = len(series[0]) if series else 0
+    if not series or size <= max_points:
+        return np.arange(size)
+    
+    if x is None:
+        x = np.arange(size)
+    
+    budget = max(max_points // len(series), 4)
+    selected = [
+        lttb_indices(x, values, budget) if method == 'lttb' else min_max_indices(values, budget)
+        for values in series
+    ]
+    
+    return np.unique(np.concatenate(selected))
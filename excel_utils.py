@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Общие константы и адресация ячеек Excel для всех писателей отчетов
+"""
+
+from itertools import product
+from string import ascii_uppercase
+
+
+# Ограничения листа Excel
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_COLUMNS = 16384
+
+
+def _build_column_letters():
+    """Построение таблицы буквенных обозначений всех колонок листа (A..XFD)"""
+    letters = [None]  # Колонки нумеруются с 1
+    for length in (1, 2, 3):
+        for combination in product(ascii_uppercase, repeat=length):
+            letters.append(''.join(combination))
+            if len(letters) > EXCEL_MAX_COLUMNS:
+                return tuple(letters)
+    return tuple(letters)
+
+
+# COLUMN_LETTERS[1] == 'A', COLUMN_LETTERS[EXCEL_MAX_COLUMNS] == 'XFD'
+COLUMN_LETTERS = _build_column_letters()
+
+
+def column_letter(col_idx):
+    """Буквенное обозначение колонки по ее номеру (с 1)"""
+    if not 1 <= col_idx <= EXCEL_MAX_COLUMNS:
+        raise ValueError(f"Номер колонки вне допустимого диапазона 1..{EXCEL_MAX_COLUMNS}: {col_idx}")
+    return COLUMN_LETTERS[col_idx]
+
+
+def cell_address(row, col_idx):
+    """Адрес ячейки вида B5"""
+    return f"{column_letter(col_idx)}{row}"
+
+
+def range_address(min_row, min_col, max_row, max_col):
+    """Адрес диапазона вида A1:C10"""
+    return f"{column_letter(min_col)}{min_row}:{column_letter(max_col)}{max_row}"
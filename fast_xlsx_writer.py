@@ -0,0 +1,666 @@
+#!/usr/bin/env python3
+"""
+Быстрая запись строк таблиц в обход объектов Cell openpyxl
+
+В режиме engine="fast" строки данных таблиц не создают объектов Cell и не
+назначают стили через StyleProxy: значения строки сохраняются кортежем
+в хранилище листа (FastRowStore) вместе с именами стилей, а группировка
+строк - диапазонами вместо объектов RowDimension на каждую строку. Остальное
+содержимое листа - заголовки, объединения, группировка строк, таблицы Excel
+с автофильтрами, условное форматирование, изображения и графики - остается
+в openpyxl. При сохранении книги openpyxl пишет XML листа как обычно,
+а строки хранилища сериализуются сразу в SpreadsheetML (заранее
+экранированные строки, индексы стилей, вычисленные один раз на книгу)
+и вставляются в sheetData на свои места.
+
+Строки SharedString (значения колонок, которые рендерер хранит общими
+строками) записываются в таблицу общих строк книги (sharedStrings.xml)
+и ссылаются на нее индексом; остальные строки хранятся в ячейках (inlineStr).
+
+С общим лимитом памяти (MemoryBudget) строки хранилищ при его превышении
+выгружаются во временные файлы блоками, упорядоченными по строкам,
+и читаются оттуда потоком при сохранении книги.
+"""
+
+import datetime
+import heapq
+import os
+import pickle
+import re
+import tempfile
+from copy import copy
+from itertools import chain
+from operator import itemgetter
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from openpyxl.cell.cell import ERROR_CODES, ILLEGAL_CHARACTERS_RE
+from openpyxl.compat.numbers import NUMERIC_TYPES
+from openpyxl.utils.datetime import to_excel
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.writer.excel import ExcelWriter
+from openpyxl.xml.constants import ARC_SHARED_STRINGS, ARC_WORKBOOK_RELS, SHARED_STRINGS, SHEET_MAIN_NS
+
+from excel_utils import COLUMN_LETTERS
+
+
+# Стили строк таблиц: числа и остальные значения (как при записи через openpyxl)
+TABLE_ROW_STYLES = ('number_style', 'data_style')
+
+# Наибольшая длина строки в ячейке Excel
+EXCEL_MAX_STRING_LENGTH = 32767
+
+# Экранированных строк в кеше сериализатора
+STRING_CACHE_SIZE = 100000
+
+# Строк листа, сериализуемых за одну запись в файл
+ROWS_PER_WRITE = 2000
+
+# Строк хранилища в одном блоке файла выгрузки
+ROWS_PER_SPILL_BLOCK = 10000
+
+# Оценка памяти строки хранилища и значения в ней без учета длины строк (байт)
+ROW_MEMORY_OVERHEAD = 200
+VALUE_MEMORY_OVERHEAD = 40
+
+DATE_TYPES = (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)
+
+_SHEET_DATA_PATTERN = re.compile(r'<sheetData\s*/>|<sheetData>(.*?)</sheetData>', re.S)
+_ROW_PATTERN = re.compile(r'<row r="(\d+)"([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+_CELL_PATTERN = re.compile(r'<c r="([A-Z]+)\d+"[^>]*?(?:/>|>.*?</c>)', re.S)
+_DIMENSION_PATTERN = re.compile(r'<dimension ref="[^"]*"\s*/>')
+
+# Конец потока строк в merge_store_rows: номер больше любой строки листа
+_NO_ROW = 1 << 31
+_NO_OUTLINE = (_NO_ROW, _NO_ROW, 0, False)
+
+
+class SharedString(str):
+    """Строка, которая записывается в таблицу общих строк книги, а не в ячейку"""
+    
+    __slots__ = ()
+
+
+class SharedStringPool(dict):
+    """
+    Общие строки колонки: одинаковые значения ссылаются на один объект SharedString
+    
+    Формулы, коды ошибок и слишком длинные строки остаются обычными строками.
+    """
+    
+    def __missing__(self, value):
+        if value[:1] == '=' or value in ERROR_CODES or len(value) > EXCEL_MAX_STRING_LENGTH:
+            shared = value
+        else:
+            shared = SharedString(value)
+        self[value] = shared
+        return shared
+
+
+class MemoryBudget:
+    """
+    Общий лимит памяти строк хранилищ листов
+    
+    При превышении лимита строки всех зарегистрированных хранилищ
+    выгружаются на диск, и учет памяти начинается заново.
+    """
+    
+    def __init__(self, limit_mb):
+        """
+        Args:
+            limit_mb: Лимит памяти строк хранилищ в МБ
+        """
+        self.limit = limit_mb * 1024 * 1024
+        self.used = 0
+        self.spills = 0
+        self.stores = []
+    
+    def register(self, store):
+        """Хранилище, строки которого учитываются в лимите"""
+        self.stores.append(store)
+    
+    def add(self, size):
+        """Учет size байт новых строк (с выгрузкой при превышении лимита)"""
+        self.used += size
+        if self.used > self.limit:
+            for store in self.stores:
+                store.spill()
+            self.used = 0
+            self.spills += 1
+
+
+class FastRowStore:
+    """Строки листа, записанные в обход объектов Cell"""
+    
+    def __init__(self, memory_budget=None):
+        """
+        Args:
+            memory_budget: MemoryBudget - строки сверх лимита выгружаются на диск
+        """
+        # {строка: (первая колонка, значения, стили)} в порядке записи
+        self.rows = {}
+        # Диапазоны группировки строк: (первая строка, последняя строка, уровень, скрыты)
+        self.outlines = []
+        self.max_row = 0
+        self.max_column = 0
+    
+        # Выгруженные на диск серии строк: [(первая строка, последняя строка, блоки)],
+        # блок - (смещение в файле, длина, первая строка, последняя строка)
+        self.memory_budget = memory_budget
+        self._runs = []
+        self._spilled = 0
+        self._spill_file = None
+        if memory_budget is not None:
+            memory_budget.register(self)
+    
+    def __len__(self):
+        return self._spilled + len(self.rows)
+    
+    def __bool__(self):
+        # Хранилище без строк, но с группировкой, тоже записывается при сохранении
+        return bool(self.rows or self._runs or self.outlines)
+    
+    def add_row(self, row, first_column, values, styles=TABLE_ROW_STYLES):
+        """
+        Запись строки значений
+        
+        Args:
+            row: Номер строки листа
+            first_column: Номер колонки первого значения
+            values: Значения ячеек подряд
+            styles: Имена стилей (для чисел, для остальных значений)
+                или список таких пар по колонкам
+        """
+        self.rows[row] = (first_column, tuple(values), styles)
+        if row > self.max_row:
+            self.max_row = row
+        last_column = first_column + len(values) - 1
+        if last_column > self.max_column:
+            self.max_column = last_column
+    
+        if self.memory_budget is not None:
+            self.memory_budget.add(ROW_MEMORY_OVERHEAD + sum(
+                VALUE_MEMORY_OVERHEAD + len(value) if type(value) is str else VALUE_MEMORY_OVERHEAD
+                for value in values
+            ))
+    
+    def spill(self):
+        """Выгрузка строк из памяти во временный файл серией блоков, упорядоченных по строкам"""
+        if not self.rows:
+            return
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile()
+        
+        items = sorted(self.rows.items(), key=itemgetter(0))
+        spill_file = self._spill_file
+        spill_file.seek(0, os.SEEK_END)
+        blocks = []
+        for offset in range(0, len(items), ROWS_PER_SPILL_BLOCK):
+            block = items[offset:offset + ROWS_PER_SPILL_BLOCK]
+            data = pickle.dumps(block, protocol=pickle.HIGHEST_PROTOCOL)
+            blocks.append((spill_file.tell(), len(data), block[0][0], block[-1][0]))
+            spill_file.write(data)
+        
+        self._runs.append((items[0][0], items[-1][0], blocks))
+        self._spilled += len(items)
+        self.rows = {}
+    
+    def close(self):
+        """Удаление файла выгрузки"""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._runs = []
+        self._spilled = 0
+    
+    def _read_run(self, blocks, first_row, last_row):
+        """Строки серии из блоков, пересекающих диапазон first_row..last_row"""
+        for offset, length, block_first, block_last in blocks:
+            if block_first <= last_row and block_last >= first_row:
+                self._spill_file.seek(offset)
+                yield from pickle.loads(self._spill_file.read(length))
+    
+    def iter_rows(self, first_row=1, last_row=None):
+        """
+        Строки хранилища по возрастанию номера: (строка, (первая колонка, значения, стили))
+        
+        Выгруженные строки читаются с диска потоком; из повторно записанной
+        строки возвращается последняя запись.
+        """
+        last_row = last_row if last_row is not None else self.max_row
+        sources = [
+            self._read_run(blocks, first_row, last_row)
+            for run_first, run_last, blocks in self._runs
+            if run_first <= last_row and run_last >= first_row
+        ]
+        sources.append(iter(sorted(
+            (row, stored) for row, stored in self.rows.items() if first_row <= row <= last_row
+        )))
+        
+        runs = [(run_first, run_last) for run_first, run_last, _ in self._runs]
+        if all(previous[1] < following[0] for previous, following in zip(runs, runs[1:])) and \
+                (not runs or not self.rows or runs[-1][1] < min(self.rows)):
+            # Серии не пересекаются (строки писались по возрастанию): читаются по очереди
+            merged = chain.from_iterable(sources)
+        else:
+            merged = heapq.merge(*(
+                ((row, order, stored) for row, stored in source) for order, source in enumerate(sources)
+            ), key=itemgetter(0, 1))
+            merged = ((row, stored) for row, _, stored in merged)
+        
+        pending = None
+        for row, stored in merged:
+            if row < first_row or row > last_row:
+                continue
+            if pending is not None and pending[0] != row:
+                yield pending
+            pending = (row, stored)
+        if pending is not None:
+            yield pending
+    
+    def group_rows(self, start_row, end_row, level=1, hidden=False):
+        """Группировка строк start_row..end_row (уровень - наибольший из заданных, скрытие не снимается)"""
+        self.outlines.append((start_row, end_row, level, hidden))
+    
+    def outline_ranges(self, first_row=1, last_row=None):
+        """
+        Группировка строк first_row..last_row непересекающимися диапазонами по возрастанию
+        
+        Пересекающиеся группы делятся на участки: уровень участка - наибольший
+        из групп, строки скрыты, если скрыта любая из них.
+        
+        Yields:
+            (первая строка, последняя строка, уровень, скрыты)
+        """
+        events = []
+        for start_row, end_row, level, hidden in self.outlines:
+            start_row = max(start_row, first_row)
+            end_row = end_row if last_row is None else min(end_row, last_row)
+            if start_row <= end_row:
+                events.append((start_row, 1, level, hidden))
+                events.append((end_row + 1, -1, level, hidden))
+        events.sort(key=itemgetter(0))
+        
+        active_levels = {}
+        hidden_count = 0
+        pending = None
+        for index, (position, change, level, hidden) in enumerate(events):
+            active_levels[level] = active_levels.get(level, 0) + change
+            if not active_levels[level]:
+                del active_levels[level]
+            if hidden:
+                hidden_count += change
+            
+            # Участок начинается после всех границ групп на этой строке
+            if index + 1 < len(events) and events[index + 1][0] == position:
+                continue
+            if not active_levels:
+                continue
+            end_row = events[index + 1][0] - 1
+            state = (max(active_levels), hidden_count > 0)
+            if pending is not None and pending[1] == position - 1 and pending[2:] == state:
+                pending = (pending[0], end_row, *state)
+            else:
+                if pending is not None:
+                    yield pending
+                pending = (position, end_row, *state)
+        if pending is not None:
+            yield pending
+    
+    def column_lengths(self):
+        """Наибольшая длина значения в каждой колонке (для автоподбора ширины)"""
+        lengths = {}
+        for _, (first_column, values, _) in self.iter_rows():
+            for col_idx, value in enumerate(values, first_column):
+                if value and not (isinstance(value, str) and value.startswith('=')):
+                    length = len(str(value))
+                    if length > lengths.get(col_idx, 0):
+                        lengths[col_idx] = length
+        return lengths
+
+
+class _RowSerializer:
+    """Сериализация строк хранилища в XML ячеек листа"""
+    
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self._style_ids = {}
+        self._strings = {}
+        # Таблица общих строк книги: {строка: индекс} и число ссылок на нее
+        self.shared_strings = {}
+        self.shared_count = 0
+    
+    def style_id(self, name):
+        """Индекс набора стилей ячейки для именованного стиля книги"""
+        style_id = self._style_ids.get(name)
+        if style_id is None:
+            style_array = copy(self.workbook._named_styles[name].as_tuple())
+            style_id = self._style_ids[name] = self.workbook._cell_styles.add(style_array)
+        return style_id
+    
+    def row_cells(self, row, first_column, values, styles):
+        """XML ячеек строки"""
+        if type(styles) is list:
+            # Стили по колонкам: каждая ячейка сериализуется со своей парой стилей
+            return ''.join(self.row_cells(row, col_idx, (value,), column_styles)
+                           for col_idx, (value, column_styles) in enumerate(zip(values, styles), first_column))
+        
+        number_style = self.style_id(styles[0])
+        other_style = self.style_id(styles[1])
+        strings = self._strings
+        parts = []
+        
+        for col_idx, value in enumerate(values, first_column):
+            value_type = type(value)
+            
+            # Частые типы сериализуются на месте, остальные - по общим правилам
+            if value_type is str:
+                tail = strings.get(value)
+                if tail is None:
+                    tail = self.string_tail(value)
+                parts.append(f'<c r="{COLUMN_LETTERS[col_idx]}{row}" s="{other_style}"{tail}')
+            elif value_type is SharedString:
+                parts.append(f'<c r="{COLUMN_LETTERS[col_idx]}{row}" s="{other_style}" t="s">'
+                             f'<v>{self.shared_index(value)}</v></c>')
+            elif (value_type is int or value_type is float) and value - value == 0:
+                parts.append(f'<c r="{COLUMN_LETTERS[col_idx]}{row}" s="{number_style}" t="n"><v>{"%.16g" % value}</v></c>')
+            else:
+                # Выбор стиля как при записи через openpyxl: числа Python - стиль чисел
+                style = number_style if isinstance(value, (int, float)) else other_style
+                parts.append(self.cell(f'{COLUMN_LETTERS[col_idx]}{row}', style, value))
+        
+        return ''.join(parts)
+    
+    def shared_index(self, value):
+        """Индекс строки в таблице общих строк (новая строка добавляется в конец)"""
+        self.shared_count += 1
+        index = self.shared_strings.get(value)
+        if index is None:
+            if ILLEGAL_CHARACTERS_RE.search(value):
+                raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+            index = self.shared_strings[value] = len(self.shared_strings)
+        return index
+    
+    def shared_strings_xml(self):
+        """XML таблицы общих строк (sharedStrings.xml)"""
+        items = ''.join(f'<si>{_string_text(value)}</si>' for value in self.shared_strings)
+        return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<sst xmlns="{SHEET_MAIN_NS}" count="{self.shared_count}" '
+                f'uniqueCount="{len(self.shared_strings)}">{items}</sst>')
+    
+    def cell(self, reference, style, value):
+        """XML ячейки по правилам определения типа значения openpyxl"""
+        if isinstance(value, str):
+            return f'<c r="{reference}" s="{style}"{self.string_tail(str(value))}'
+        if value is None:
+            return f'<c r="{reference}" s="{style}"/>'
+        if type(value) is bool:
+            return f'<c r="{reference}" s="{style}" t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, NUMERIC_TYPES):
+            if value != value or value in (float('inf'), float('-inf')):
+                return f'<c r="{reference}" s="{style}" t="n"/>'
+            return f'<c r="{reference}" s="{style}" t="n"><v>{"%.16g" % value}</v></c>'
+        if isinstance(value, DATE_TYPES):
+            if getattr(value, 'tzinfo', None) is not None:
+                raise TypeError("Excel does not support timezones in datetimes. "
+                                "The tzinfo in the datetime/time object must be set to None.")
+            serial = to_excel(value, self.workbook.epoch)
+            if serial is None:
+                # NaT pandas: пустая ячейка, как у openpyxl
+                return f'<c r="{reference}" s="{style}"/>'
+            return f'<c r="{reference}" s="{style}" t="n"><v>{"%.16g" % serial}</v></c>'
+        raise ValueError(f"Cannot convert {value!r} to Excel")
+    
+    def string_tail(self, value):
+        """
+        Окончание XML ячейки со строкой (после атрибута стиля)
+        
+        Повторяющиеся строки экранируются один раз: окончания кешируются.
+        """
+        value = value[:EXCEL_MAX_STRING_LENGTH]
+        if len(value) > 1 and value.startswith('='):
+            tail = f'><f>{_escape(value[1:])}</f><v></v></c>'
+        elif value in ERROR_CODES:
+            tail = f' t="e"><v>{value}</v></c>'
+        else:
+            tail = f' t="inlineStr">{_inline_string(value)}</c>'
+        
+        if len(self._strings) >= STRING_CACHE_SIZE:
+            self._strings.clear()
+        self._strings[value] = tail
+        return tail
+
+
+def _escape(text):
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def _inline_string(value):
+    """Содержимое ячейки со строкой (<is><t>...</t></is>) с проверками openpyxl"""
+    if ILLEGAL_CHARACTERS_RE.search(value):
+        raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+    return f'<is>{_string_text(value)}</is>'
+    
+
+def _string_text(value):
+    """Элемент <t> строки (с сохранением пробелов по краям)"""
+    stripped = value.strip()
+    if stripped and stripped != value:
+        return f'<t xml:space="preserve">{_escape(value)}</t>'
+    return f'<t>{_escape(value)}</t>'
+
+
+def _merge_row(existing_cells, fast_cells):
+    """Ячейки строки openpyxl и строки хранилища в порядке колонок"""
+    if not existing_cells:
+        return fast_cells
+    
+    cells = [(_column_index(match.group(1)), match.group(0)) for match in _CELL_PATTERN.finditer(existing_cells)]
+    cells += [(_column_index(match.group(1)), match.group(0)) for match in _CELL_PATTERN.finditer(fast_cells)]
+    cells.sort(key=lambda item: item[0])
+    return ''.join(cell for _, cell in cells)
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index
+
+
+def merge_store_rows(rows, store):
+    """
+    Объединение номеров строк листа со строками и группировкой хранилища по возрастанию
+    
+    Строки хранилища и диапазоны группировки читаются потоком: память не растет
+    с числом строк листа.
+    
+    Args:
+        rows: Номера строк листа, не хранящихся в хранилище
+        store: FastRowStore или None
+    
+    Yields:
+        (строка, строка хранилища или None, (уровень группировки, скрыта) или None)
+    """
+    store_rows = store.iter_rows() if store else iter(())
+    outline_ranges = store.outline_ranges() if store else iter(())
+    sheet_rows = iter(sorted(rows))
+    
+    stored_row, stored = next(store_rows, (_NO_ROW, None))
+    sheet_row = next(sheet_rows, _NO_ROW)
+    outline_row, outline_end, level, hidden = next(outline_ranges, _NO_OUTLINE)
+    
+    while True:
+        row = min(stored_row, sheet_row, outline_row)
+        if row == _NO_ROW:
+            return
+        
+        row_stored = None
+        if stored_row == row:
+            row_stored = stored
+            stored_row, stored = next(store_rows, (_NO_ROW, None))
+        if sheet_row == row:
+            sheet_row = next(sheet_rows, _NO_ROW)
+        
+        outline = None
+        if outline_row == row:
+            outline = (level, hidden)
+            if row < outline_end:
+                outline_row = row + 1
+            else:
+                outline_row, outline_end, level, hidden = next(outline_ranges, _NO_OUTLINE)
+        
+        yield row, row_stored, outline
+
+
+def _splice_sheet(source_path, target_file, ws, store, serializer):
+    """Запись XML листа openpyxl со строками хранилища внутри sheetData"""
+    with open(source_path, encoding='utf-8') as source_file:
+        xml = source_file.read()
+    
+    match = _SHEET_DATA_PATTERN.search(xml)
+    prefix, existing, suffix = xml[:match.start()], match.group(1) or '', xml[match.end():]
+    
+    # Размер листа с учетом строк хранилища
+    max_row = max(ws.max_row, store.max_row)
+    max_column = max(ws.max_column, store.max_column)
+    prefix = _DIMENSION_PATTERN.sub(f'<dimension ref="A1:{COLUMN_LETTERS[max_column]}{max_row}" />', prefix, count=1)
+    
+    existing_rows = {}
+    for row_match in _ROW_PATTERN.finditer(existing):
+        existing_rows[int(row_match.group(1))] = (row_match.group(2).rstrip(), row_match.group(3) or '')
+    
+    target_file.write(prefix)
+    target_file.write('<sheetData>')
+    
+    buffer = []
+    for row, stored, outline in merge_store_rows(existing_rows.keys(), store):
+        attributes, cells = existing_rows.get(row, ('', ''))
+        if outline is not None and 'outlineLevel=' not in attributes:
+            level, hidden = outline
+            attributes += f' outlineLevel="{level}"' if level else ''
+            attributes += ' hidden="1"' if hidden and 'hidden=' not in attributes else ''
+        
+        if stored is not None:
+            cells = _merge_row(cells, serializer.row_cells(row, *stored))
+        buffer.append(f'<row r="{row}"{attributes}>{cells}</row>' if cells else
+                      f'<row r="{row}"{attributes}/>')
+        
+        if len(buffer) >= ROWS_PER_WRITE:
+            target_file.write(''.join(buffer))
+            buffer.clear()
+    
+    target_file.write(''.join(buffer))
+    target_file.write('</sheetData>')
+    target_file.write(suffix)
+
+
+class _SplicingArchive:
+    """Архив, в который XML листа записывается со строками хранилища"""
+    
+    def __init__(self, archive, arcname, ws, store, serializer):
+        self.archive = archive
+        self.arcname = arcname
+        self.ws = ws
+        self.store = store
+        self.serializer = serializer
+    
+    def write(self, filename, arcname=None, *args, **kwargs):
+        if arcname != self.arcname:
+            return self.archive.write(filename, arcname, *args, **kwargs)
+        
+        descriptor, spliced_path = tempfile.mkstemp(suffix='.xml')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as spliced_file:
+                _splice_sheet(filename, spliced_file, self.ws, self.store, self.serializer)
+            self.archive.write(spliced_path, arcname)
+        finally:
+            os.remove(spliced_path)
+    
+    def __getattr__(self, name):
+        return getattr(self.archive, name)
+
+
+class _SharedStringsPart:
+    """Запись манифеста книги о таблице общих строк"""
+    
+    path = '/' + ARC_SHARED_STRINGS
+    mime_type = SHARED_STRINGS
+
+
+class _WorkbookRelsArchive:
+    """Архив, в котором к связям книги добавляется таблица общих строк (если она записана)"""
+    
+    def __init__(self, archive, serializer):
+        self.archive = archive
+        self.serializer = serializer
+    
+    def writestr(self, arcname, data, *args, **kwargs):
+        if arcname == ARC_WORKBOOK_RELS and self.serializer.shared_strings:
+            relationship = (b'<Relationship Id="rIdSharedStrings" Target="sharedStrings.xml" '
+                            b'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/>')
+            data = data.replace(b'</Relationships>', relationship + b'</Relationships>')
+        return self.archive.writestr(arcname, data, *args, **kwargs)
+    
+    def __getattr__(self, name):
+        return getattr(self.archive, name)
+
+
+class FastExcelWriter(ExcelWriter):
+    """ExcelWriter openpyxl, дописывающий в листы строки хранилищ"""
+    
+    def __init__(self, workbook, archive, stores):
+        super().__init__(workbook, archive)
+        self.stores = stores
+        self.serializer = _RowSerializer(workbook)
+    
+    def write_data(self):
+        # write_data запоминает архив до записи листов, поэтому связи книги
+        # перехватываются оберткой, установленной заранее
+        archive = self._archive
+        self._archive = _WorkbookRelsArchive(archive, self.serializer)
+        try:
+            super().write_data()
+        finally:
+            self._archive = archive
+    
+    def _write_worksheets(self):
+        super()._write_worksheets()
+        
+        # Общие строки собраны при записи листов: таблица и запись манифеста
+        if self.serializer.shared_strings:
+            self._archive.writestr(ARC_SHARED_STRINGS, self.serializer.shared_strings_xml())
+            self.manifest.append(_SharedStringsPart)
+    
+    def write_worksheet(self, ws):
+        store = self.stores.get(ws)
+        if not store:
+            return super().write_worksheet(ws)
+        
+        archive = self._archive
+        self._archive = _SplicingArchive(archive, ws.path[1:], ws, store, self.serializer)
+        try:
+            return super().write_worksheet(ws)
+        finally:
+            self._archive = archive
+
+
+def save_workbook(workbook, stores, filename):
+    """
+    Сохранение книги со строками хранилищ листов
+    
+    Args:
+        workbook: Книга openpyxl
+        stores: Словарь {лист: FastRowStore}
+        filename: Путь или файловый объект
+    """
+    archive = ZipFile(filename, 'w', ZIP_DEFLATED, allowZip64=True)
+    workbook.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+    writer = FastExcelWriter(workbook, archive, stores)
+    writer.save()
+    return True
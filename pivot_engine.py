@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Группировка плоских строк для секций-сводок (type: "pivot")
+
+Строки упорядочиваются по ключам группировки за один проход (хеш-факторизация
+ключей и лексикографическая сортировка кодов, если доступны pandas/NumPy),
+после чего для каждой строки вычисляется уровень, с которого начинается новая группа.
+Уже отсортированный вход (в том числе итераторы на десятки миллионов строк)
+обрабатывается потоково, без загрузки в память.
+"""
+
+from itertools import chain
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # Потоковый режим работает и без pandas/NumPy
+    np = None
+    pd = None
+
+
+def group_rows(rows, group_by, columns=None, presorted=False, sort=True):
+    """
+    Подготовка строк к выводу многоуровневой сводки
+    
+    Args:
+        rows: Список словарей, DataFrame или итератор словарей
+        group_by: Список колонок группировки (от внешнего уровня к внутреннему)
+        columns: Колонки детальных строк (по умолчанию все, кроме колонок группировки)
+        presorted: Строки уже упорядочены по group_by - обрабатываются потоково
+        sort: Упорядочить группы по значениям ключей (иначе - в порядке первого появления)
+    
+    Returns:
+        (detail_columns, iterator) где iterator выдает кортежи
+        (boundary_level, keys, values): boundary_level - индекс первого уровня,
+        на котором начинается новая группа (len(group_by), если строка продолжает
+        текущую группу), keys - значения ключей, values - значения детальных колонок.
+        Для пустых данных возвращается (None, пустой итератор).
+    """
+    group_by = list(group_by)
+    
+    is_frame = pd is not None and isinstance(rows, pd.DataFrame)
+    if presorted and not is_frame:
+        return _group_presorted(iter(rows), group_by, columns)
+    
+    if pd is None:
+        # Без pandas сортируем в Python и используем потоковый проход
+        records = sorted(rows, key=lambda row: tuple(_sort_key(row.get(key)) for key in group_by)) if sort else \
+            _order_by_first_appearance(list(rows), group_by)
+        return _group_presorted(iter(records), group_by, columns)
+    
+    if not is_frame:
+        if not isinstance(rows, list):
+            print("Предупреждение: неотсортированный поток строк сводки загружается в память целиком; "
+                  "укажите presorted для потоковой обработки")
+        rows = pd.DataFrame(list(rows) if not isinstance(rows, list) else rows)
+    
+    if rows.empty:
+        return None, iter(())
+    
+    return _group_frame(rows, group_by, columns, presorted, sort)
+
+
+def _group_frame(df, group_by, columns, presorted, sort):
+    """Векторизованная группировка DataFrame"""
+    missing = [key for key in group_by if key not in df.columns]
+    if missing:
+        raise KeyError(f"Колонки группировки отсутствуют в данных: {', '.join(missing)}")
+    
+    detail_columns = list(columns) if columns else [column for column in df.columns if column not in group_by]
+    detail_columns = [column for column in detail_columns if column in df.columns]
+    
+    # Коды ключей каждого уровня (хеш-факторизация, NaN - отдельная группа)
+    codes = np.vstack([
+        pd.factorize(df[key], sort=sort, use_na_sentinel=False)[0] for key in group_by
+    ])
+    
+    if presorted:
+        order = np.arange(len(df))
+    else:
+        # np.lexsort сортирует по последнему ключу как по главному
+        order = np.lexsort(codes[::-1])
+        codes = codes[:, order]
+    
+    # Уровень, с которого меняется ключ, для каждой строки
+    levels = len(group_by)
+    boundaries = np.full(len(df), levels, dtype=np.int64)
+    boundaries[0] = 0
+    if len(df) > 1:
+        changed = codes[:, 1:] != codes[:, :-1]
+        boundaries[1:] = np.where(changed.any(axis=0), changed.argmax(axis=0), levels)
+    
+    keys = df[group_by].iloc[order].itertuples(index=False, name=None)
+    values = df[detail_columns].iloc[order].itertuples(index=False, name=None)
+    
+    iterator = zip(boundaries.tolist(), keys, (list(row) for row in values))
+    return detail_columns, iterator
+
+
+def _group_presorted(iterator, group_by, columns):
+    """Потоковая группировка уже отсортированных строк"""
+    first = next(iterator, None)
+    if first is None:
+        return None, iter(())
+    
+    _row_keys(first, group_by)  # Отсутствующие колонки группировки - ошибка до начала вывода
+    detail_columns = list(columns) if columns else [column for column in first if column not in group_by]
+    levels = len(group_by)
+    
+    def events():
+        previous = None
+        for row in chain([first], iterator):
+            keys = _row_keys(row, group_by)
+            if previous is None:
+                boundary = 0
+            else:
+                boundary = next((level for level in range(levels) if not _same_key(keys[level], previous[level])),
+                                levels)
+            previous = keys
+            yield boundary, keys, [row.get(column) for column in detail_columns]
+    
+    return detail_columns, events()
+
+
+def _row_keys(row, group_by):
+    """
+    Значения ключей группировки строки
+    
+    Raises:
+        KeyError: В строке нет колонки группировки
+    """
+    try:
+        return tuple(row[key] for key in group_by)
+    except KeyError:
+        missing = [key for key in group_by if key not in row]
+        raise KeyError(f"Колонки группировки отсутствуют в данных: {', '.join(missing)}") from None
+
+
+def _same_key(value, previous):
+    """Ключи одной группы: пустые значения (None, NaN) равны между собой, как при факторизации"""
+    if value == previous:
+        return True
+    return _is_missing(value) and _is_missing(previous)
+
+
+def _is_missing(value):
+    return value is None or value != value
+
+
+def _order_by_first_appearance(rows, group_by):
+    """Упорядочивание строк по группам в порядке их первого появления (без pandas)"""
+    positions = [{} for _ in group_by]
+    for row in rows:
+        for level, key in enumerate(group_by):
+            positions[level].setdefault(row.get(key), len(positions[level]))
+    return sorted(rows, key=lambda row: tuple(positions[level][row.get(key)] for level, key in enumerate(group_by)))
+
+
+def _sort_key(value):
+    """Ключ сортировки, допускающий None и значения разных типов"""
+    return (value is None, type(value).__name__, value if value is not None else 0)
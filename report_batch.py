@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Пакетное построение отчетов
+
+Задание пакета - имя отчета, шаблон и данные. Шаблон - словарь (или путь
+к .json), который заполняется данными через скомпилированный шаблон, или
+книга-шаблон .xlsx, которая заполняется fill_template. Ошибка одного отчета
+не останавливает пакет. С profile=True рядом с каждым отчетом записывается
+его профиль (<имя>.profile.folded и <имя>.profile.json), а в папку пакета -
+сводка batch_profile.json с отчетами по убыванию времени построения.
+
+Запуск из командной строки:
+    python report_batch.py jobs.json --output-dir reports --profile
+"""
+
+import argparse
+import json
+import os
+import time
+
+from advanced_report_generator import AdvancedExcelRenderer
+from template_compiler import render_compiled
+
+
+# Сводка профилей пакета в папке отчетов
+BATCH_PROFILE_FILENAME = 'batch_profile.json'
+
+# Расширение файлов книг-шаблонов
+WORKBOOK_TEMPLATE_EXTENSION = '.xlsx'
+
+
+def _load_json(value):
+    """Словарь задания или содержимое .json-файла по пути"""
+    if isinstance(value, (str, os.PathLike)):
+        with open(value, 'r', encoding='utf-8') as json_file:
+            return json.load(json_file)
+    return value
+
+
+def render_job(job, output_dir, profile=False, renderer_options=None):
+    """
+    Построение одного отчета пакета
+    
+    Args:
+        job: Задание {"name", "template", "context"}: шаблон - словарь, путь к .json
+            или путь к книге-шаблону .xlsx; context - данные (словарь или путь к .json)
+        output_dir: Папка отчетов
+        profile: Записать профиль рядом с отчетом
+        renderer_options: Параметры конструктора AdvancedExcelRenderer
+    
+    Returns:
+        Словарь: name, path, seconds, error (None - отчет построен),
+        с профилем - profile (сводка профиля)
+    """
+    name = job['name']
+    path = os.path.join(output_dir, f"{name}.xlsx")
+    result = {'name': name, 'path': path, 'seconds': None, 'error': None}
+    
+    started = time.perf_counter()
+    try:
+        template = job['template']
+        context = _load_json(job.get('context', {}))
+        renderer = AdvancedExcelRenderer(profile=profile, **(renderer_options or {}))
+        
+        if isinstance(template, (str, os.PathLike)) and str(template).endswith(WORKBOOK_TEMPLATE_EXTENSION):
+            renderer.fill_template(template, context)
+        else:
+            renderer.create_collapsible_report(render_compiled(_load_json(template), context))
+        renderer.save_report(path)
+        
+        if renderer.profiler is not None:
+            result['profile'] = renderer.profiler.summary()
+    except Exception as e:
+        print(f"Ошибка построения отчета '{name}': {e}")
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def render_batch(jobs, output_dir, profile=False, renderer_options=None):
+    """
+    Построение пакета отчетов
+    
+    Args:
+        jobs: Задания (см. render_job)
+        output_dir: Папка отчетов (создается при необходимости)
+        profile: Профилировать каждый отчет и записать сводку пакета
+        renderer_options: Параметры конструктора AdvancedExcelRenderer
+    
+    Returns:
+        Результаты render_job в порядке заданий
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = [render_job(job, output_dir, profile, renderer_options) for job in jobs]
+    
+    if profile:
+        slowest = sorted(results, key=lambda result: -result['seconds'])
+        with open(os.path.join(output_dir, BATCH_PROFILE_FILENAME), 'w', encoding='utf-8') as summary_file:
+            json.dump(slowest, summary_file, ensure_ascii=False, indent=2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетное построение отчетов")
+    parser.add_argument("jobs", help="JSON-файл со списком заданий {name, template, context}")
+    parser.add_argument("--output-dir", default="reports", help="Папка для файлов отчетов")
+    parser.add_argument("--engine", default=None, help="Бэкенд записи: openpyxl, fast, xlsxwriter")
+    parser.add_argument("--profile", action="store_true", help="Профилировать каждый отчет")
+    parser.add_argument("--top", type=int, default=10, help="Сколько самых медленных отчетов вывести")
+    args = parser.parse_args()
+    
+    jobs = _load_json(args.jobs)
+    renderer_options = {'engine': args.engine} if args.engine else None
+    results = render_batch(jobs, args.output_dir, profile=args.profile, renderer_options=renderer_options)
+    
+    failed = [result for result in results if result['error'] is not None]
+    print(f"📦 Отчетов: {len(results)}, с ошибками: {len(failed)}, папка: {args.output_dir}")
+    for result in sorted(results, key=lambda result: -result['seconds'])[:args.top]:
+        sections = result.get('profile', {}).get('sections', {})
+        slowest_section = next(iter(sections), None)
+        details = f" (дольше всего: {slowest_section})" if slowest_section else ""
+        print(f"{result['name']:<30} {result['seconds']:>8.2f} с{details}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Кеш готовых отчетов
+
+Отчет, построенный по шаблону и данным, сохраняется целиком (содержимое .xlsx)
+под ключом - отпечатком шаблона, данных и параметров рендерера. Повторный запрос
+того же отчета отдается из кеша без рендеринга. Одновременные одинаковые запросы
+объединяются: отчет строится один раз, остальные запросы ждут его результат.
+
+Хранилища:
+- MemoryBackend - в памяти процесса, вытеснение давно не использованных (LRU)
+- DirectoryBackend - файлы в папке, ограничение общего размера и срок жизни (TTL)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from advanced_report_generator import AdvancedExcelRenderer, render_template_with_data
+from data_providers import UncacheableDataError, fingerprint_default
+from style_registry import get_style_registry
+
+
+# Версия формата ключа: при изменении отрисовки отчетов старые записи не используются
+FINGERPRINT_VERSION = 1
+
+# Расширение файлов отчетов в DirectoryBackend
+REPORT_EXTENSION = '.xlsx'
+
+# Параметры рендерера, не влияющие на содержимое отчета: в ключ не входят
+NON_RENDERING_OPTIONS = frozenset({
+    'progress', 'progress_interval', 'cancel_token', 'profile', 'profile_interval', 'section_cache', 'image_cache'
+})
+
+
+def report_fingerprint(template_data, context_data, renderer_options=None):
+    """
+    Стабильный отпечаток отчета: не зависит от порядка ключей словарей
+    
+    Args:
+        template_data: Шаблон отчета (JSON-совместимый словарь)
+        context_data: Данные для подстановки в шаблон
+        renderer_options: Параметры конструктора AdvancedExcelRenderer
+            (параметры из NON_RENDERING_OPTIONS не учитываются)
+    
+    Returns:
+        Шестнадцатеричная строка SHA-256
+    
+    Raises:
+        UncacheableDataError: В данных есть ленивые источники без отпечатка
+            или в параметрах рендерера - объекты без метода fingerprint
+    """
+    payload = json.dumps(
+        {
+            'version': FINGERPRINT_VERSION,
+            'template': template_data,
+            'context': context_data,
+            'renderer': _renderer_fingerprint(renderer_options or {})
+        },
+        sort_keys=True, default=fingerprint_default, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _renderer_fingerprint(renderer_options):
+    """Параметры рендерера, влияющие на отчет: объекты заменяются их отпечатками"""
+    options = {name: value for name, value in renderer_options.items() if name not in NON_RENDERING_OPTIONS}
+    # Стили общего реестра тоже влияют на отчет, даже если реестр не передан явно
+    if options.get('style_registry') is None:
+        options['style_registry'] = get_style_registry()
+    
+    fingerprints = {}
+    for name, value in options.items():
+        if value is None or isinstance(value, (str, bool, int, float)):
+            fingerprints[name] = value
+        elif callable(getattr(value, 'fingerprint', None)):
+            fingerprints[name] = {'type': type(value).__name__, 'fingerprint': value.fingerprint()}
+        else:
+            raise UncacheableDataError(f"Параметр рендерера {name} без отпечатка: {type(value).__name__}")
+    return fingerprints
+
+
+class MemoryBackend:
+    """Хранилище отчетов в памяти с вытеснением давно не использованных"""
+    
+    def __init__(self, max_entries=64, max_size_mb=None):
+        """
+        Args:
+            max_entries: Максимум отчетов в кеше
+            max_size_mb: Предельный общий размер отчетов в МБ (без ограничения по умолчанию)
+        """
+        self.max_entries = max_entries
+        self.max_size = max_size_mb * 1024 * 1024 if max_size_mb else None
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Содержимое отчета по ключу или None"""
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+            return content
+    
+    def put(self, key, content):
+        """Сохранение отчета с вытеснением давно не использованных"""
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = content
+            self._size += len(content)
+            
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     (self.max_size is not None and self._size > self.max_size)):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def clear(self):
+        """Удаление всех отчетов"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class DirectoryBackend:
+    """Хранилище отчетов в папке с ограничением размера и сроком жизни"""
+    
+    def __init__(self, directory, max_size_mb=512, ttl_seconds=None):
+        """
+        Args:
+            directory: Папка для файлов отчетов (создается при необходимости)
+            max_size_mb: Предельный общий размер файлов в МБ; при превышении
+                удаляются давно не использованные отчеты
+            ttl_seconds: Срок жизни отчета в секундах (без ограничения по умолчанию)
+        """
+        self.directory = directory
+        self.max_size = max_size_mb * 1024 * 1024 if max_size_mb else None
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key + REPORT_EXTENSION)
+    
+    def get(self, key):
+        """Содержимое отчета по ключу или None (просроченный отчет удаляется)"""
+        path = self._path(key)
+        try:
+            created = os.path.getmtime(path)
+            if self.ttl is not None and time.time() - created > self.ttl:
+                self._remove(path)
+                return None
+            with open(path, 'rb') as report_file:
+                content = report_file.read()
+        except OSError:
+            return None
+        
+        # Время доступа отмечается явно: atime часто не обновляется файловой системой
+        try:
+            os.utime(path, (time.time(), created))
+        except OSError:
+            pass
+        return content
+    
+    def put(self, key, content):
+        """Сохранение отчета (атомарная запись) и вытеснение сверх лимитов"""
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as report_file:
+                report_file.write(content)
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            self._remove(temp_path)
+            raise
+        
+        self._evict()
+    
+    def _evict(self):
+        """Удаление просроченных отчетов и давно не использованных сверх лимита размера"""
+        with self._lock:
+            now = time.time()
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(REPORT_EXTENSION):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if self.ttl is not None and now - stat.st_mtime > self.ttl:
+                    self._remove(path)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+            
+            if self.max_size is None:
+                return
+            
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                self._remove(path)
+                total_size -= size
+    
+    def clear(self):
+        """Удаление всех отчетов"""
+        for name in os.listdir(self.directory):
+            if name.endswith(REPORT_EXTENSION):
+                self._remove(os.path.join(self.directory, name))
+    
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _Flight:
+    """Рендеринг отчета, результат которого ждут одинаковые запросы"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.content = None
+        self.error = None
+
+
+class ReportCache:
+    """Кеш готовых отчетов с объединением одновременных одинаковых запросов"""
+    
+    def __init__(self, backend=None, renderer_class=AdvancedExcelRenderer):
+        """
+        Args:
+            backend: Хранилище (MemoryBackend по умолчанию)
+            renderer_class: Класс рендерера отчетов
+        """
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.renderer_class = renderer_class
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+    
+    def get_report(self, template_data, context_data, renderer_options=None):
+        """
+        Содержимое .xlsx отчета: из кеша или после рендеринга
+        
+        Args:
+            template_data: Шаблон отчета
+            context_data: Данные для подстановки в шаблон
+            renderer_options: Параметры конструктора рендерера
+        
+        Returns:
+            Содержимое файла отчета (bytes)
+        """
+        try:
+            key = report_fingerprint(template_data, context_data, renderer_options)
+        except UncacheableDataError:
+            # Ленивые данные или параметры без отпечатка: отчет строится без кеша
+            with self._lock:
+                self.misses += 1
+            return self._render(template_data, context_data, renderer_options)
+        
+        content = self.backend.get(key)
+        if content is not None:
+            with self._lock:
+                self.hits += 1
+            return content
+        
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+        
+        if not leader:
+            # Такой же отчет уже строится - ждем его результат
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.content
+        
+        try:
+            # Отчет мог быть построен другим запросом, пока этот ждал блокировку
+            content = self.backend.get(key)
+            if content is None:
+                content = self._render(template_data, context_data, renderer_options)
+                self.backend.put(key, content)
+            flight.content = content
+            return content
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+    
+    def save_report(self, template_data, context_data, filename, renderer_options=None):
+        """Запись отчета (из кеша или после рендеринга) в файл"""
+        content = self.get_report(template_data, context_data, renderer_options)
+        with open(filename, 'wb') as report_file:
+            report_file.write(content)
+        return filename
+    
+    def _render(self, template_data, context_data, renderer_options):
+        """Рендеринг отчета в память"""
+        report_data = render_template_with_data(template_data, context_data)
+        renderer = self.renderer_class(**(renderer_options or {}))
+        renderer.create_collapsible_report(report_data)
+        
+        buffer = BytesIO()
+        renderer.save_report(buffer)
+        return buffer.getvalue()
+    
+    @property
+    def hit_rate(self):
+        """Доля запросов, обслуженных без отдельного рендеринга"""
+        requests_count = self.hits + self.misses + self.shared
+        return (self.hits + self.shared) / requests_count if requests_count else 0.0
+    
+    def stats(self):
+        """Статистика кеша"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'hit_rate': self.hit_rate
+        }
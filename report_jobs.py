@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+"""
+Очередь заданий построения отчетов
+
+Задания хранятся в локальной базе SQLite и переживают перезапуск и падение
+процессов; внешний брокер не нужен. Процессы-исполнители забирают задания
+по очереди:
+- честное разделение между арендаторами (tenant): следующим обслуживается
+  арендатор с наименьшим числом выполняемых заданий, а при равенстве - дольше
+  всех ожидавший; внутри арендатора - по приоритету, затем в порядке постановки
+- ограничение параллельности: число исполнителей и, при необходимости,
+  выполняемых заданий одного арендатора
+- повтор неудачных заданий с экспоненциальной задержкой
+- аренда задания: исполнитель продлевает ее, пока строит отчет; задание
+  упавшего исполнителя возвращается в очередь после истечения аренды, а его
+  исполнитель, потерявший аренду, останавливает построение и не записывает результат
+- результат: путь отчета и файлов профиля, время построения, ошибка
+
+Задание - как в report_batch: {"name", "template", "context"}, плюс необязательные
+"renderer_options". Данные задания сохраняются в JSON (даты - строками ISO 8601).
+Имя задания и арендатор - части пути файла отчета, поэтому разделители путей
+в них не допускаются.
+
+Запуск из командной строки:
+    python report_jobs.py submit jobs.json --tenant sales --priority 5
+    python report_jobs.py work --workers 4 --output-dir reports
+    python report_jobs.py status
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, time as day_time
+from decimal import Decimal
+
+from report_batch import render_job
+from report_progress import CancellationToken
+
+
+# Файл очереди по умолчанию
+DEFAULT_QUEUE_PATH = 'report_jobs.sqlite3'
+
+# Срок аренды задания исполнителем и период ее продления, секунды
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 5
+
+# Задержка перед повтором: RETRY_BACKOFF_SECONDS * 2^(попытка - 1), не более RETRY_BACKOFF_MAX_SECONDS
+RETRY_BACKOFF_SECONDS = 30
+RETRY_BACKOFF_MAX_SECONDS = 3600
+
+# Попыток построения отчета по умолчанию
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Пауза исполнителя при пустой очереди, секунды
+POLL_INTERVAL = 1.0
+
+# Папка попытки построения внутри папки арендатора: .job-<номер>-<попытка>
+ATTEMPT_DIR_PREFIX = '.job-'
+
+# Символы, недопустимые в имени задания и арендаторе (части пути файла отчета)
+PATH_PART_INVALID_CHARS = '/\\:\0'
+
+# Состояния заданий
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+JOB_STATUSES = (QUEUED, RUNNING, DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tenant TEXT NOT NULL,
+    name TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker TEXT,
+    lease_until REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    progress TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_tenant ON jobs (status, tenant);
+CREATE TABLE IF NOT EXISTS tenants (
+    tenant TEXT PRIMARY KEY,
+    last_claimed_at REAL NOT NULL
+);
+"""
+
+# Следующее задание: арендатор с меньшим числом выполняемых заданий, затем дольше ожидавший,
+# затем приоритет и порядок постановки
+# Условие принадлежности выполняемого задания исполнителю (попытка - номер захвата)
+OWNER_CONDITION = "id = ? AND status = 'running' AND worker = ? AND attempts = ?"
+
+CLAIM_QUERY = """
+SELECT j.id FROM jobs j
+LEFT JOIN tenants t ON t.tenant = j.tenant
+WHERE j.status = 'queued' AND j.available_at <= :now
+  AND (:tenant_limit IS NULL OR
+       (SELECT COUNT(*) FROM jobs r WHERE r.status = 'running' AND r.tenant = j.tenant) < :tenant_limit)
+ORDER BY (SELECT COUNT(*) FROM jobs r WHERE r.status = 'running' AND r.tenant = j.tenant),
+         COALESCE(t.last_claimed_at, 0), j.priority DESC, j.available_at, j.id
+LIMIT 1
+"""
+
+
+class JobLeaseLostError(Exception):
+    """Аренда задания истекла: задание возвращено в очередь или захвачено другим исполнителем"""
+
+
+class ReportJobQueue:
+    """Очередь заданий в базе SQLite (одна база - для всех процессов машины)"""
+    
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=LEASE_SECONDS, max_running_per_tenant=None,
+                 retry_backoff=RETRY_BACKOFF_SECONDS, retry_backoff_max=RETRY_BACKOFF_MAX_SECONDS):
+        """
+        Args:
+            path: Файл базы очереди (создается при первом обращении)
+            lease_seconds: Срок аренды задания, после которого задание молчащего исполнителя возвращается в очередь
+            max_running_per_tenant: Предел одновременно выполняемых заданий одного арендатора
+            retry_backoff: Задержка перед первым повтором, секунды (удваивается с каждой попыткой)
+            retry_backoff_max: Наибольшая задержка перед повтором, секунды
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_running_per_tenant = max_running_per_tenant
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._local = threading.local()
+        self._connect()
+    
+    def __getstate__(self):
+        # Соединения не передаются другим процессам: каждый процесс открывает свое
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+    
+    def _connect(self):
+        """Соединение текущего потока (режим WAL: чтение не блокируется записью)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+    
+    def _transaction(self):
+        """Транзакция с блокировкой записи с первого запроса (выбор и захват задания атомарны)"""
+        return _Transaction(self._connect())
+    
+    def submit(self, job, tenant='default', priority=0, max_attempts=DEFAULT_MAX_ATTEMPTS, run_at=None,
+               profile=False):
+        """
+        Постановка задания в очередь
+        
+        Args:
+            job: Задание {"name", "template", "context", "renderer_options"} (см. report_batch.render_job).
+                Готовые данные отчета для create_collapsible_report без шаблона не поддерживаются
+            tenant: Арендатор (очередь честно делится между арендаторами)
+            priority: Приоритет среди заданий арендатора (больше - раньше)
+            max_attempts: Попыток построения с учетом повторов
+            run_at: Время запуска (time.time()), по умолчанию - сразу
+            profile: Записать профиль рядом с отчетом
+        
+        Returns:
+            Номер задания
+        
+        Raises:
+            ValueError: Нет шаблона или имя задания и арендатор не годятся для пути файла
+                (пустые, начинаются с точки, содержат разделители путей)
+            TypeError: Данные задания не сериализуются в JSON (например, DataFrame)
+        """
+        if 'template' not in job:
+            raise ValueError(f"Задание '{job.get('name')}' без шаблона: нужен ключ template")
+        _check_path_part(job['name'], "имя задания")
+        _check_path_part(tenant, "арендатор")
+        
+        payload = json.dumps({
+            'template': job['template'],
+            'context': job.get('context', {}),
+            'renderer_options': job.get('renderer_options') or {},
+            'profile': profile
+        }, ensure_ascii=False, default=_json_default)
+        now = time.time()
+        
+        cursor = self._connect().execute(
+            "INSERT INTO jobs (tenant, name, priority, status, payload, max_attempts, available_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (tenant, job['name'], priority, QUEUED, payload, max(1, max_attempts), run_at or now, now)
+        )
+        return cursor.lastrowid
+    
+    def claim(self, worker):
+        """
+        Захват следующего готового задания исполнителем
+        
+        Returns:
+            Словарь задания (id, tenant, name, attempts, payload - разобранный JSON) или None
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            self._recover_expired(connection, now)
+            row = connection.execute(CLAIM_QUERY, {'now': now, 'tenant_limit': self.max_running_per_tenant}).fetchone()
+            if row is None:
+                return None
+            
+            connection.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, started_at = ?, lease_until = ?, "
+                "progress = NULL WHERE id = ?",
+                (RUNNING, worker, now, now + self.lease_seconds, row['id'])
+            )
+            job = connection.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+            connection.execute("INSERT OR REPLACE INTO tenants (tenant, last_claimed_at) VALUES (?, ?)",
+                               (job['tenant'], now))
+        
+        job = dict(job)
+        job['payload'] = json.loads(job['payload'])
+        return job
+    
+    def _recover_expired(self, connection, now):
+        """Возврат в очередь заданий, аренда которых истекла (исполнитель упал или завис)"""
+        for job in connection.execute("SELECT id, attempts, max_attempts FROM jobs WHERE status = ? AND lease_until < ?",
+                                      (RUNNING, now)).fetchall():
+            self._retry_or_fail(connection, job, "Исполнитель не продлил аренду задания", now)
+    
+    def _retry_or_fail(self, connection, job, error, now):
+        """Повтор задания с задержкой или окончательная ошибка после последней попытки"""
+        if job['attempts'] < job['max_attempts']:
+            delay = min(self.retry_backoff * 2 ** (job['attempts'] - 1), self.retry_backoff_max)
+            connection.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, worker = NULL, lease_until = NULL, error = ? "
+                "WHERE id = ?",
+                (QUEUED, now + delay, error, job['id'])
+            )
+        else:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL, error = ? WHERE id = ?",
+                (FAILED, now, error, job['id'])
+            )
+    
+    def heartbeat(self, job, progress=None):
+        """
+        Продление аренды выполняемого задания и сохранение его прогресса
+        
+        Args:
+            job: Задание, полученное от claim (аренда - у его исполнителя и попытки)
+            progress: Прогресс построения
+        
+        Returns:
+            True, если запрошена отмена задания
+        
+        Raises:
+            JobLeaseLostError: Задание больше не принадлежит этой попытке исполнителя
+        """
+        connection = self._connect()
+        cursor = connection.execute(
+            f"UPDATE jobs SET lease_until = ?, progress = COALESCE(?, progress) WHERE {OWNER_CONDITION}",
+            (time.time() + self.lease_seconds, json.dumps(progress, ensure_ascii=False) if progress else None,
+             *_owner(job))
+        )
+        if not cursor.rowcount:
+            raise JobLeaseLostError(f"Аренда задания {job['id']} (попытка {job['attempts']}) потеряна")
+        row = connection.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job['id'],)).fetchone()
+        return bool(row['cancel_requested'])
+    
+    def complete(self, job, result, files=()):
+        """
+        Отчет построен: результат задания (пути файлов, время построения)
+    
+        Args:
+            job: Задание, полученное от claim
+            result: Результат задания
+            files: Пары (путь в папке попытки, путь результата): файлы переносятся
+                на место, только если задание еще принадлежит этой попытке
+        
+        Returns:
+            False, если аренда потеряна (результат и файлы не записаны)
+        """
+        with self._transaction() as connection:
+            if connection.execute(f"SELECT id FROM jobs WHERE {OWNER_CONDITION}", _owner(job)).fetchone() is None:
+                return False
+            # Пока транзакция держит блокировку записи, задание не может захватить другой исполнитель
+            for attempt_path, path in files:
+                os.replace(attempt_path, path)
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL, result = ?, error = NULL "
+                "WHERE id = ?",
+                (DONE, time.time(), json.dumps(result, ensure_ascii=False), job['id'])
+            )
+        return True
+    
+    def fail(self, job, error):
+        """Ошибка построения: повтор с задержкой, если попытки не исчерпаны (задание - от claim)"""
+        with self._transaction() as connection:
+            row = connection.execute(f"SELECT id, attempts, max_attempts FROM jobs WHERE {OWNER_CONDITION}",
+                                     _owner(job)).fetchone()
+            if row is not None:
+                self._retry_or_fail(connection, row, error, time.time())
+    
+    def cancel(self, job_id):
+        """
+        Отмена задания: ожидающее снимается сразу, выполняемое останавливается
+        исполнителем при ближайшем продлении аренды
+        
+        Returns:
+            True, если задание ожидало или выполнялось
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                                        (CANCELLED, time.time(), job_id, QUEUED))
+            if cursor.rowcount:
+                return True
+            cursor = connection.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                                        (job_id, RUNNING))
+            return bool(cursor.rowcount)
+    
+    def mark_cancelled(self, job):
+        """Выполнение задания (от claim) остановлено по запросу отмены"""
+        self._connect().execute(
+            f"UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL WHERE {OWNER_CONDITION}",
+            (CANCELLED, time.time(), *_owner(job))
+        )
+    
+    def get(self, job_id):
+        """Задание по номеру (словарь с разобранными progress и result) или None"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row is not None else None
+    
+    def jobs(self, status=None, tenant=None, limit=100):
+        """Последние задания, при необходимости - с заданным состоянием и арендатором"""
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if tenant is not None:
+            conditions.append("tenant = ?")
+            params.append(tenant)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connect().execute(f"SELECT * FROM jobs {where} ORDER BY id DESC LIMIT ?",
+                                       (*params, limit)).fetchall()
+        return [_job_dict(row) for row in rows]
+    
+    def stats(self):
+        """Число заданий по состояниям"""
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        for row in self._connect().execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"):
+            counts[row['status']] = row['count']
+        return counts
+
+
+def _check_path_part(value, what):
+    """
+    Проверка части пути файла отчета: <арендатор>/<номер>-<имя>.xlsx не выходит из папки отчетов
+    
+    Raises:
+        ValueError: Пустое значение, начинается с точки (в том числе "..") или содержит разделители путей
+    """
+    if not isinstance(value, str) or not value or value.startswith('.') or \
+            any(char in PATH_PART_INVALID_CHARS for char in value):
+        raise ValueError(f"Недопустимое значение в пути файла отчета ({what}): {value!r}")
+
+
+def _owner(job):
+    """Параметры OWNER_CONDITION для задания, полученного от claim"""
+    return job['id'], job['worker'], job['attempts']
+
+
+def _json_default(value):
+    """Даты и Decimal в данных задания"""
+    if isinstance(value, (datetime, date, day_time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Значение типа {type(value).__name__} не сохраняется в задании")
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK при исключении)"""
+    
+    def __init__(self, connection):
+        self.connection = connection
+    
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+        return False
+
+
+def _job_dict(row):
+    job = dict(row)
+    del job['payload']
+    for key in ('progress', 'result'):
+        if job[key] is not None:
+            job[key] = json.loads(job[key])
+    return job
+
+
+class _JobHeartbeat:
+    """
+    Продление аренды выполняемого задания в отдельном потоке
+    
+    Функция прогресса рендерера только запоминает последнее состояние; поток
+    раз в HEARTBEAT_SECONDS продлевает аренду, сохраняет прогресс и по запросу
+    отмены или при потере аренды останавливает построение через токен.
+    """
+    
+    def __init__(self, queue, job, token, interval=None):
+        self.queue = queue
+        self.job = job
+        self.token = token
+        self.interval = interval or HEARTBEAT_SECONDS
+        self.state = None
+        self.lease_lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"report-job-{job['id']}", daemon=True)
+    
+    def __call__(self, state):
+        self.state = state
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            state = self.state
+            progress = {key: state[key] for key in ('phase', 'section_index', 'sections_total', 'rows_written', 'eta')} \
+                if state else None
+            try:
+                if self.queue.heartbeat(self.job, progress):
+                    self.token.cancel()
+            except JobLeaseLostError as e:
+                print(f"Предупреждение: {e} - построение остановлено")
+                self.lease_lost = True
+                self.token.cancel()
+                return
+            except sqlite3.Error as e:
+                print(f"Предупреждение: не удалось продлить аренду задания {self.job['id']}: {e}")
+
+
+def execute_job(queue, job, output_dir, renderer_options=None):
+    """
+    Построение отчета задания и запись результата в очередь
+    
+    Отчет строится в папке попытки и переносится в <output_dir>/<арендатор>/<номер>-<имя>.xlsx,
+    только если задание все еще принадлежит этой попытке.
+    """
+    payload = job['payload']
+    token = CancellationToken()
+    tenant_dir = os.path.join(output_dir, job['tenant'])
+    attempt_dir = os.path.join(tenant_dir, f"{ATTEMPT_DIR_PREFIX}{job['id']}-{job['attempts']}")
+    os.makedirs(attempt_dir, exist_ok=True)
+    
+    try:
+        with _JobHeartbeat(queue, job, token) as heartbeat:
+            options = {**(renderer_options or {}), **payload['renderer_options'], 'progress': heartbeat,
+                       'cancel_token': token}
+            result = render_job(
+                {'name': f"{job['id']}-{job['name']}", 'template': payload['template'], 'context': payload['context']},
+                attempt_dir, profile=payload['profile'], renderer_options=options
+            )
+    
+        if heartbeat.lease_lost:
+            return
+        if result['error'] is None:
+            files = [result['path']]
+            if 'profile' in result:
+                base = os.path.splitext(result['path'])[0]
+                files += [base + '.profile.folded', base + '.profile.json']
+            artifacts = [os.path.join(tenant_dir, os.path.basename(path)) for path in files]
+            completed = queue.complete(job, {'path': artifacts[0], 'seconds': result['seconds'], 'artifacts': artifacts},
+                                       files=list(zip(files, artifacts)))
+            if not completed:
+                print(f"Предупреждение: аренда задания {job['id']} (попытка {job['attempts']}) потеряна "
+                      f"- результат не записан")
+        elif token.cancelled:
+            queue.mark_cancelled(job)
+        else:
+            queue.fail(job, result['error'])
+    finally:
+        shutil.rmtree(attempt_dir, ignore_errors=True)
+
+
+def run_worker(queue, output_dir, renderer_options=None, worker=None, poll_interval=POLL_INTERVAL,
+               stop_when_idle=False, stop_event=None):
+    """
+    Цикл исполнителя: захват и выполнение заданий очереди
+    
+    Args:
+        queue: ReportJobQueue
+        output_dir: Папка отчетов (подпапка на арендатора)
+        renderer_options: Параметры AdvancedExcelRenderer для всех заданий
+        worker: Имя исполнителя (по умолчанию - хост и номер процесса)
+        poll_interval: Пауза при пустой очереди, секунды
+        stop_when_idle: Завершиться, когда готовых заданий нет
+        stop_event: Событие остановки (текущее задание доделывается)
+    
+    Returns:
+        Количество выполненных заданий
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    
+    while stop_event is None or not stop_event.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            if stop_when_idle:
+                break
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        
+        execute_job(queue, job, output_dir, renderer_options)
+        processed += 1
+    
+    return processed
+
+
+class ReportWorkerPool:
+    """Процессы-исполнители очереди (число процессов - предел одновременных отчетов)"""
+    
+    def __init__(self, queue, output_dir, workers=2, renderer_options=None, poll_interval=POLL_INTERVAL):
+        """
+        Args:
+            queue: ReportJobQueue
+            output_dir: Папка отчетов
+            workers: Число процессов-исполнителей
+            renderer_options: Параметры AdvancedExcelRenderer для всех заданий
+            poll_interval: Пауза исполнителя при пустой очереди, секунды
+        """
+        self.queue = queue
+        self.output_dir = output_dir
+        self.workers = max(1, int(workers))
+        self.renderer_options = renderer_options
+        self.poll_interval = poll_interval
+        self.stop_event = multiprocessing.Event()
+    
+    def run(self, stop_when_idle=False):
+        """
+        Запуск исполнителей и ожидание их завершения
+        
+        Ctrl+C останавливает исполнителей после текущих заданий.
+        """
+        processes = [
+            multiprocessing.Process(
+                target=run_worker, name=f'report-worker-{index}',
+                args=(self.queue, self.output_dir, self.renderer_options, None, self.poll_interval,
+                      stop_when_idle, self.stop_event)
+            )
+            for index in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+        
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stop()
+            for process in processes:
+                process.join()
+    
+    def stop(self):
+        """Остановка исполнителей после текущих заданий"""
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Очередь заданий построения отчетов")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="Файл базы очереди")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    submit = commands.add_parser("submit", help="Поставить задания из JSON-файла в очередь")
+    submit.add_argument("jobs", help="JSON-файл со списком заданий {name, template, context}")
+    submit.add_argument("--tenant", default="default", help="Арендатор")
+    submit.add_argument("--priority", type=int, default=0, help="Приоритет (больше - раньше)")
+    submit.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Попыток построения")
+    submit.add_argument("--profile", action="store_true", help="Профилировать отчеты")
+    
+    work = commands.add_parser("work", help="Запустить исполнителей")
+    work.add_argument("--workers", type=int, default=2, help="Число процессов-исполнителей")
+    work.add_argument("--output-dir", default="reports", help="Папка для файлов отчетов")
+    work.add_argument("--engine", default=None, help="Бэкенд записи: openpyxl, fast, xlsxwriter")
+    work.add_argument("--max-per-tenant", type=int, default=None, help="Предел заданий одного арендатора")
+    work.add_argument("--until-idle", action="store_true", help="Завершиться, когда очередь опустеет")
+    
+    cancel = commands.add_parser("cancel", help="Отменить задание")
+    cancel.add_argument("job_id", type=int)
+    
+    commands.add_parser("status", help="Состояние очереди")
+    args = parser.parse_args()
+    
+    queue = ReportJobQueue(args.queue, max_running_per_tenant=getattr(args, 'max_per_tenant', None))
+    
+    if args.command == "submit":
+        with open(args.jobs, 'r', encoding='utf-8') as jobs_file:
+            jobs = json.load(jobs_file)
+        job_ids = [queue.submit(job, tenant=args.tenant, priority=args.priority, max_attempts=args.max_attempts,
+                                profile=args.profile) for job in jobs]
+        print(f"📥 Поставлено заданий: {len(job_ids)} ({job_ids[0]}-{job_ids[-1]})" if job_ids else "Нет заданий")
+    elif args.command == "work":
+        renderer_options = {'engine': args.engine} if args.engine else None
+        ReportWorkerPool(queue, args.output_dir, args.workers, renderer_options).run(stop_when_idle=args.until_idle)
+    elif args.command == "cancel":
+        print("Отмена запрошена" if queue.cancel(args.job_id) else "Задание не ожидает и не выполняется")
+    else:
+        print(' '.join(f"{status}: {count}" for status, count in queue.stats().items()))
+        for job in queue.jobs(limit=20):
+            details = job['error'] or (job['result'] or {}).get('path') or ''
+            print(f"{job['id']:>6} {job['tenant']:<12} {job['name']:<24} {job['status']:<10} "
+                  f"попыток {job['attempts']}/{job['max_attempts']} {details}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Профилирование построения отчетов
+
+Профилировщик периодически снимает стек потока, строящего отчет (выборочное
+профилирование, без замедления каждого вызова, как у cProfile). Каждая выборка
+помечается этапом (render, template, save) и типом отрисовываемой секции.
+Результат:
+- файл свернутых стеков (collapsed stacks: "этап;секция;функция;... число"),
+  который принимают flamegraph.pl, speedscope и inferno
+- сводка: время по этапам, типам секций и методам рендерера (включая вложенные вызовы)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+
+# Интервал выборок стека, секунды
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Расширения файлов профиля рядом с файлом отчета
+COLLAPSED_EXTENSION = '.profile.folded'
+SUMMARY_EXTENSION = '.profile.json'
+
+# Метка выборок вне секций (заголовок, метрики, оформление книги)
+NO_SECTION = 'report'
+
+
+class ReportProfiler:
+    """Выборочный профилировщик построения одного отчета"""
+    
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, method_classes=('AdvancedExcelRenderer',)):
+        """
+        Args:
+            interval: Интервал выборок стека, секунды
+            method_classes: Классы, методы которых учитываются в сводке
+        """
+        self.interval = interval
+        self.method_prefixes = tuple(f"{name}." for name in method_classes)
+        self.section = None
+        self.samples = {}
+        self.sample_count = 0
+        self.elapsed = 0.0
+        self._phase = None
+        self._started = 0.0
+        self._base_frame = None
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+    
+    def measure(self, phase, depth=1):
+        """
+        Контекстный менеджер: выборки стека, пока выполняется вызвавший метод
+        
+        Args:
+            phase: Этап построения отчета (первый кадр свернутых стеков)
+            depth: Глубина профилируемого метода от вызова measure (1 - вызвавший метод)
+        """
+        return _Measurement(self, phase, sys._getframe(depth))
+    
+    def _start(self, phase, base_frame):
+        self._phase = phase
+        self._base_frame = base_frame
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name='report-profiler', daemon=True)
+        self._sampler.start()
+    
+    def _finish(self):
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        self._base_frame = None
+        self.elapsed += time.perf_counter() - self._started
+    
+    def _run(self):
+        """Поток выборок: стек профилируемого потока раз в interval секунд"""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._sample(frame)
+    
+    def _sample(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+            if frame is self._base_frame:
+                break
+            frame = frame.f_back
+        else:
+            return  # Профилируемый метод уже завершился
+        
+        stack.append(self.section or NO_SECTION)
+        stack.append(self._phase)
+        key = tuple(reversed(stack))
+        self.samples[key] = self.samples.get(key, 0) + 1
+        self.sample_count += 1
+    
+    def collapsed(self):
+        """Строки свернутых стеков: "кадр;кадр;... число выборок" """
+        return [f"{';'.join(stack)} {count}" for stack, count in sorted(self.samples.items())]
+    
+    def summary(self):
+        """
+        Сводка профиля
+        
+        Returns:
+            Словарь: elapsed и samples, время (секунды) по этапам (phases), типам секций
+            (sections) и методам рендерера (methods, с учетом вложенных вызовов),
+            методы упорядочены по убыванию времени
+        """
+        seconds_per_sample = self.elapsed / self.sample_count if self.sample_count else 0.0
+        phases, sections, methods = {}, {}, {}
+        
+        for stack, count in self.samples.items():
+            phase, section = stack[0], stack[1]
+            phases[phase] = phases.get(phase, 0) + count
+            sections[section] = sections.get(section, 0) + count
+            # Рекурсивный метод учитывается в выборке один раз
+            for name in {frame.split(':', 1)[1] for frame in stack[2:]}:
+                if name.startswith(self.method_prefixes):
+                    methods[name] = methods.get(name, 0) + count
+        
+        def seconds(counts):
+            return {name: count * seconds_per_sample
+                    for name, count in sorted(counts.items(), key=lambda item: -item[1])}
+        
+        return {
+            'elapsed': self.elapsed,
+            'samples': self.sample_count,
+            'phases': seconds(phases),
+            'sections': seconds(sections),
+            'methods': seconds(methods)
+        }
+    
+    def write(self, report_path):
+        """
+        Запись профиля рядом с файлом отчета: <отчет>.profile.folded и <отчет>.profile.json
+        
+        Returns:
+            (путь свернутых стеков, путь сводки)
+        """
+        base = os.path.splitext(report_path)[0]
+        collapsed_path = base + COLLAPSED_EXTENSION
+        summary_path = base + SUMMARY_EXTENSION
+        
+        with open(collapsed_path, 'w', encoding='utf-8') as collapsed_file:
+            collapsed_file.write('\n'.join(self.collapsed()) + '\n')
+        with open(summary_path, 'w', encoding='utf-8') as summary_file:
+            json.dump(self.summary(), summary_file, ensure_ascii=False, indent=2)
+        return collapsed_path, summary_path
+
+
+class _Measurement:
+    """Профилирование одного этапа (вложенные этапы не запускают второй поток выборок)"""
+    
+    def __init__(self, profiler, phase, base_frame):
+        self.profiler = profiler
+        self.phase = phase
+        self.base_frame = base_frame
+        self.active = False
+    
+    def __enter__(self):
+        if self.profiler._sampler is None:
+            self.profiler._start(self.phase, self.base_frame)
+            self.active = True
+        return self.profiler
+    
+    def __exit__(self, *exc_info):
+        if self.active:
+            self.profiler._finish()
+        return False
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Прогресс и отмена построения отчета
+
+Рендерер сообщает о ходе построения функции обратного вызова: номер секции,
+записанные строки данных, объем добавленных изображений и оценку оставшегося
+времени. Циклы записи строк обращаются к трекеру раз в interval строк (между
+обращениями - только счетчик строк), и в тех же точках проверяется токен
+отмены: отмененный отчет прерывается исключением ReportCancelledError,
+а его книга и хранилища строк освобождаются.
+"""
+
+import os
+import threading
+import time
+
+
+# Строк данных между вызовами функции прогресса и проверками отмены
+DEFAULT_PROGRESS_INTERVAL = 10000
+
+
+class ReportCancelledError(Exception):
+    """Построение отчета остановлено (отмена или таймаут)"""
+
+
+class CancellationToken:
+    """Флаг отмены построения отчета (можно устанавливать из другого потока)"""
+    
+    def __init__(self, parent=None):
+        """
+        Args:
+            parent: Токен, отмена которого отменяет и этот токен (необязательно)
+        """
+        self._event = threading.Event()
+        self.parent = parent
+    
+    def cancel(self):
+        """Запрос отмены: отчет прерывается при ближайшей проверке"""
+        self._event.set()
+    
+    @property
+    def cancelled(self):
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+    
+    def raise_if_cancelled(self):
+        """
+        Raises:
+            ReportCancelledError: Отмена запрошена
+        """
+        if self.cancelled:
+            raise ReportCancelledError("Построение отчета отменено")
+
+
+class ProgressTracker:
+    """Счетчики хода построения отчета, вызовы функции прогресса и проверки отмены"""
+    
+    def __init__(self, callback=None, interval=DEFAULT_PROGRESS_INTERVAL, cancel_token=None):
+        """
+        Args:
+            callback: Функция прогресса, получает словарь (см. snapshot)
+            interval: Строк данных между вызовами callback и проверками отмены
+            cancel_token: CancellationToken отчета
+        """
+        self.callback = callback
+        self.interval = max(1, int(interval or DEFAULT_PROGRESS_INTERVAL))
+        self.cancel_token = cancel_token
+        self.phase = 'render'
+        self.sections_total = 0
+        self.section_index = 0
+        self.section_title = None
+        self.rows_written = 0
+        self.rows_total = None
+        self.media_bytes = 0
+        self.started = time.perf_counter()
+    
+    def start(self, sections_total, rows_total=None):
+        """Начало отрисовки секций (rows_total - оценка строк данных, None - неизвестна)"""
+        self.sections_total = sections_total
+        self.rows_total = rows_total
+        self.notify()
+    
+    def start_section(self, title):
+        """Начало очередной секции"""
+        self.section_index += 1
+        self.section_title = title
+        self.notify()
+    
+    def advance(self, rows):
+        """Записаны rows строк данных (вызывается циклами записи раз в interval строк и в конце цикла)"""
+        self.rows_written += rows
+        self.notify()
+    
+    def add_media(self, size):
+        """Добавлено изображение размером size байт"""
+        self.media_bytes += size
+        self.notify()
+    
+    def set_phase(self, phase):
+        """Этап построения: render, save или done"""
+        self.phase = phase
+        self.notify()
+    
+    def notify(self):
+        """Проверка отмены и вызов функции прогресса"""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        if self.callback is not None:
+            self.callback(self.snapshot())
+    
+    def snapshot(self):
+        """
+        Состояние построения
+        
+        Returns:
+            Словарь: phase, section_index (с 1), sections_total, section_title,
+            rows_written, rows_total, media_bytes, elapsed и eta (секунды;
+            eta - None, пока оценить нельзя)
+        """
+        elapsed = time.perf_counter() - self.started
+        return {
+            'phase': self.phase,
+            'section_index': self.section_index,
+            'sections_total': self.sections_total,
+            'section_title': self.section_title,
+            'rows_written': self.rows_written,
+            'rows_total': self.rows_total,
+            'media_bytes': self.media_bytes,
+            'elapsed': elapsed,
+            'eta': self._eta(elapsed)
+        }
+    
+    def _eta(self, elapsed):
+        """Оставшееся время по доле записанных строк (или пройденных секций, если число строк неизвестно)"""
+        if self.phase == 'done':
+            return 0.0
+        if self.rows_total:
+            done = min(self.rows_written / self.rows_total, 1.0)
+        elif self.sections_total:
+            done = max(self.section_index - 1, 0) / self.sections_total
+        else:
+            return None
+        if done <= 0:
+            return None
+        return elapsed * (1 - done) / done
+
+
+def image_size(image):
+    """Размер содержимого изображения openpyxl в байтах (0 - неизвестен)"""
+    ref = image.ref
+    if isinstance(ref, (str, os.PathLike)):
+        try:
+            return os.path.getsize(ref)
+        except OSError:
+            return 0
+    if hasattr(ref, 'getbuffer'):
+        return ref.getbuffer().nbytes
+    return 0
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Бэкенды записи отчетов
+
+Рендерер строит книгу openpyxl - заголовки, стили, объединения, таблицы Excel,
+условное форматирование, графики и изображения, - а строки данных таблиц
+и групп, группировку строк и сохранение книги передает бэкенду записи.
+Бэкенд выбирается параметром engine рендерера и не зависит от шаблонов отчетов:
+
+- openpyxl - строки записываются ячейками openpyxl, книга сохраняется openpyxl
+- fast - строки хранятся кортежами и вставляются в XML листов при сохранении
+- xlsxwriter - книга записывается через xlsxwriter в режиме constant_memory:
+  строки листа сбрасываются на диск по мере записи
+
+Бэкенды fast и xlsxwriter принимают лимит памяти строк (memory_budget_mb):
+при его превышении строки хранилищ выгружаются во временные файлы.
+
+Свой бэкенд регистрируется через register_writer(имя, класс).
+"""
+
+from abc import ABC, abstractmethod
+from itertools import repeat
+
+from fast_xlsx_writer import TABLE_ROW_STYLES, FastRowStore, MemoryBudget, save_workbook as save_fast_workbook
+from xlsxwriter_export import xlsxwriter, save_workbook as save_xlsxwriter_workbook
+
+
+class ReportWriter(ABC):
+    """Бэкенд записи строк данных, группировки строк и сохранения книги"""
+    
+    # Имя бэкенда (значение параметра engine рендерера)
+    name = None
+    
+    def reset(self):
+        """Начало нового отчета"""
+    
+    def fingerprint(self):
+        """Отпечаток бэкенда для ключей кешей отчетов (содержимое книги зависит только от бэкенда)"""
+        return self.name or type(self).__name__
+    
+    def row_store(self, ws):
+        """Хранилище строк листа (None, если строки пишутся ячейками openpyxl)"""
+        return None
+    
+    @abstractmethod
+    def write_row(self, ws, row, first_column, values, styles=TABLE_ROW_STYLES):
+        """
+        Запись строки данных
+        
+        Args:
+            ws: Лист openpyxl
+            row: Номер строки
+            first_column: Номер колонки первого значения
+            values: Значения строки
+            styles: Имена стилей чисел и остальных значений или список
+                таких пар по колонкам строки
+        """
+    
+    @abstractmethod
+    def group_rows(self, ws, start_row, end_row, level=1, hidden=False):
+        """Группировка строк start_row..end_row на уровне level"""
+    
+    def last_row(self, ws):
+        """Последняя заполненная строка листа"""
+        return ws.max_row
+    
+    def column_lengths(self, ws):
+        """Наибольшая длина значения в колонках строк, записанных без ячеек openpyxl"""
+        return {}
+    
+    @abstractmethod
+    def save(self, workbook, filename):
+        """Сохранение книги в файл (путь или файловый объект)"""
+
+
+class OpenpyxlWriter(ReportWriter):
+    """Запись ячейками openpyxl"""
+    
+    name = 'openpyxl'
+    
+    def write_row(self, ws, row, first_column, values, styles=TABLE_ROW_STYLES):
+        column_styles = styles if type(styles) is list else repeat(styles)
+        for col_idx, (value, (number_style, other_style)) in enumerate(zip(values, column_styles), first_column):
+            cell = ws.cell(row=row, column=col_idx, value=value)
+            if isinstance(value, (int, float)):
+                cell.style = number_style
+            else:
+                cell.style = other_style
+    
+    def group_rows(self, ws, start_row, end_row, level=1, hidden=False):
+        # Уровень задается каждой строке (вложенные группы с более глубоким уровнем сохраняют свой уровень)
+        for row in range(start_row, end_row + 1):
+            ws.row_dimensions[row].outline_level = max(ws.row_dimensions[row].outline_level, level)
+            if hidden:
+                ws.row_dimensions[row].hidden = True
+    
+    def save(self, workbook, filename):
+        workbook.save(filename)
+
+
+class RowStoreWriter(ReportWriter):
+    """Бэкенд, хранящий строки данных и группировку в FastRowStore листа"""
+    
+    def __init__(self, memory_budget_mb=None):
+        """
+        Args:
+            memory_budget_mb: Лимит памяти строк хранилищ в МБ (None - без лимита),
+                строки сверх лимита выгружаются во временные файлы
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self.memory_budget = None
+        self.stores = {}
+    
+    def reset(self):
+        for store in self.stores.values():
+            store.close()
+        self.stores = {}
+        self.memory_budget = MemoryBudget(self.memory_budget_mb) if self.memory_budget_mb else None
+    
+    def row_store(self, ws):
+        store = self.stores.get(ws)
+        if store is None:
+            store = self.stores[ws] = FastRowStore(self.memory_budget)
+        return store
+    
+    def write_row(self, ws, row, first_column, values, styles=TABLE_ROW_STYLES):
+        self.row_store(ws).add_row(row, first_column, values, styles)
+    
+    def group_rows(self, ws, start_row, end_row, level=1, hidden=False):
+        # Группировка хранится диапазоном, без RowDimension на каждую строку
+        self.row_store(ws).group_rows(start_row, end_row, level, hidden)
+    
+    def last_row(self, ws):
+        store = self.stores.get(ws)
+        return max(ws.max_row, store.max_row) if store else ws.max_row
+    
+    def column_lengths(self, ws):
+        store = self.stores.get(ws)
+        return store.column_lengths() if store else {}
+
+
+class FastWriter(RowStoreWriter):
+    """Строки хранилищ вставляются в XML листов, записанных openpyxl"""
+    
+    name = 'fast'
+    
+    def save(self, workbook, filename):
+        if any(self.stores.values()):
+            save_fast_workbook(workbook, self.stores, filename)
+        else:
+            workbook.save(filename)
+
+
+class XlsxWriterWriter(RowStoreWriter):
+    """Книга записывается через xlsxwriter (по умолчанию в режиме constant_memory)"""
+    
+    name = 'xlsxwriter'
+    
+    def __init__(self, constant_memory=True, memory_budget_mb=None):
+        """
+        Args:
+            constant_memory: Сбрасывать строки листа на диск по мере записи
+                (память не растет с размером листа)
+            memory_budget_mb: Лимит памяти строк хранилищ в МБ до сохранения книги
+        """
+        super().__init__(memory_budget_mb)
+        self.constant_memory = constant_memory
+    
+    def save(self, workbook, filename):
+        if xlsxwriter is None:
+            print("Предупреждение: xlsxwriter не установлен - отчет сохраняется движком fast")
+            FastWriter.save(self, workbook, filename)
+            return
+        save_xlsxwriter_workbook(workbook, self.stores, filename, constant_memory=self.constant_memory)
+
+
+# Бэкенды записи по имени
+WRITER_BACKENDS = {
+    OpenpyxlWriter.name: OpenpyxlWriter,
+    FastWriter.name: FastWriter,
+    XlsxWriterWriter.name: XlsxWriterWriter,
+}
+
+
+def register_writer(name, writer_class):
+    """Регистрация бэкенда записи под именем для параметра engine рендерера"""
+    WRITER_BACKENDS[name] = writer_class
+
+
+def create_writer(engine):
+    """
+    Бэкенд записи по имени или готовый экземпляр ReportWriter
+    
+    Raises:
+        ValueError: Неизвестное имя бэкенда
+    """
+    if isinstance(engine, ReportWriter):
+        return engine
+    
+    writer_class = WRITER_BACKENDS.get(engine)
+    if writer_class is None:
+        raise ValueError(f"Неизвестный движок записи '{engine}', доступны: {', '.join(WRITER_BACKENDS)}")
+    return writer_class()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Кеш отрисованных секций отчета для инкрементальной перегенерации
+
+Каждая секция после подстановки данных хешируется (тип, данные и настройки).
+Результат отрисовки секции - ячейки со стилями, объединения, параметры строк,
+таблицы Excel и изображения - сохраняется на диск как фрагмент. При следующей
+генерации секция с тем же хешем не отрисовывается заново: фрагмент вставляется
+в новую книгу со сдвигом строк на ее новое положение.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from copy import copy, deepcopy
+from io import BytesIO
+from itertools import islice, repeat
+
+import openpyxl
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.drawing.image import Image
+from openpyxl.formula.translate import Translator
+from openpyxl.utils.cell import coordinate_from_string, range_boundaries
+
+from data_providers import UncacheableDataError, fingerprint_default, pd
+from excel_utils import COLUMN_LETTERS, range_address
+
+
+# Версия формата фрагментов: при изменении отрисовки секций старые фрагменты не используются
+# (версия openpyxl тоже входит в хеш - фрагменты хранят его объекты стилей и таблиц)
+CACHE_FORMAT_VERSION = 2
+
+# Элементов списка (строк данных) в одном блоке JSON при хешировании секции
+HASH_BATCH_ROWS = 1000
+
+# Расширение файлов фрагментов
+FRAGMENT_EXTENSION = '.fragment'
+
+
+class SectionCache:
+    """Дисковый кеш фрагментов секций с учетом попаданий"""
+    
+    def __init__(self, directory):
+        """
+        Args:
+            directory: Папка для файлов фрагментов (создается при необходимости)
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._used_keys = set()
+    
+    @staticmethod
+    def section_key(section_data):
+        """
+        Хеш секции: тип, данные и все настройки (None - секция с ленивыми данными без отпечатка)
+        
+        Данные хешируются блоками по HASH_BATCH_ROWS строк, без JSON всей секции в памяти.
+        """
+        digest = hashlib.sha256(f"{CACHE_FORMAT_VERSION}:{openpyxl.__version__}:".encode('utf-8'))
+        try:
+            _hash_json(digest, section_data)
+        except UncacheableDataError:
+            return None
+        return digest.hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key + FRAGMENT_EXTENSION)
+    
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+    
+    def get(self, key):
+        """Фрагмент секции по хешу или None"""
+        self._used_keys.add(key)
+        path = self._path(key)
+        
+        try:
+            with open(path, 'rb') as fragment_file:
+                fragment = pickle.load(fragment_file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            # Поврежденный фрагмент удаляется и секция отрисовывается заново
+            print(f"Предупреждение: не удалось прочитать фрагмент секции {key}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        return fragment
+    
+    def put(self, key, fragment):
+        """Сохранение фрагмента секции (атомарная запись)"""
+        self._used_keys.add(key)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as fragment_file:
+                pickle.dump(fragment, fragment_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            self._remove(temp_path)
+            raise
+        self.stored += 1
+    
+    def remove_unused(self):
+        """Удаление фрагментов секций, не использованных с момента создания кеша"""
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(FRAGMENT_EXTENSION) and name[:-len(FRAGMENT_EXTENSION)] not in self._used_keys:
+                self._remove(os.path.join(self.directory, name))
+                removed += 1
+        return removed
+    
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    
+    @property
+    def hit_rate(self):
+        """Доля секций, взятых из кеша"""
+        requests_count = self.hits + self.misses
+        return self.hits / requests_count if requests_count else 0.0
+    
+    def stats(self):
+        """Статистика кеша"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stored': self.stored,
+            'hit_rate': self.hit_rate
+        }
+
+
+def capture_fragment(ws, start_row, end_row, cells_before, images_before, tables_before, merges_before,
+                     fast_store=None):
+    """
+    Снимок отрисованной секции - строк листа с start_row по end_row - 1
+    
+    Args:
+        ws: Лист секции
+        start_row: Первая строка секции
+        end_row: Строка, следующая за секцией
+        cells_before: Количество ячеек листа до отрисовки секции
+        images_before: Количество изображений листа до отрисовки секции
+        tables_before: Имена таблиц листа до отрисовки секции
+        merges_before: Объединения ячеек листа до отрисовки секции
+        fast_store: Хранилище строк листа движка fast (если есть)
+    
+    Returns:
+        Словарь фрагмента (строки в нем отсчитываются от начала секции)
+        или None, если секцию нельзя перенести
+    """
+    styles = {}
+    cells = []
+    
+    # Ячейки секции - добавленные в лист после cells_before (порядок вставки в словаре)
+    for (row, col_idx), cell in islice(ws._cells.items(), cells_before, None):
+        if isinstance(cell, MergedCell):
+            continue  # Восстанавливаются объединением ячеек
+        style_key = tuple(cell._style)
+        if style_key not in styles:
+            # Копии снимают обертки StyleProxy, которые не сериализуются
+            styles[style_key] = (
+                len(styles),
+                (cell.style, copy(cell.font), copy(cell.fill), copy(cell.border), cell.number_format,
+                 copy(cell.protection), copy(cell.alignment))
+            )
+        cells.append((row - start_row, col_idx, cell._value, cell.data_type, styles[style_key][0]))
+    
+    # Строки движка fast: значения, имена стилей и диапазоны группировки строк секции
+    fast_rows = []
+    outlines = []
+    if fast_store is not None:
+        fast_rows = [
+            (row - start_row, first_column, values, styles)
+            for row, (first_column, values, styles) in fast_store.iter_rows(start_row, end_row - 1)
+        ]
+        outlines = [
+            (first_row - start_row, last_row - start_row, level, hidden)
+            for first_row, last_row, level, hidden in fast_store.outline_ranges(start_row, end_row - 1)
+        ]
+    
+    merges = [
+        (merged.min_row - start_row, merged.min_col, merged.max_row - start_row, merged.max_col)
+        for merged in ws.merged_cells.ranges
+        if merged.coord not in merges_before
+    ]
+    
+    rows = []
+    for row in range(start_row, end_row):
+        if row in ws.row_dimensions:
+            dimensions = ws.row_dimensions[row]
+            rows.append((row - start_row, dimensions.outline_level, dimensions.hidden, dimensions.height))
+    
+    tables = []
+    for table in ws.tables.values():
+        if table.name not in tables_before:
+            min_col, min_row, max_col, max_row = range_boundaries(table.ref)
+            tables.append((table, min_row - start_row, min_col, max_row - start_row, max_col))
+    
+    images = []
+    for image in ws._images[images_before:]:
+        if not isinstance(image.anchor, str):
+            return None  # Привязка объектом не переносится - секция не кешируется
+        column, row = coordinate_from_string(image.anchor)
+        # Привязки внутри секции сдвигаются вместе с ней, заданные вне секции - нет
+        row_offset = row - start_row if start_row <= row < end_row else None
+        images.append((_image_bytes(image), image.width, image.height, column, row, row_offset))
+    
+    return {
+        'version': CACHE_FORMAT_VERSION,
+        'start_row': start_row,
+        'height': end_row - start_row,
+        'styles': [description for _, description in sorted(styles.values(), key=lambda item: item[0])],
+        'cells': cells,
+        'fast_rows': fast_rows,
+        'outlines': outlines,
+        'merges': merges,
+        'rows': rows,
+        'tables': tables,
+        'images': images
+    }
+
+
+def replay_fragment(ws, fragment, start_row, table_name_factory, fast_store=None):
+    """
+    Вставка фрагмента секции в лист начиная со строки start_row
+    
+    Формулы ячеек переносятся со сдвигом относительных ссылок, таблицы Excel
+    получают новые уникальные имена от table_name_factory. Строки движка fast
+    записываются в fast_store, а без него - ячейками openpyxl.
+    """
+    row_shift = start_row - fragment['start_row']
+    
+    # Стиль фрагмента применяется к первой ячейке, остальные копируют ее набор стилей
+    style_arrays = [None] * len(fragment['styles'])
+    
+    cells = ws._cells
+    for row_offset, col_idx, value, data_type, style_idx in fragment['cells']:
+        row = start_row + row_offset
+        
+        style_array = style_arrays[style_idx]
+        if style_array is None:
+            cell = ws.cell(row=row, column=col_idx)
+            name, font, fill, border, number_format, protection, alignment = fragment['styles'][style_idx]
+            cell.style = name
+            cell.font, cell.fill, cell.border = font, fill, border
+            cell.number_format, cell.protection, cell.alignment = number_format, protection, alignment
+            style_array = style_arrays[style_idx] = copy(cell._style)
+        else:
+            # Ячейки создаются напрямую: значение и набор стилей уже известны
+            cell = Cell(ws, row=row, column=col_idx, style_array=copy(style_array))
+            cells[(row, col_idx)] = cell
+        
+        if data_type == 'f' and row_shift and isinstance(value, str):
+            value = _shift_formula(value, col_idx, row, row_shift)
+        cell._value = value
+        cell.data_type = data_type
+    
+    # Строки хранилища - данные секции: формулы в них записаны как есть и не сдвигаются,
+    # как при отрисовке секции на новом месте
+    for row_offset, first_column, values, styles in fragment.get('fast_rows', ()):
+        row = start_row + row_offset
+        if fast_store is not None:
+            fast_store.add_row(row, first_column, values, styles)
+            continue
+        
+        column_styles = styles if type(styles) is list else repeat(styles)
+        for col_idx, (value, (number_style, other_style)) in enumerate(zip(values, column_styles), first_column):
+            cell = ws.cell(row=row, column=col_idx, value=value)
+            cell.style = number_style if isinstance(value, (int, float)) else other_style
+    
+    for min_row, min_col, max_row, max_col in fragment['merges']:
+        ws.merge_cells(range_address(start_row + min_row, min_col, start_row + max_row, max_col))
+    
+    for row_offset, outline_level, hidden, height in fragment['rows']:
+        dimensions = ws.row_dimensions[start_row + row_offset]
+        dimensions.outline_level = max(dimensions.outline_level, outline_level)
+        dimensions.hidden = hidden
+        if height is not None:
+            dimensions.height = height
+    
+    # Группировка строк хранилища - диапазонами, без параметров каждой строки
+    for first_offset, last_offset, outline_level, hidden in fragment['outlines']:
+        if fast_store is not None:
+            fast_store.group_rows(start_row + first_offset, start_row + last_offset, outline_level, hidden)
+            continue
+        for row in range(start_row + first_offset, start_row + last_offset + 1):
+            dimensions = ws.row_dimensions[row]
+            dimensions.outline_level = max(dimensions.outline_level, outline_level)
+            dimensions.hidden = dimensions.hidden or hidden
+    
+    for table, min_row, min_col, max_row, max_col in fragment['tables']:
+        table = deepcopy(table)
+        table.name = table.displayName = table_name_factory()
+        table.ref = range_address(start_row + min_row, min_col, start_row + max_row, max_col)
+        if table.autoFilter is not None:
+            table.autoFilter.ref = table.ref
+        ws.add_table(table)
+    
+    for data, width, height, column, row, row_offset in fragment['images']:
+        image = Image(BytesIO(data))
+        image.width, image.height = width, height
+        anchor_row = start_row + row_offset if row_offset is not None else row
+        ws.add_image(image, f"{column}{anchor_row}")
+
+
+def _hash_json(digest, value):
+    """
+    Хеширование JSON-представления значения частями
+    
+    Словари обходятся по отсортированным ключам, длинные списки и DataFrame
+    кодируются блоками по HASH_BATCH_ROWS элементов.
+    """
+    def dumps(item):
+        return json.dumps(item, sort_keys=True, default=fingerprint_default, ensure_ascii=False)
+    
+    if isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value, key=str):
+            digest.update(f"{dumps(str(key))}:".encode('utf-8'))
+            _hash_json(digest, value[key])
+            digest.update(b',')
+        digest.update(b'}')
+    elif pd is not None and isinstance(value, pd.DataFrame):
+        digest.update(b'DataFrame[')
+        for first in range(0, len(value), HASH_BATCH_ROWS):
+            digest.update(dumps(value.iloc[first:first + HASH_BATCH_ROWS].to_dict('records')).encode('utf-8'))
+        digest.update(b']')
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        if value and isinstance(value[0], dict) and \
+                any(isinstance(item, (dict, list, tuple)) for item in value[0].values()):
+            # Вложенные секции (группы с данными) - каждая своими блоками
+            for item in value:
+                _hash_json(digest, item)
+                digest.update(b',')
+        else:
+            for first in range(0, len(value), HASH_BATCH_ROWS):
+                digest.update(dumps(value[first:first + HASH_BATCH_ROWS]).encode('utf-8'))
+        digest.update(b']')
+    else:
+        digest.update(dumps(value).encode('utf-8'))
+
+
+def _shift_formula(value, col_idx, row, row_shift):
+    """Формула ячейки, перенесенной на row_shift строк (прочие значения без изменений)"""
+    if len(value) < 2 or not value.startswith('='):
+        return value
+    origin = f"{COLUMN_LETTERS[col_idx]}{row - row_shift}"
+    return Translator(value, origin=origin).translate_formula(f"{COLUMN_LETTERS[col_idx]}{row}")
+
+
+def _image_bytes(image):
+    """Содержимое изображения openpyxl без чтения его потока (поток нужен при сохранении книги)"""
+    ref = image.ref
+    if isinstance(ref, (str, os.PathLike)):
+        with open(ref, 'rb') as image_file:
+            return image_file.read()
+    if hasattr(ref, 'getvalue'):
+        return ref.getvalue()
+    
+    buffer = BytesIO()
+    ref.save(buffer, format='png')
+    return buffer.getvalue()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Реестр именованных стилей отчетов
+
+Стиль описывается словарем (как в JSON шаблона): шрифт, заливка, границы,
+выравнивание и формат чисел. Объекты openpyxl для описания строятся один
+раз на процесс и разделяются всеми книгами: подключение стилей к новой книге
+создает только именованные стили из готовых объектов. Одинаковые описания
+интернируются - стили отчета с одинаковыми свойствами становятся одним
+именованным стилем книги (одним индексом стиля ячеек). Для новой книги
+таблица стилей с подключенными стилями копируется из готового снимка,
+без повторного хеширования объектов стилей.
+
+Пример описания:
+    {
+        "font": {"bold": true, "size": 10, "color": "FFFFFF"},
+        "fill": "366092",
+        "border": "thin",
+        "alignment": {"horizontal": "right", "vertical": "center"},
+        "number_format": "#,##0.00 ₽"
+    }
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from copy import copy
+
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils.indexed_list import IndexedList
+
+
+# Встроенные стили рендерера
+BASE_STYLES = {
+    'header_style': {
+        'font': {'bold': True, 'size': 14, 'color': 'FFFFFF'},
+        'fill': '366092',
+        'alignment': {'horizontal': 'center', 'vertical': 'center'},
+        'border': 'thin'
+    },
+    'subheader_style': {
+        'font': {'bold': True, 'size': 12, 'color': '000000'},
+        'fill': 'D9E2F3',
+        'alignment': {'horizontal': 'left', 'vertical': 'center'}
+    },
+    'data_style': {
+        'font': {'size': 10},
+        'alignment': {'horizontal': 'left', 'vertical': 'center'},
+        'border': 'thin'
+    },
+    'number_style': {
+        'font': {'size': 10},
+        'alignment': {'horizontal': 'right', 'vertical': 'center'},
+        'number_format': '#,##0.00',
+        'border': 'thin'
+    },
+}
+
+# Свойства описания стиля
+STYLE_PROPERTIES = ('font', 'fill', 'border', 'alignment', 'number_format')
+
+BORDER_SIDES = ('left', 'right', 'top', 'bottom')
+
+# Списки таблицы стилей книги, которые пополняют именованные стили
+STYLESHEET_LISTS = ('_fonts', '_fills', '_borders', '_alignments', '_protections', '_number_formats')
+
+# Снимков таблиц стилей (наборов подключаемых стилей) в памяти реестра
+STYLESHEET_CACHE_SIZE = 64
+
+# Общий реестр процесса и блокировка его создания
+_default_registry = None
+_registry_lock = threading.Lock()
+
+
+def style_key(spec):
+    """Ключ описания стиля (одинаковые описания - один ключ)"""
+    return json.dumps(spec, sort_keys=True, ensure_ascii=False)
+
+
+def _copy_indexed_list(indexed):
+    """Копия IndexedList openpyxl (словарь индексов копируется без пересчета хешей)"""
+    copied = IndexedList()
+    list.extend(copied, indexed)
+    copied._dict = indexed._dict.copy()
+    copied.clean = indexed.clean
+    return copied
+
+
+def _bind_copy(style, workbook):
+    """Копия именованного стиля из снимка, привязанная к книге"""
+    copied = object.__new__(NamedStyle)
+    copied.__dict__.update(style.__dict__)
+    copied.__dict__['_style'] = copy(style._style)
+    copied.__dict__['_wb'] = workbook
+    return copied
+
+
+def _side(spec):
+    if isinstance(spec, dict):
+        return Side(style=spec.get('style'), color=spec.get('color'))
+    return Side(style=spec)
+
+
+def build_style_parts(spec):
+    """
+    Объекты openpyxl по описанию стиля
+    
+    Returns:
+        (шрифт, заливка, граница, выравнивание, формат чисел)
+    
+    Raises:
+        ValueError: Неизвестное свойство описания
+    """
+    unknown = set(spec) - set(STYLE_PROPERTIES)
+    if unknown:
+        raise ValueError(f"Неизвестные свойства стиля: {', '.join(sorted(unknown))}")
+    
+    font = Font(**spec['font']) if 'font' in spec else Font()
+    
+    fill = spec.get('fill')
+    if fill is None:
+        fill = PatternFill()
+    elif isinstance(fill, dict):
+        color = fill.get('color')
+        fill = PatternFill(start_color=fill.get('start_color', color), end_color=fill.get('end_color', color),
+                           fill_type=fill.get('fill_type', 'solid'))
+    else:
+        fill = PatternFill(start_color=fill, end_color=fill, fill_type='solid')
+    
+    border = spec.get('border')
+    if border is None:
+        border = Border()
+    elif isinstance(border, dict) and any(side in border for side in BORDER_SIDES):
+        border = Border(**{side: _side(border[side]) for side in BORDER_SIDES if side in border})
+    else:
+        border = Border(**{side: _side(border) for side in BORDER_SIDES})
+    
+    alignment = Alignment(**spec['alignment']) if 'alignment' in spec else Alignment()
+    return font, fill, border, alignment, spec.get('number_format', 'General')
+
+
+class StyleRegistry:
+    """Описания именованных стилей и построенные по ним объекты openpyxl"""
+    
+    def __init__(self, styles=None):
+        """
+        Args:
+            styles: Стили {имя: описание} для всех книг (по умолчанию - BASE_STYLES)
+        """
+        # {ключ описания: объекты openpyxl}
+        self._parts = {}
+        # {имя: ключ описания} стилей, подключаемых к каждой книге
+        self._styles = {}
+        # {подключаемые стили: (книга со снимком таблицы стилей, именованные стили)}
+        self._stylesheets = OrderedDict()
+        # Списки таблицы стилей новой книги
+        self._fresh_lists = None
+        self._lock = threading.Lock()
+        for name, spec in (BASE_STYLES if styles is None else styles).items():
+            self.register(name, spec)
+    
+    def __getstate__(self):
+        # Реестр передается процессам пула без блокировки
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_stylesheets'] = OrderedDict()
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def __contains__(self, name):
+        return name in self._styles
+    
+    def register(self, name, spec):
+        """Регистрация стиля, подключаемого ко всем новым книгам"""
+        key = self._intern(spec)
+        with self._lock:
+            self._styles[name] = key
+    
+    def _intern(self, spec):
+        """Ключ описания; объекты openpyxl строятся при первой встрече описания"""
+        key = style_key(spec)
+        if key not in self._parts:
+            parts = build_style_parts(spec)
+            with self._lock:
+                self._parts.setdefault(key, parts)
+        return key
+    
+    def fingerprint(self):
+        """Стабильный отпечаток зарегистрированных стилей (для ключей кешей отчетов)"""
+        with self._lock:
+            return sorted(self._styles.items())
+    
+    def spec_key(self, name):
+        """Ключ описания зарегистрированного стиля (None - стиль не зарегистрирован)"""
+        return self._styles.get(name)
+    
+    def attach(self, workbook, styles=None):
+        """
+        Подключение стилей реестра и стилей отчета к книге
+        
+        Args:
+            workbook: Книга openpyxl
+            styles: Стили отчета {имя: описание} (только для этой книги)
+        
+        Returns:
+            Словарь {имя стиля: имя стиля книги} - стили с одинаковым
+            описанием подключаются одним именованным стилем
+        """
+        names = {}
+        attached = {}
+        added = []
+        existing = set(workbook.named_styles)
+        
+        for name, key in list(self._styles.items()):
+            names[name] = attached.setdefault(key, name)
+            if names[name] == name and name not in existing:
+                added.append((name, key))
+        
+        for name, spec in (styles or {}).items():
+            if name in self._styles:
+                print(f"Предупреждение: стиль '{name}' уже зарегистрирован и не переопределяется отчетом")
+                continue
+            try:
+                key = self._intern(spec)
+            except (TypeError, ValueError) as e:
+                print(f"Предупреждение: стиль отчета '{name}' пропущен: {e}")
+                continue
+            names[name] = attached.setdefault(key, name)
+            if names[name] == name and name not in existing:
+                added.append((name, key))
+        
+        added = tuple(added)
+        stylesheet = self._stylesheet(added) if added else None
+        if stylesheet is not None and self._same_stylesheet(workbook, stylesheet[0]):
+            # Новая книга: таблица стилей копируется из снимка
+            source, named_styles = stylesheet
+            for attribute in STYLESHEET_LISTS:
+                setattr(workbook, attribute, _copy_indexed_list(getattr(source, attribute)))
+            for style in named_styles:
+                workbook._named_styles.append(_bind_copy(style, workbook))
+        else:
+            for name, key in added:
+                workbook.add_named_style(self._named_style(name, key))
+        
+        return names
+    
+    def _stylesheet(self, added):
+        """Снимок таблицы стилей новой книги с подключенными стилями added"""
+        with self._lock:
+            stylesheet = self._stylesheets.get(added)
+            if stylesheet is not None:
+                self._stylesheets.move_to_end(added)
+                return stylesheet
+        
+        source = Workbook()
+        base = {attribute: list(getattr(source, attribute)) for attribute in STYLESHEET_LISTS}
+        named_styles = [self._named_style(name, key) for name, key in added]
+        for style in named_styles:
+            source.add_named_style(style)
+        stylesheet = (source, named_styles)
+        
+        with self._lock:
+            self._stylesheets[added] = stylesheet
+            if len(self._stylesheets) > STYLESHEET_CACHE_SIZE:
+                self._stylesheets.popitem(last=False)
+            if self._fresh_lists is None:
+                self._fresh_lists = base
+        return stylesheet
+    
+    def _same_stylesheet(self, workbook, source):
+        """Таблица стилей книги - как у новой книги (снимок к ней применим)"""
+        if len(workbook._named_styles) != 1 or workbook._named_styles[0].name != source._named_styles[0].name:
+            return False
+        return all(list(getattr(workbook, attribute)) == self._fresh_lists[attribute]
+                   for attribute in STYLESHEET_LISTS)
+    
+    def _named_style(self, name, key):
+        font, fill, border, alignment, number_format = self._parts[key]
+        return NamedStyle(name=name, font=font, fill=fill, border=border, alignment=alignment,
+                          number_format=number_format)
+
+
+def get_style_registry():
+    """Общий реестр процесса (создается со встроенными стилями при первом обращении)"""
+    global _default_registry
+    if _default_registry is None:
+        with _registry_lock:
+            if _default_registry is None:
+                _default_registry = StyleRegistry()
+    return _default_registry
+
+
+def register_style(name, spec):
+    """Регистрация стиля в общем реестре процесса (подключается ко всем новым книгам)"""
+    get_style_registry().register(name, spec)
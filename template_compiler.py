@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Предкомпиляция шаблонов отчетов в функции Python
+
+render_template_with_data обходит шаблон рекурсивно при каждом вызове.
+Компилятор один раз переводит шаблон в исходный код функции render(context),
+которая строит результат литералами словарей и списков: неизменяемые части
+шаблона вставляются как константы, ссылки на данные - прямыми обращениями
+к контексту, остальные строки Jinja2 - вызовами заранее скомпилированных шаблонов.
+
+Скомпилированный код кешируется в памяти процесса (последние COMPILED_CACHE_SIZE
+шаблонов) и на диске по хешу шаблона. Шаблоны со значениями, у которых нет
+однозначной записи (DataFrame, произвольные объекты), не кешируются.
+"""
+
+import hashlib
+import importlib.util
+import marshal
+import math
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from data_providers import UncacheableDataError
+from template_environment import DATA_REFERENCE_PATTERN, get_template_environment, lookup_data_reference
+
+
+# Версия генератора кода: при изменении старые файлы кеша не используются
+COMPILER_VERSION = 1
+
+# Расширение файлов кеша скомпилированных шаблонов
+COMPILED_EXTENSION = '.tplc'
+
+# Скомпилированных шаблонов в памяти процесса (давно не использованные вытесняются)
+COMPILED_CACHE_SIZE = 128
+
+# Скомпилированные шаблоны процесса по хешу, от давно использованных к недавним
+_compiled_templates = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def template_hash(template_data):
+    """
+    Хеш шаблона (не зависит от порядка ключей словарей)
+    
+    Raises:
+        UncacheableDataError: В шаблоне есть значения без однозначной записи
+    """
+    payload = _canonical_encoding(template_data)
+    return hashlib.sha256(f"{COMPILER_VERSION}:{payload}".encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def _canonical_encoding(value):
+    """
+    Однозначная запись значения шаблона: тип входит в запись (1 и "1", True и 1 различаются),
+    ключи словарей упорядочены по их записи, поэтому допустимы ключи разных типов
+    """
+    if value is None:
+        return 'n'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, int):
+        return f"i{value};"
+    if isinstance(value, float):
+        return f"d{value.hex()};"
+    if isinstance(value, str):
+        return f"s{len(value)}:{value}"
+    if isinstance(value, list):
+        return 'l' + ''.join(_canonical_encoding(item) for item in value) + 'e'
+    if isinstance(value, dict):
+        items = sorted((_canonical_encoding(key), _canonical_encoding(item)) for key, item in value.items())
+        return 'm' + ''.join(key + item for key, item in items) + 'e'
+    raise UncacheableDataError(f"Значение шаблона без однозначной записи: {type(value).__name__}")
+
+
+class CompiledTemplate:
+    """Шаблон отчета, скомпилированный в функцию render(context)"""
+    
+    def __init__(self, code, templates, constants, source=None, environment=None):
+        """
+        Args:
+            code: Объект кода модуля с функцией render
+            templates: Исходные тексты строк Jinja2 шаблона
+            constants: Значения шаблона, не представимые литералами
+            source: Исходный код (если шаблон скомпилирован в этом процессе)
+            environment: TemplateEnvironment строк Jinja2 (по умолчанию - общее окружение процесса)
+        """
+        self.source = source
+        self.environment = environment
+        self._templates = templates
+        self._compiled = [None] * len(templates)
+        
+        namespace = {
+            '_constants': constants,
+            '_lookup': self._lookup,
+            '_render': self._render,
+        }
+        exec(code, namespace)
+        self._render_function = namespace['render']
+    
+    def render(self, context_data):
+        """Построение данных отчета по контексту"""
+        return self._render_function(context_data)
+    
+    __call__ = render
+    
+    def _render(self, index, context):
+        """Рендеринг строки шаблона Jinja2 с компиляцией при первом использовании"""
+        template = self._compiled[index]
+        try:
+            if template is None:
+                environment = self.environment or get_template_environment()
+                template = self._compiled[index] = environment.get_template(self._templates[index])
+            return template.render(**context)
+        except Exception as e:
+            print(f"Ошибка рендеринга шаблона: {e}")
+            return self._templates[index]
+    
+    def _lookup(self, context, path, index):
+        """Значение прямой ссылки на данные; при отсутствии - рендеринг строки как шаблона"""
+        try:
+            return lookup_data_reference(context, path)
+        except (KeyError, IndexError, TypeError):
+            print(f"Не найден ключ: {'.'.join(path)}")
+            return self._render(index, context)
+
+
+class _CodeGenerator:
+    """Генерация исходного кода функции render по шаблону"""
+    
+    def __init__(self):
+        self.templates = []
+        self.constants = []
+    
+    def generate(self, template_data):
+        expression = self.expression(template_data)
+        return f"def render(context):\n    return {expression}\n"
+    
+    def expression(self, obj):
+        """Выражение Python, строящее значение obj по контексту"""
+        if isinstance(obj, str):
+            if "{{" in obj or "{%" in obj:
+                return self.template_expression(obj)
+            return repr(obj)
+        if isinstance(obj, dict):
+            items = ', '.join(f"{self.key(key)}: {self.expression(value)}" for key, value in obj.items())
+            return '{' + items + '}'
+        if isinstance(obj, list):
+            return '[' + ', '.join(self.expression(item) for item in obj) + ']'
+        if obj is None or isinstance(obj, (bool, int)) or (isinstance(obj, float) and math.isfinite(obj)):
+            return repr(obj)
+        return self.constant(obj)
+    
+    def key(self, key):
+        """Ключи словарей не рендерятся"""
+        if isinstance(key, (str, bool, int)) or key is None:
+            return repr(key)
+        return self.constant(key)
+    
+    def template_expression(self, text):
+        index = len(self.templates)
+        self.templates.append(text)
+        
+        match = DATA_REFERENCE_PATTERN.match(text)
+        if match:
+            path = tuple(match.group(1).split('.'))
+            return f"_lookup(context, {path!r}, {index})"
+        return f"_render({index}, context)"
+    
+    def constant(self, value):
+        """Значение, которое передается в код как есть (тот же объект, как в рекурсивном рендеринге)"""
+        self.constants.append(value)
+        return f"_constants[{len(self.constants) - 1}]"
+
+
+def compile_template(template_data, cache_dir=None):
+    """
+    Компиляция шаблона отчета
+    
+    Args:
+        template_data: Шаблон (словарь, как для render_template_with_data)
+        cache_dir: Папка дискового кеша скомпилированных шаблонов (необязательно)
+    
+    Returns:
+        CompiledTemplate (шаблоны со значениями без однозначной записи компилируются без кеша)
+    """
+    try:
+        key = template_hash(template_data)
+    except UncacheableDataError:
+        key = None
+    
+    if key is not None:
+        with _compiled_lock:
+            compiled = _compiled_templates.get(key)
+            if compiled is not None:
+                _compiled_templates.move_to_end(key)
+                return compiled
+    
+    generator = _CodeGenerator()
+    cached = _load_compiled(cache_dir, key) if cache_dir and key else None
+    
+    if cached is not None:
+        code, templates = cached
+        compiled = CompiledTemplate(code, list(templates), [])
+    else:
+        source = generator.generate(template_data)
+        code = compile(source, f"<template {key[:12] if key else 'uncached'}>", 'exec')
+        compiled = CompiledTemplate(code, generator.templates, generator.constants, source)
+        if key is None:
+            return compiled
+        # Значения, не представимые литералами, в файл не сохранить - такие шаблоны кешируются только в памяти
+        if cache_dir and not generator.constants:
+            _store_compiled(cache_dir, key, code, generator.templates)
+    
+    with _compiled_lock:
+        _compiled_templates[key] = compiled
+        if len(_compiled_templates) > COMPILED_CACHE_SIZE:
+            _compiled_templates.popitem(last=False)
+    return compiled
+
+
+def render_compiled(template_data, context_data, cache_dir=None):
+    """Замена render_template_with_data с компиляцией шаблона при первом вызове"""
+    return compile_template(template_data, cache_dir).render(context_data)
+
+
+def _cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key + COMPILED_EXTENSION)
+
+
+def _load_compiled(cache_dir, key):
+    """Чтение скомпилированного кода из кеша (None - нет в кеше или другая версия Python)"""
+    try:
+        with open(_cache_path(cache_dir, key), 'rb') as cache_file:
+            if cache_file.read(len(importlib.util.MAGIC_NUMBER)) != importlib.util.MAGIC_NUMBER:
+                return None
+            return marshal.load(cache_file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _store_compiled(cache_dir, key, code, templates):
+    """Атомарная запись скомпилированного кода в кеш"""
+    os.makedirs(cache_dir, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as cache_file:
+            cache_file.write(importlib.util.MAGIC_NUMBER)
+            marshal.dump((code, tuple(templates)), cache_file)
+        os.replace(temp_path, _cache_path(cache_dir, key))
+    except OSError as e:
+        print(f"Предупреждение: не удалось сохранить скомпилированный шаблон: {e}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Общее окружение Jinja2 для строк шаблонов отчетов
+
+Все строки шаблонов рендерятся в одном окружении SandboxedEnvironment:
+шаблоны пользователей не получают доступа к служебным атрибутам объектов
+контекста, каждая строка компилируется один раз на процесс (кеш окружения),
+а байт-код скомпилированных строк может храниться на диске между запусками.
+Окружение содержит фильтры форматирования чисел и дат.
+"""
+
+import os
+import re
+import threading
+from datetime import date, datetime
+
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache
+from jinja2.sandbox import SandboxedEnvironment
+
+
+# Скомпилированных строк шаблонов в памяти окружения
+TEMPLATE_CACHE_SIZE = 2000
+
+# Строка шаблона, целиком состоящая из ссылки на данные: "{{ key }}" или "{{ key.nested.0 }}"
+DATA_REFERENCE_PATTERN = re.compile(r'^\{\{\s*([A-Za-z_]\w*(?:\.\w+)*)\s*\}\}$')
+
+# Форматы дат по умолчанию
+DATE_FORMAT = '%d.%m.%Y'
+DATETIME_FORMAT = '%d.%m.%Y %H:%M'
+
+# Общее окружение процесса и блокировка его создания
+_default_environment = None
+_environment_lock = threading.Lock()
+
+
+def lookup_data_reference(context, path):
+    """
+    Значение контекста по пути ссылки (ключи словарей и индексы списков)
+    
+    Raises:
+        KeyError, IndexError, TypeError: Значение по пути отсутствует
+    """
+    value = context
+    for part in path:
+        if isinstance(value, (list, tuple)) and part.isdigit():
+            value = value[int(part)]
+        else:
+            value = value[part]
+    return value
+
+
+def format_number(value, decimals=0, thousands_separator=' ', decimal_separator=','):
+    """Число с разделителями разрядов: 1234567.891 -> "1 234 567,89" (decimals=2)"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    
+    text = f"{number:,.{decimals}f}"
+    return text.replace(',', '\0').replace('.', decimal_separator).replace('\0', thousands_separator)
+
+
+def format_percent(value, decimals=1, decimal_separator=','):
+    """Доля в процентах: 0.1234 -> 12,3%"""
+    try:
+        number = float(value) * 100
+    except (TypeError, ValueError):
+        return value
+    
+    return format_number(number, decimals, decimal_separator=decimal_separator) + '%'
+
+
+def format_date(value, format=DATE_FORMAT):
+    """Дата по формату strftime; строки ISO 8601 разбираются, прочие значения возвращаются как есть"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    if isinstance(value, (date, datetime)):
+        return value.strftime(format)
+    return value
+
+
+def format_datetime(value, format=DATETIME_FORMAT):
+    """Дата и время по формату strftime"""
+    return format_date(value, format)
+
+
+# Фильтры окружения: {{ revenue|number(2) }}, {{ share|percent }}, {{ period_start|date }}
+DEFAULT_FILTERS = {
+    'number': format_number,
+    'percent': format_percent,
+    'date': format_date,
+    'datetime': format_datetime,
+}
+
+
+class _SourceLoader(BaseLoader):
+    """
+    Загрузчик, для которого имя шаблона - его исходный текст
+    
+    Так строки шаблонов проходят через get_template и используют кеш
+    окружения и кеш байт-кода, как шаблоны из файлов.
+    """
+    
+    def get_source(self, environment, template):
+        return template, None, lambda: True
+
+
+class TemplateEnvironment:
+    """Окружение Jinja2 с кешем скомпилированных строк шаблонов"""
+    
+    def __init__(self, bytecode_cache_dir=None, filters=None, sandboxed=True,
+                 cache_size=TEMPLATE_CACHE_SIZE):
+        """
+        Args:
+            bytecode_cache_dir: Папка кеша байт-кода шаблонов (без дискового кеша по умолчанию)
+            filters: Дополнительные фильтры {имя: функция}
+            sandboxed: Изолированное окружение для шаблонов из ненадежных источников
+            cache_size: Скомпилированных строк шаблонов в памяти
+        """
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+        
+        environment_class = SandboxedEnvironment if sandboxed else Environment
+        self.environment = environment_class(
+            loader=_SourceLoader(),
+            bytecode_cache=bytecode_cache,
+            cache_size=cache_size,
+            auto_reload=False
+        )
+        self.environment.filters.update(DEFAULT_FILTERS)
+        if filters:
+            self.environment.filters.update(filters)
+    
+    def get_template(self, text):
+        """Скомпилированный шаблон строки (компилируется при первом обращении)"""
+        return self.environment.get_template(text)
+    
+    def render(self, text, context):
+        """Рендеринг строки шаблона с данными контекста"""
+        return self.get_template(text).render(**context)
+
+    def render_value(self, text, context):
+        """
+        Значение строки шаблона: прямая ссылка на данные ("{{ revenue }}")
+        подставляется самим значением, а не его текстом, остальные строки рендерятся
+        (при ошибке рендеринга возвращается исходная строка)
+        """
+        match = DATA_REFERENCE_PATTERN.match(text)
+        if match:
+            try:
+                return lookup_data_reference(context, match.group(1).split('.'))
+            except (KeyError, IndexError, TypeError):
+                print(f"Не найден ключ: {match.group(1)}")
+        
+        try:
+            return self.render(text, context)
+        except Exception as e:
+            print(f"Ошибка рендеринга шаблона: {e}")
+            return text
+
+
+def get_template_environment():
+    """Общее окружение процесса (создается с настройками по умолчанию при первом обращении)"""
+    global _default_environment
+    if _default_environment is None:
+        with _environment_lock:
+            if _default_environment is None:
+                _default_environment = TemplateEnvironment()
+    return _default_environment
+
+
+def configure_template_environment(**options):
+    """
+    Замена общего окружения процесса
+    
+    Args:
+        options: Параметры TemplateEnvironment (bytecode_cache_dir, filters, sandboxed, cache_size)
+    
+    Returns:
+        Новое общее окружение
+    """
+    global _default_environment
+    with _environment_lock:
+        _default_environment = TemplateEnvironment(**options)
+    return _default_environment
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Тесты асинхронного рендеринга: токены отмены, загрузка и кеш изображений
+"""
+
+import asyncio
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+from PIL import Image as PILImage
+
+import advanced_report_generator
+from advanced_report_generator import AdvancedExcelRenderer
+from async_renderer import AsyncExcelRenderer, collect_image_urls
+from report_progress import CancellationToken, ReportCancelledError
+
+
+URL = "http://example.com/logo.png"
+
+
+def png_bytes(size=8):
+    buffer = BytesIO()
+    PILImage.new('RGB', (size, size), 'red').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def image_report(url=URL):
+    return {'title': "Отчет", 'sections': [
+        {'title': "Логотип", 'type': 'image', 'image_config': {'type': 'url', 'source': url}},
+        {'title': "Таблица", 'type': 'table', 'data': [{'a': 1}, {'a': 2}]},
+    ]}
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+    
+    def raise_for_status(self):
+        pass
+
+
+def test_collect_image_urls_deduplicates():
+    report = image_report()
+    report['sections'].append({'title': "Товары", 'type': 'table', 'image_columns': ['photo'],
+                               'data': [{'photo': URL}, {'photo': {'type': 'url', 'source': "http://b"}}]})
+    
+    assert collect_image_urls(report) == [URL, "http://b"]
+
+
+def test_renderer_cancel_token_cancels_reports():
+    token = CancellationToken()
+    renderer = AsyncExcelRenderer(cancel_token=token)
+    token.cancel()
+    
+    with pytest.raises(ReportCancelledError):
+        asyncio.run(renderer.render({'title': "Отчет", 'sections': [{'title': "Т", 'type': 'table',
+                                                                      'data': [{'a': 1}]}]}))
+
+
+def test_child_token_follows_parent():
+    parent = CancellationToken()
+    child = CancellationToken(parent=parent)
+    
+    assert not child.cancelled
+    parent.cancel()
+    assert child.cancelled
+    assert not CancellationToken(parent=CancellationToken()).cancelled
+
+
+def test_preloaded_images_not_downloaded_and_cache_not_grown(monkeypatch):
+    downloads = []
+    
+    async def prefetch(self, urls):
+        downloads.extend(urls)
+        return {url: png_bytes() for url in urls}
+    
+    monkeypatch.setattr(AsyncExcelRenderer, 'prefetch_images', prefetch)
+    preloaded = {URL: png_bytes()}
+    renderer = AsyncExcelRenderer(image_cache=preloaded)
+    
+    content = asyncio.run(renderer.render(image_report()))
+    asyncio.run(renderer.render(image_report("http://example.com/other.png")))
+    
+    assert downloads == ["http://example.com/other.png"]
+    assert list(renderer.image_cache) == [URL]
+    assert len(load_workbook(BytesIO(content)).worksheets[0]._images) == 1
+
+
+def test_downloaded_images_cached_within_limit(monkeypatch):
+    content = png_bytes(64)
+    monkeypatch.setattr(advanced_report_generator, 'IMAGE_CACHE_MAX_MB', len(content) * 1.5 / (1024 * 1024))
+    monkeypatch.setattr(advanced_report_generator.requests, 'get', lambda url, timeout: FakeResponse(content))
+    renderer = AdvancedExcelRenderer()
+    
+    assert renderer._load_image_from_url("http://a") is not None
+    assert renderer._load_image_from_url("http://b") is not None
+    
+    assert list(renderer.image_cache) == ["http://a"]
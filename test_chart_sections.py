@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Тесты секций-графиков: ссылки на таблицы, прореживание рядов и данные графиков
+"""
+
+import numpy as np
+import pytest
+
+from conftest import ENGINES
+from downsampling import downsample_indices
+
+
+def assert_rows_within(wb, max_rows):
+    for ws in wb.worksheets:
+        assert ws.max_row <= max_rows, ws.title
+
+
+def series_reference(chart):
+    """Формула диапазона значений первого ряда графика"""
+    return chart.series[0].val.numRef.f
+
+
+def test_lttb_keeps_budget_and_endpoints():
+    x = np.arange(10000, dtype=float)
+    y = np.sin(x / 100)
+    
+    indices = downsample_indices(x, [y], 500, 'lttb')
+    
+    assert len(indices) == 500
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_minmax_keeps_extremes():
+    y = np.zeros(10000)
+    y[1234], y[8765] = 100, -100
+    
+    indices = downsample_indices(None, [y], 200, 'minmax')
+    
+    assert len(indices) <= 200
+    assert 1234 in indices and 8765 in indices
+
+
+def test_chart_references_table_section(render_report):
+    rows = [{'month': f"M{i}", 'sales': i} for i in range(12)]
+    sections = [
+        {'id': 'sales', 'title': "Продажи", 'type': 'table', 'data': rows},
+        {'title': "График", 'type': 'chart', 'data_ref': 'sales', 'value_columns': ['sales']},
+    ]
+    
+    wb = render_report(sections)
+    
+    # График ссылается на диапазон таблицы, лист данных графиков не создается
+    assert [ws.title for ws in wb.worksheets] == ["Сложный отчет"]
+    (chart,) = wb.worksheets[0]._charts
+    assert series_reference(chart).startswith("'Сложный отчет'!$B$")
+
+
+def test_long_series_downsampled_to_data_sheet(render_report):
+    rows = [{'x': i, 'y': float(i % 50)} for i in range(5000)]
+    sections = [
+        {'id': 'long', 'title': "Ряд", 'type': 'table', 'data': rows},
+        {'title': "График", 'type': 'chart', 'chart_type': 'line', 'data_ref': 'long', 'max_points': 300},
+    ]
+    
+    wb = render_report(sections)
+    
+    data_ws = wb["Данные графиков"]
+    assert data_ws.sheet_state == 'hidden'
+    assert 2 < data_ws.max_row <= 301
+    (chart,) = wb.worksheets[0]._charts
+    assert series_reference(chart).startswith("'Данные графиков'!")
+
+
+def test_unknown_downsample_method_falls_back_to_lttb(render_report, capsys):
+    rows = [{'x': i, 'y': float(i % 50)} for i in range(3000)]
+    section = {'title': "График", 'type': 'chart', 'chart_type': 'line', 'data': rows,
+               'max_points': 100, 'downsample': 'median'}
+    
+    wb = render_report([section])
+    
+    assert "неизвестный метод прореживания 'median'" in capsys.readouterr().out
+    ws = wb.worksheets[0]
+    assert len(ws._charts) == 1
+    assert sum(isinstance(value, float) for (value,) in ws.iter_rows(min_col=2, max_col=2, values_only=True)) <= 100
+
+
+@pytest.mark.parametrize('chart_type', ('bar', 'line', 'pie'))
+def test_inline_chart_data_written_next_to_chart(render_report, chart_type):
+    rows = [{'month': f"M{i}", 'sales': i} for i in range(6)]
+    
+    wb = render_report([{'title': "График", 'type': 'chart', 'chart_type': chart_type, 'data': rows}])
+    
+    ws = wb.worksheets[0]
+    assert len(ws._charts) == 1
+    values = [value for (value,) in ws.iter_rows(min_col=2, max_col=2, values_only=True) if isinstance(value, int)]
+    assert values == list(range(6))
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_chart_data_within_sheet_limit(render_report, engine):
+    points = [{'x': i, 'y': i % 37} for i in range(1000)]
+    sections = [
+        {'title': "Рядом", 'type': 'chart', 'chart_type': 'line', 'data': points},
+        {'title': "Лист данных", 'type': 'chart', 'chart_type': 'line', 'data': points[:150], 'data_sheet': True},
+        {'title': "Второй лист данных", 'type': 'chart', 'chart_type': 'line', 'data': points[:150],
+         'data_sheet': True},
+    ]
+    
+    wb = render_report(sections, engine, max_rows_per_sheet=200)
+    
+    assert_rows_within(wb, 200)
+    data_sheets = [ws for ws in wb.worksheets if ws.title.startswith("Данные графиков")]
+    # Данные графика "Рядом" не помещаются рядом с ним и переносятся на лист данных
+    assert len(data_sheets) == 3
+    assert all(ws.sheet_state == 'hidden' for ws in data_sheets)
+    assert wb.worksheets[-len(data_sheets):] == data_sheets
+    assert sum(len(ws._charts) for ws in wb.worksheets) == 3
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Тесты планирования условного форматирования секций
+"""
+
+ROWS = [
+    {'region': "Москва", 'sales': 10, 'growth': -1, 'orders': 3},
+    {'region': "Юг", 'sales': 20, 'growth': 2, 'orders': 5},
+]
+
+
+def rules_by_range(ws):
+    """{диапазоны правила: [(тип, формулы)]}"""
+    return {str(cf.sqref): [(rule.type, list(rule.formula)) for rule in cf.rules] for cf in ws.conditional_formatting}
+
+
+def test_rules_from_section_spec(render_report):
+    section = {'title': "Продажи", 'type': 'table', 'data': ROWS, 'conditional_formatting': [
+        {'column': 'sales', 'type': 'data_bar', 'color': "638EC6"},
+        {'column': 'growth', 'type': 'cell_is', 'operator': 'lessThan', 'value': 0, 'fill': "FFC7CE"},
+        {'column': 'orders', 'type': 'top_n', 'rank': 1},
+        {'columns': ['region'], 'type': 'formula', 'formula': 'LEFT({cell},1)="М"'},
+    ]}
+    
+    wb = render_report([section])
+    
+    ws = wb.worksheets[0]
+    (table,) = ws.tables.values()
+    first, last = int(table.ref.split(':')[0][1:]) + 1, int(table.ref.split(':')[1][1:])
+    assert rules_by_range(ws) == {
+        f"A{first}:A{last}": [('expression', [f'LEFT(A{first},1)="М"'])],
+        f"B{first}:B{last}": [('dataBar', [])],
+        f"C{first}:C{last}": [('cellIs', ['0'])],
+        f"D{first}:D{last}": [('top10', [])],
+    }
+
+
+def test_default_color_scale_on_numeric_columns(render_report):
+    wb = render_report([{'title': "Продажи", 'type': 'table', 'data': ROWS}])
+    
+    rules = rules_by_range(wb.worksheets[0])
+    
+    assert len(rules) == 3
+    assert all(rule == [('colorScale', [])] for rule in rules.values())
+
+
+def test_group_rules_merged_into_one_multi_range_rule(render_report):
+    section = {'title': "Группы", 'type': 'grouped_data',
+               'groups': [{'title': "a", 'data': ROWS}, {'title': "b", 'data': ROWS}]}
+    
+    wb = render_report([section])
+    
+    rules = rules_by_range(wb.worksheets[0])
+    # По правилу на числовую колонку, каждое - на диапазонах обеих групп
+    assert len(rules) == 3
+    assert all(len(sqref.split()) == 2 for sqref in rules)
+
+
+def test_merge_disabled_and_empty_spec(render_report):
+    spec = [{'column': 'sales', 'type': 'data_bar', 'merge': False}]
+    section = {'title': "Группы", 'type': 'grouped_data', 'conditional_formatting': spec,
+               'groups': [{'title': "a", 'data': ROWS}, {'title': "b", 'data': ROWS},
+                          {'title': "c", 'data': ROWS, 'conditional_formatting': []}]}
+    
+    wb = render_report([section])
+    
+    rules = rules_by_range(wb.worksheets[0])
+    assert len(rules) == 2
+    assert all(len(sqref.split()) == 1 and rule == [('dataBar', [])] for sqref, rule in rules.items())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Тесты переноса секций на листы-продолжения на всех движках записи
+"""
+
+import pytest
+
+from conftest import ENGINES, labelled_rows
+
+
+def assert_rows_within(wb, max_rows):
+    for ws in wb.worksheets:
+        assert ws.max_row <= max_rows, ws.title
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_table_across_continuation_sheets(render_report, engine):
+    rows = [{'id': i, 'sales': i} for i in range(150)]
+    
+    wb = render_report([{'title': "Таблица", 'type': 'table', 'data': rows}], engine, max_rows_per_sheet=40)
+    
+    assert_rows_within(wb, 40)
+    ids = [value for ws in wb.worksheets for (value,) in ws.iter_rows(min_col=1, max_col=1, values_only=True)
+           if isinstance(value, int)]
+    assert ids == list(range(150))
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_grouped_data_across_continuation_sheets(render_report, engine):
+    rows = [{'id': i, 'sales': 1} for i in range(100)]
+    section = {'title': "Группы", 'type': 'grouped_data', 'groups': [{'title': "большая", 'data': rows}]}
+    
+    wb = render_report([section], engine, max_rows_per_sheet=40)
+    
+    assert_rows_within(wb, 40)
+    assert len(wb.worksheets) > 1
+    assert "▼ большая (продолжение)" in labelled_rows(wb)
+
+
+def test_section_titles_on_continuation_sheets(render_report):
+    rows = [{'id': i} for i in range(100)]
+    
+    wb = render_report([{'title': "Таблица", 'type': 'table', 'data': rows}], max_rows_per_sheet=40)
+    
+    titles = [ws.title for ws in wb.worksheets]
+    assert titles[:2] == ["Сложный отчет", "Сложный отчет (2)"]
+    assert wb.worksheets[1].cell(row=1, column=1).value == "▼ Таблица (продолжение)"
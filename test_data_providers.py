@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Тесты ленивых источников данных секций
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from advanced_report_generator import render_template_with_data
+from conftest import labelled_rows
+from data_providers import CallableProvider, UncacheableDataError, fingerprint_default, resolve_section_data
+
+
+ROWS = [{'region': "Север", 'sales': 10}, {'region': "Юг", 'sales': 5}]
+
+
+class CountingSource:
+    """Функция-источник строк, считающая вызовы"""
+    
+    def __init__(self, rows=ROWS):
+        self.rows = rows
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        return iter(self.rows)
+
+
+def column_values(wb, label, column=2):
+    """Значения колонки строк данных, следующих за заголовком таблицы секции label"""
+    ws, row = labelled_rows(wb)[label]
+    values = []
+    for (value,) in ws.iter_rows(min_row=row + 2, min_col=column, max_col=column, values_only=True):
+        if value is None:
+            break
+        values.append(value)
+    return values
+
+
+def test_template_reference_keeps_source_until_section_rendered(render_report):
+    source = CountingSource()
+    template = {'title': "{{title}}", 'sections': [{'title': "Продажи", 'type': 'table', 'data': "{{rows}}"}]}
+    
+    report = render_template_with_data(template, {'title': "Отчет", 'rows': source})
+    
+    assert report['sections'][0]['data'] is source
+    assert source.calls == 0
+    wb = render_report(report['sections'])
+    assert source.calls == 1
+    assert column_values(wb, "▼ Продажи") == [10, 5]
+
+
+def test_disabled_section_data_not_loaded(render_report):
+    source = CountingSource()
+    
+    render_report([{'title': "Выключена", 'type': 'table', 'data': source, 'enabled': "false"},
+                   {'title': "Включена", 'type': 'table', 'data': ROWS}])
+    
+    assert source.calls == 0
+
+
+def test_group_and_provider_data_resolved(render_report, subtotal_at):
+    provider = CallableProvider(lambda region: [row for row in ROWS if row['region'] == region], "Юг")
+    section = {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'sales': 'sum'},
+               'groups': [{'title': "g1", 'data': provider}, {'title': "g2", 'data': pd.DataFrame(ROWS)}]}
+    
+    wb = render_report([section])
+    
+    assert subtotal_at(wb, "Σ Итого: g1", 3) == 5
+    assert subtotal_at(wb, "Σ Итого: g2", 3) == 15
+
+
+def test_resolve_section_data_stream_or_list():
+    section = {'title': "Продажи", 'type': 'table', 'data': CountingSource()}
+    
+    streamed = resolve_section_data(section, stream=True)
+    listed = resolve_section_data(section)
+    
+    assert not isinstance(streamed['data'], list)
+    assert listed['data'] == ROWS
+    assert section['data'].calls == 2
+
+
+def test_fingerprints_of_lazy_sources():
+    versioned = CallableProvider(list, fingerprint="v1")
+    
+    assert json.dumps(versioned, default=fingerprint_default) == \
+        '{"provider": "CallableProvider", "fingerprint": "v1"}'
+    for value in (CallableProvider(list), CountingSource(), iter(ROWS)):
+        with pytest.raises(UncacheableDataError):
+            json.dumps(value, default=fingerprint_default)
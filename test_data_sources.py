@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Тесты источников данных: файлы CSV, Parquet и JSON Lines, SQL-запросы и пул соединений на базе sqlite3
+"""
+
+import sqlite3
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import data_sources
+from advanced_report_generator import AdvancedExcelRenderer
+from data_sources import ConnectionPool, FileSource, SqlSource, register_connection
+
+
+SALES_FRAME = pd.DataFrame({'id': range(20), 'region': ['Север', 'Юг', 'Запад', 'Восток'] * 5,
+                            'amount': [i * 10 for i in range(20)]})
+
+
+class CountingCursor(sqlite3.Cursor):
+    """Курсор, запоминающий размеры выборок fetchmany"""
+    
+    def fetchmany(self, size=None):
+        batch = super().fetchmany(size)
+        self.connection.fetches.append((size, len(batch)))
+        return batch
+
+
+class CountingConnection(sqlite3.Connection):
+    """Соединение с курсорами CountingCursor и признаком закрытия"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fetches = []
+        self.closed = False
+    
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+    
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+@pytest.fixture(params=['csv', 'parquet', 'jsonl'])
+def sales_file(request, tmp_path):
+    """Файл продаж из SALES_FRAME в каждом формате"""
+    path = tmp_path / f"sales.{request.param}"
+    if request.param == 'csv':
+        SALES_FRAME.to_csv(path, index=False)
+    elif request.param == 'parquet':
+        SALES_FRAME.to_parquet(path, index=False)
+    else:
+        SALES_FRAME.to_json(path, orient='records', lines=True, force_ascii=False)
+    return str(path)
+
+
+@pytest.fixture(params=['pyarrow', 'pandas'])
+def reader(request, monkeypatch):
+    """Чтение файлов через pyarrow.dataset или порциями pandas"""
+    if request.param == 'pandas':
+        monkeypatch.setattr(data_sources, 'pa_dataset', None)
+    return request.param
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Файл базы с таблицей sales из 23 строк"""
+    path = tmp_path / 'sales.db'
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE sales (id INTEGER, region TEXT, amount REAL)")
+        connection.executemany("INSERT INTO sales VALUES (?, ?, ?)",
+                               [(i, 'Север' if i % 2 else 'Юг', i * 1.5) for i in range(23)])
+    connection.close()
+    return path
+
+
+@pytest.fixture
+def factory(database):
+    """Функция открытия соединения со списком всех открытых соединений"""
+    opened = []
+    
+    def connect():
+        connection = sqlite3.connect(database, factory=CountingConnection, check_same_thread=False)
+        opened.append(connection)
+        return connection
+    
+    connect.opened = opened
+    return connect
+
+
+def test_file_source_filters_and_columns(sales_file, reader):
+    source = FileSource(sales_file, columns=['region', 'amount'], chunk_size=3,
+                        filters=[['amount', '>=', 50], ['region', 'in', ['Север', 'Юг']]])
+    
+    rows = list(source.rows())
+    
+    expected = SALES_FRAME[(SALES_FRAME.amount >= 50) & SALES_FRAME.region.isin(['Север', 'Юг'])]
+    assert rows == expected[['region', 'amount']].to_dict('records')
+
+
+def test_file_source_all_columns_and_not_in(sales_file, reader):
+    source = FileSource(sales_file, filters=[['region', 'not in', ['Запад', 'Восток']], ['id', '<', 6]])
+    
+    assert [row['id'] for row in source.rows()] == [0, 1, 4, 5]
+    assert set(next(iter(source.rows()))) == {'id', 'region', 'amount'}
+
+
+def test_file_source_validation_and_fingerprint(tmp_path, sales_file):
+    with pytest.raises(ValueError):
+        FileSource(str(tmp_path / "sales.xls"))
+    with pytest.raises(ValueError):
+        FileSource(sales_file, filters=[['amount', 'like', 5]])
+    
+    fingerprint = FileSource(sales_file).fingerprint()
+    assert FileSource(sales_file).fingerprint() == fingerprint
+    assert FileSource(sales_file, columns=['id']).fingerprint() != fingerprint
+
+
+def test_file_section_rendered(tmp_path, sales_file, capsys):
+    report = {
+        'title': "Файлы",
+        'sections': [
+            {'title': "Продажи", 'type': 'table',
+             'source': {'path': sales_file, 'columns': ['region', 'amount'], 'filters': [['id', '<', 3]]}},
+            {'title': "Нет файла", 'type': 'table', 'source': {'path': str(tmp_path / "missing.csv")}},
+        ]
+    }
+    renderer = AdvancedExcelRenderer()
+    renderer.create_collapsible_report(report)
+    renderer.save_report(tmp_path / 'file.xlsx')
+    
+    assert "источник данных секции 'Нет файла' недоступен" in capsys.readouterr().out
+    ws = load_workbook(tmp_path / 'file.xlsx').active
+    rows = [[cell.value for cell in row] for row in ws.iter_rows(max_col=2)]
+    header = rows.index(['region', 'amount'])
+    assert rows[header + 1:header + 4] == [['Север', 0], ['Юг', 10], ['Запад', 20]]
+
+
+def test_sql_source_reads_in_batches(factory):
+    source = SqlSource(ConnectionPool(factory), "SELECT id, region, amount FROM sales ORDER BY id", batch_size=5)
+    
+    rows = list(source.rows())
+    
+    assert len(rows) == 23
+    assert rows[0] == {'id': 0, 'region': 'Юг', 'amount': 0.0}
+    assert rows[-1] == {'id': 22, 'region': 'Юг', 'amount': 33.0}
+    # Пять полных выборок, неполная и пустая - признак конца результата
+    assert factory.opened[0].fetches == [(5, 5)] * 4 + [(5, 3), (5, 0)]
+
+
+def test_sql_source_params(factory):
+    source = SqlSource(ConnectionPool(factory), "SELECT id FROM sales WHERE region = ? AND id < ?",
+                       params=('Север', 10), batch_size=2)
+    
+    assert [row['id'] for row in source.rows()] == [1, 3, 5, 7, 9]
+
+
+def test_sql_source_fingerprint(factory):
+    pool = ConnectionPool(factory)
+    
+    assert SqlSource(pool, "SELECT 1").fingerprint() is None
+    assert SqlSource(pool, "SELECT 1", fingerprint='v1').fingerprint() == \
+        {'query': "SELECT 1", 'params': None, 'version': 'v1'}
+
+
+def test_pool_reuses_returned_connection(factory):
+    pool = ConnectionPool(factory)
+    source = SqlSource(pool, "SELECT id FROM sales", batch_size=10)
+    
+    assert len(list(source.rows())) == 23
+    assert len(list(source.rows())) == 23
+    
+    # Соединение возвращается в пул после чтения последней строки и используется повторно
+    assert len(factory.opened) == 1
+    assert not factory.opened[0].closed
+
+
+def test_pool_opens_connection_while_other_is_in_use(factory):
+    pool = ConnectionPool(factory, max_size=2)
+    
+    with pool.connection() as first:
+        with pool.connection() as second:
+            assert first is not second
+    
+    with pool.connection() as connection:
+        assert connection in (first, second)
+    assert len(factory.opened) == 2
+
+
+def test_pool_discards_connection_after_error(factory):
+    pool = ConnectionPool(factory)
+    
+    with pytest.raises(sqlite3.OperationalError):
+        list(SqlSource(pool, "SELECT missing FROM sales").rows())
+    
+    # Соединение после ошибки закрывается, следующее открывается заново
+    assert factory.opened[0].closed
+    with pool.connection() as connection:
+        assert connection is not factory.opened[0]
+    assert len(factory.opened) == 2
+
+
+def test_pool_close_closes_idle_connections(factory):
+    pool = ConnectionPool(factory)
+    with pool.connection():
+        pass
+    
+    pool.close()
+    
+    assert factory.opened[0].closed
+
+
+def test_sql_section_rendered(tmp_path, factory):
+    register_connection('test_sales', factory)
+    report = {
+        'title': "SQL",
+        'sections': [{
+            'title': "Продажи",
+            'type': 'table',
+            'source': {'type': 'sql', 'connection': 'test_sales', 'batch_size': 4,
+                       'query': "SELECT region, amount FROM sales WHERE id < ? ORDER BY id", 'params': (6,)}
+        }]
+    }
+    renderer = AdvancedExcelRenderer()
+    renderer.create_collapsible_report(report)
+    renderer.save_report(tmp_path / 'sql.xlsx')
+    
+    ws = load_workbook(tmp_path / 'sql.xlsx').active
+    rows = [[cell.value for cell in row] for row in ws.iter_rows(max_col=2)]
+    header = rows.index(['region', 'amount'])
+    assert rows[header + 1:header + 7] == [['Юг', 0], ['Север', 1.5], ['Юг', 3], ['Север', 4.5], ['Юг', 6], ['Север', 7.5]]
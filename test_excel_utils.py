@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Тесты адресации ячеек Excel
+"""
+
+import pytest
+from openpyxl.utils import get_column_letter
+
+from excel_utils import COLUMN_LETTERS, EXCEL_MAX_COLUMNS, cell_address, column_letter, range_address
+
+
+def test_column_letters_match_openpyxl():
+    assert len(COLUMN_LETTERS) == EXCEL_MAX_COLUMNS + 1
+    assert all(COLUMN_LETTERS[col_idx] == get_column_letter(col_idx) for col_idx in range(1, EXCEL_MAX_COLUMNS + 1))
+
+
+@pytest.mark.parametrize('col_idx', (0, EXCEL_MAX_COLUMNS + 1))
+def test_column_out_of_range(col_idx):
+    with pytest.raises(ValueError):
+        column_letter(col_idx)
+
+
+def test_addresses():
+    assert cell_address(5, 28) == "AB5"
+    assert range_address(1, 1, 10, 703) == "A1:AAA10"
+
+
+def test_wide_table_addresses(render_report):
+    row = {f"c{i}": i for i in range(30)}
+    
+    wb = render_report([{'title': "Широкая", 'type': 'table', 'data': [row, row]}])
+    
+    ws = wb.worksheets[0]
+    (table,) = ws.tables.values()
+    first_row = int(table.ref.split(':')[0][1:])
+    assert table.ref == f"A{first_row}:AD{first_row + 2}"
+    # Цветовая шкала колонки после Z адресуется двумя буквами
+    ranges = {str(rule.sqref) for rule in ws.conditional_formatting}
+    assert f"AD{first_row + 1}:AD{first_row + 2}" in ranges
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Тесты движка fast: книга совпадает с книгой движка openpyxl
+"""
+
+from datetime import date, datetime
+
+import pytest
+from openpyxl import load_workbook
+
+from advanced_report_generator import AdvancedExcelRenderer
+from conftest import workbook_snapshot
+
+
+ROWS = [
+    {'name': "A & B <теги>", 'amount': 1234.5, 'count': 3, 'day': date(2024, 1, 31),
+     'moment': datetime(2024, 1, 31, 12, 30), 'flag': True, 'note': None},
+    {'name': "  пробелы  ", 'amount': -0.25, 'count': 2 ** 40, 'day': date(2024, 2, 1),
+     'moment': datetime(2024, 2, 1, 8, 0), 'flag': False, 'note': "строка\nс переносом"},
+    {'name': "Юникод: ёЁ €", 'amount': float('nan'), 'count': 0, 'day': None,
+     'moment': None, 'flag': None, 'note': "=не формула?"},
+]
+
+SECTIONS = [
+    {'title': "Таблица", 'type': 'table', 'data': ROWS * 20},
+    {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'amount': 'sum'},
+     'groups': [{'title': "g1", 'data': ROWS}, {'title': "g2", 'data': ROWS * 5, 'collapsed': True}]},
+    {'title': "Сводка", 'type': 'pivot', 'data': [dict(row, region=f"R{i % 3}") for i, row in enumerate(ROWS * 10)],
+     'group_by': ['region'], 'aggregates': {'count': 'sum'}},
+]
+
+
+def render(tmp_path, engine, **options):
+    renderer = AdvancedExcelRenderer(engine=engine, **options)
+    renderer.create_collapsible_report({'title': "Отчет", 'sections': SECTIONS})
+    path = tmp_path / f"{engine}.xlsx"
+    renderer.save_report(path)
+    wb = load_workbook(path)
+    widths = [{letter: dimension.width for letter, dimension in ws.column_dimensions.items()} for ws in wb.worksheets]
+    return workbook_snapshot(wb), widths
+
+
+@pytest.mark.parametrize('max_rows_per_sheet', (None, 50))
+def test_fast_matches_openpyxl(tmp_path, max_rows_per_sheet):
+    expected = render(tmp_path, 'openpyxl', max_rows_per_sheet=max_rows_per_sheet)
+    
+    assert render(tmp_path, 'fast', max_rows_per_sheet=max_rows_per_sheet) == expected
+    assert (len(expected[0]) > 1) == (max_rows_per_sheet is not None)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Тесты лимита памяти строк: книга с выгрузкой строк на диск совпадает с книгой без лимита
+"""
+
+import pytest
+from openpyxl import load_workbook
+
+from advanced_report_generator import AdvancedExcelRenderer
+from conftest import workbook_snapshot
+
+
+ROWS = [{'region': f"R{i % 4}", 'product': f"Товар {i % 7}", 'amount': i * 1.5, 'count': i} for i in range(3000)]
+
+SECTIONS = [
+    {'title': "Таблица", 'type': 'table', 'data': ROWS},
+    {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'amount': 'sum'},
+     'groups': [{'title': f"g{i}", 'data': ROWS[i::5], 'collapsed': i % 2 == 0} for i in range(5)]},
+    {'title': "Сводка", 'type': 'pivot', 'data': ROWS, 'group_by': ['region', 'product'],
+     'aggregates': {'amount': 'sum', 'count': 'max'}, 'collapse_level': 1},
+]
+
+
+def render(tmp_path, engine, memory_budget_mb=None):
+    renderer = AdvancedExcelRenderer(engine=engine, memory_budget_mb=memory_budget_mb, max_rows_per_sheet=4000)
+    renderer.create_collapsible_report({'title': "Отчет", 'sections': SECTIONS})
+    spills = renderer.writer.memory_budget.spills if memory_budget_mb else 0
+    path = tmp_path / f"{engine}-{memory_budget_mb}.xlsx"
+    renderer.save_report(path)
+    return workbook_snapshot(load_workbook(path)), spills
+
+
+@pytest.mark.parametrize('engine', ('fast', 'xlsxwriter'))
+def test_spilled_rows_match_in_memory(tmp_path, engine):
+    expected, _ = render(tmp_path, engine)
+    
+    spilled, spills = render(tmp_path, engine, memory_budget_mb=0.05)
+    
+    assert spills > 5
+    assert len(spilled) > 1
+    assert spilled == expected
+
+
+def test_budget_ignored_by_openpyxl_engine(capsys):
+    renderer = AdvancedExcelRenderer(engine='openpyxl', memory_budget_mb=16)
+    
+    assert "memory_budget_mb не поддерживается движком 'openpyxl'" in capsys.readouterr().out
+    assert renderer.engine == 'openpyxl'
+    assert AdvancedExcelRenderer(memory_budget_mb=16).engine == 'fast'
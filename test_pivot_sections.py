@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Тесты секций-сводок и группировки строк pivot_engine
+"""
+
+import math
+import statistics
+
+import pytest
+
+from conftest import ENGINES, labelled_rows
+from pivot_engine import group_rows
+
+
+SALES = [
+    {'region': "Север", 'city': "A", 'sales': 10},
+    {'region': "Север", 'city': "B", 'sales': 20},
+    {'region': "Юг", 'city': "C", 'sales': 5},
+    {'region': "Юг", 'city': "C", 'sales': 7},
+]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_pivot_subtotals_and_outline(render_report, subtotal_at, engine):
+    section = {'title': "Сводка", 'type': 'pivot', 'data': SALES, 'group_by': ['region', 'city'],
+               'aggregates': {'sales': 'sum'}, 'collapse_level': 1}
+    
+    wb = render_report([section], engine)
+    ws = wb.worksheets[0]
+    labels = labelled_rows(wb)
+    
+    assert subtotal_at(wb, "Σ Итого: A", 2) == 10
+    assert subtotal_at(wb, "Σ Итого: Север", 2) == 30
+    assert subtotal_at(wb, "Σ Итого: C", 2) == 12
+    assert subtotal_at(wb, "Σ Итого по секции", 2) == 42
+    
+    # Группы уровней видны, детальные строки свернуты на третьем уровне
+    _, region_row = labels["▼ Юг"]
+    _, city_row = labels["▼ C"]
+    assert (ws.row_dimensions[region_row].outline_level, ws.row_dimensions[region_row].hidden) == (1, False)
+    assert (ws.row_dimensions[city_row].outline_level, ws.row_dimensions[city_row].hidden) == (2, False)
+    for row in (city_row + 1, city_row + 2):
+        assert ws.cell(row=row, column=2).value in (5, 7)
+        assert (ws.row_dimensions[row].outline_level, ws.row_dimensions[row].hidden) == (3, True)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_pivot_across_continuation_sheets(render_report, subtotal_at, engine):
+    rows = [{'region': f"R{i % 4}", 'sales': i} for i in range(200)]
+    section = {'title': "Сводка", 'type': 'pivot', 'data': rows, 'group_by': ['region'],
+               'aggregates': {'sales': 'sum'}}
+    
+    wb = render_report([section], engine, max_rows_per_sheet=40)
+    
+    assert all(ws.max_row <= 40 for ws in wb.worksheets)
+    for region in range(4):
+        assert subtotal_at(wb, f"Σ Итого: R{region}", 2) == sum(range(region, 200, 4))
+    assert subtotal_at(wb, "Σ Итого по секции", 2) == sum(range(200))
+
+
+@pytest.mark.parametrize('function, expected', [('stdev', statistics.stdev), ('var', statistics.variance)])
+def test_pivot_totals_without_details(render_report, function, expected):
+    rows = [{'region': region, 'sales': value}
+            for region, values in (("Север", (10, 20, 40)), ("Юг", (5, 7))) for value in values]
+    section = {'title': "Сводка", 'type': 'pivot', 'data': rows, 'group_by': ['region'],
+               'aggregates': {'sales': function}, 'show_details': False}
+    
+    wb = render_report([section])
+    labels = labelled_rows(wb)
+    
+    def total(label):
+        ws, row = labels[label]
+        return ws.cell(row=row, column=2).value
+    
+    assert math.isclose(total("Σ Итого: Север"), expected([10, 20, 40]))
+    assert math.isclose(total("Σ Итого: Юг"), expected([5, 7]))
+    assert math.isclose(total("Σ Итого по секции"), expected([10, 20, 40, 5, 7]))
+
+
+def test_presorted_groups_nan_keys_together():
+    rows = [{'region': float('nan'), 'sales': 1}, {'region': float('nan'), 'sales': 2},
+            {'region': None, 'sales': 3}, {'region': "Юг", 'sales': 4}]
+    
+    columns, events = group_rows(iter(rows), ['region'], presorted=True)
+    
+    assert columns == ['sales']
+    assert [boundary for boundary, _, _ in events] == [0, 1, 1, 0]
+
+
+def test_presorted_missing_group_key_raises():
+    with pytest.raises(KeyError, match="region"):
+        group_rows(iter([{'city': "A", 'sales': 1}]), ['region'], presorted=True)
+    
+    _, events = group_rows(iter([{'region': "Юг", 'sales': 1}, {'sales': 2}]), ['region'], presorted=True)
+    with pytest.raises(KeyError, match="region"):
+        list(events)
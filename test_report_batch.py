@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Тесты пакетного построения отчетов и профилирования
+"""
+
+import json
+import time
+
+from openpyxl import Workbook, load_workbook
+
+from report_batch import BATCH_PROFILE_FILENAME, render_batch
+from report_profiler import ReportProfiler
+
+
+ROWS = [{'a': i, 'b': i * 2.0, 'c': f"s{i}"} for i in range(3000)]
+
+TEMPLATE = {'title': "{{ title }}", 'sections': [{'title': "Продажи", 'type': 'table', 'data': "{{ rows }}"}]}
+
+
+def test_batch_writes_reports_profiles_and_summary(tmp_path):
+    workbook_template = tmp_path / "template.xlsx"
+    wb = Workbook()
+    wb.active['A1'] = "Менеджер: {{ manager }}"
+    wb.save(workbook_template)
+    jobs = [
+        {'name': "sales", 'template': TEMPLATE, 'context': {'title': "Продажи", 'rows': ROWS}},
+        {'name': "missing", 'template': str(tmp_path / "missing.json")},
+        {'name': "filled", 'template': str(workbook_template), 'context': {'manager': "Иванов"}},
+    ]
+    
+    results = render_batch(jobs, tmp_path / "out", profile=True, renderer_options={'profile_interval': 0.001})
+    
+    assert [result['name'] for result in results] == ["sales", "missing", "filled"]
+    assert [result['error'] is None for result in results] == [True, False, True]
+    assert load_workbook(tmp_path / "out" / "filled.xlsx").active['A1'].value == "Менеджер: Иванов"
+    assert {'render', 'save'} <= set(results[0]['profile']['phases'])
+    for name in ("sales", "filled"):
+        assert (tmp_path / "out" / f"{name}.profile.folded").exists()
+        assert json.loads((tmp_path / "out" / f"{name}.profile.json").read_text(encoding='utf-8'))['elapsed'] > 0
+    
+    summary = json.loads((tmp_path / "out" / BATCH_PROFILE_FILENAME).read_text(encoding='utf-8'))
+    assert [result['seconds'] for result in summary] == sorted((result['seconds'] for result in results), reverse=True)
+
+
+def busy_method(profiler):
+    profiler.section = 'table'
+    with profiler.measure('render'):
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+
+
+def test_profiler_labels_samples_with_phase_and_section():
+    profiler = ReportProfiler(interval=0.001, method_classes=())
+    
+    busy_method(profiler)
+    
+    summary = profiler.summary()
+    assert profiler.sample_count > 0
+    assert list(summary['phases']) == ['render']
+    assert list(summary['sections']) == ['table']
+    assert all(line.startswith("render;table;test_report_batch.py:busy_method") for line in profiler.collapsed())
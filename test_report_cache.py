@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Тесты кеша готовых отчетов: ключи, попадания и объединение одинаковых запросов
+"""
+
+import threading
+import time
+
+from advanced_report_generator import AdvancedExcelRenderer
+from report_cache import DirectoryBackend, ReportCache, report_fingerprint
+from report_progress import CancellationToken
+from style_registry import StyleRegistry
+
+
+TEMPLATE = {'title': "{{title}}", 'sections': [{'title': "Продажи", 'type': 'table', 'data': "{{rows}}"}]}
+CONTEXT = {'title': "Отчет", 'rows': [{'region': "Север", 'sales': 10}, {'region': "Юг", 'sales': 5}]}
+
+
+class CountingRenderer(AdvancedExcelRenderer):
+    """Рендерер, считающий построенные отчеты"""
+    
+    renders = 0
+    
+    def create_collapsible_report(self, report_data):
+        type(self).renders += 1
+        return super().create_collapsible_report(report_data)
+
+
+def counting_renderer(started=None, release=None):
+    """Новый класс рендерера со своим счетчиком; started/release - события для задержки рендеринга"""
+    class Renderer(CountingRenderer):
+        def create_collapsible_report(self, report_data):
+            if started is not None:
+                started.set()
+                release.wait(10)
+            return super().create_collapsible_report(report_data)
+    return Renderer
+
+
+def test_fingerprint_ignores_non_rendering_options():
+    plain = report_fingerprint(TEMPLATE, CONTEXT, {'engine': 'fast'})
+    
+    assert report_fingerprint(TEMPLATE, CONTEXT, {'engine': 'fast', 'progress': print,
+                                                  'cancel_token': CancellationToken(), 'profile': True}) == plain
+    assert report_fingerprint(TEMPLATE, CONTEXT, {'engine': 'openpyxl'}) != plain
+
+
+def test_fingerprint_of_style_registry_is_stable():
+    styles = {'accent': {'font': {'bold': True}}}
+    
+    first = report_fingerprint(TEMPLATE, CONTEXT, {'style_registry': StyleRegistry(styles)})
+    
+    assert report_fingerprint(TEMPLATE, CONTEXT, {'style_registry': StyleRegistry(styles)}) == first
+    changed = StyleRegistry({'accent': {'font': {'bold': False}}})
+    assert report_fingerprint(TEMPLATE, CONTEXT, {'style_registry': changed}) != first
+
+
+def test_cache_hit_with_progress_callback():
+    renderer_class = counting_renderer()
+    cache = ReportCache(renderer_class=renderer_class)
+    calls = []
+    
+    first = cache.get_report(TEMPLATE, CONTEXT, {'progress': calls.append})
+    second = cache.get_report(TEMPLATE, CONTEXT, {'progress': calls.append})
+    
+    assert first == second
+    assert renderer_class.renders == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_directory_backend_shared_between_caches(tmp_path):
+    renderer_class = counting_renderer()
+    content = ReportCache(DirectoryBackend(tmp_path), renderer_class).get_report(TEMPLATE, CONTEXT)
+    
+    cache = ReportCache(DirectoryBackend(tmp_path), renderer_class)
+    
+    assert cache.get_report(TEMPLATE, CONTEXT) == content
+    assert renderer_class.renders == 1
+
+
+def test_concurrent_requests_render_once():
+    started, release = threading.Event(), threading.Event()
+    renderer_class = counting_renderer(started, release)
+    cache = ReportCache(renderer_class=renderer_class)
+    results = []
+    
+    threads = [threading.Thread(target=lambda: results.append(cache.get_report(TEMPLATE, CONTEXT)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(10)
+    deadline = time.monotonic() + 10
+    while cache.shared < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+    
+    assert renderer_class.renders == 1
+    assert len(results) == 4 and len(set(results)) == 1
+    assert cache.stats()['shared'] == 3
+
+
+def test_lazy_data_without_fingerprint_is_not_cached():
+    renderer_class = counting_renderer()
+    cache = ReportCache(renderer_class=renderer_class)
+    
+    for _ in range(2):
+        cache.get_report(TEMPLATE, dict(CONTEXT, rows=iter(CONTEXT['rows'])))
+    
+    assert renderer_class.renders == 2
+    assert cache.hits == 0
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Тесты очереди заданий: порядок захвата, повторы, аренда и проверка путей
+"""
+
+import os
+
+import pytest
+
+from report_jobs import DONE, FAILED, QUEUED, JobLeaseLostError, ReportJobQueue, run_worker
+
+
+TEMPLATE = {'title': "{{title}}", 'sections': [{'title': "Данные", 'type': 'table', 'data': "{{rows}}"}]}
+
+
+def job(name, **extra):
+    return dict({'name': name, 'template': TEMPLATE, 'context': {'title': name, 'rows': [{'a': 1}]}}, **extra)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ReportJobQueue(str(tmp_path / "jobs.sqlite3"), retry_backoff=0)
+
+
+def test_claim_order_shares_queue_between_tenants(queue):
+    for name in ("a1", "a2", "a3"):
+        queue.submit(job(name), tenant="a")
+    queue.submit(job("b1"), tenant="b")
+    queue.submit(job("a-urgent"), tenant="a", priority=5)
+    
+    claimed = [queue.claim("w")['name'] for _ in range(4)]
+    
+    # Первым - задание с высшим приоритетом, затем арендатор без выполняемых заданий
+    assert claimed == ["a-urgent", "b1", "a1", "a2"]
+
+
+def test_tenant_limit(tmp_path):
+    queue = ReportJobQueue(str(tmp_path / "jobs.sqlite3"), max_running_per_tenant=1)
+    queue.submit(job("a1"), tenant="a")
+    queue.submit(job("a2"), tenant="a")
+    
+    assert queue.claim("w")['name'] == "a1"
+    assert queue.claim("w") is None
+
+
+def test_failed_job_retried_until_attempts_exhausted(queue):
+    job_id = queue.submit(job("report"), max_attempts=2)
+    
+    first = queue.claim("w")
+    queue.fail(first, "ошибка 1")
+    assert queue.get(job_id)['status'] == QUEUED
+    
+    second = queue.claim("w")
+    assert second['attempts'] == 2
+    queue.fail(second, "ошибка 2")
+    
+    assert queue.get(job_id)['status'] == FAILED
+    assert queue.get(job_id)['error'] == "ошибка 2"
+    assert queue.claim("w") is None
+
+
+def test_retry_waits_for_backoff(tmp_path):
+    queue = ReportJobQueue(str(tmp_path / "jobs.sqlite3"), retry_backoff=3600)
+    queue.submit(job("report"))
+    
+    queue.fail(queue.claim("w"), "ошибка")
+    
+    assert queue.claim("w") is None
+
+
+def test_expired_lease_returns_job_to_another_worker(tmp_path):
+    queue = ReportJobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=-1, retry_backoff=0)
+    job_id = queue.submit(job("report"))
+    
+    stale = queue.claim("w1")
+    fresh = queue.claim("w2")
+    
+    assert (fresh['id'], fresh['worker'], fresh['attempts']) == (job_id, "w2", 2)
+    with pytest.raises(JobLeaseLostError):
+        queue.heartbeat(stale)
+    assert not queue.complete(stale, {'path': "stale.xlsx"})
+    assert queue.complete(fresh, {'path': "fresh.xlsx"})
+    assert queue.get(job_id)['result'] == {'path': "fresh.xlsx"}
+
+
+def test_worker_writes_report_into_tenant_dir(queue, tmp_path):
+    job_id = queue.submit(job("sales"), tenant="north")
+    
+    assert run_worker(queue, str(tmp_path / "reports"), worker="w", stop_when_idle=True) == 1
+    
+    done = queue.get(job_id)
+    assert done['status'] == DONE
+    assert done['result']['path'] == os.path.join(str(tmp_path / "reports"), "north", f"{job_id}-sales.xlsx")
+    assert os.listdir(tmp_path / "reports" / "north") == [f"{job_id}-sales.xlsx"]
+
+
+@pytest.mark.parametrize('name, tenant', [
+    ("../escape", "default"), ("a/b", "default"), ("a\\b", "default"), ("..", "default"), ("", "default"),
+    ("report", "../other"), ("report", ".job-1-1"), ("report", "C:"),
+])
+def test_submit_rejects_path_escapes(queue, name, tenant):
+    with pytest.raises(ValueError):
+        queue.submit(job(name), tenant=tenant)
+    assert queue.stats()[QUEUED] == 0
+
+
+def test_submit_requires_template(queue):
+    with pytest.raises(ValueError, match="template"):
+        queue.submit({'name': "report", 'sections': []})
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Тесты прогресса построения отчета и отмены через CancellationToken
+"""
+
+import pytest
+
+from advanced_report_generator import AdvancedExcelRenderer
+from conftest import ENGINES
+from report_progress import CancellationToken, ReportCancelledError
+
+
+ROWS = [{'a': i, 'b': i * 2.0} for i in range(250)]
+
+SECTIONS = [
+    {'title': "Таблица", 'type': 'table', 'data': ROWS},
+    {'title': "Группы", 'type': 'grouped_data', 'groups': [{'title': "g", 'data': ROWS}]},
+]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_progress_reports_sections_rows_and_phases(tmp_path, engine):
+    events = []
+    renderer = AdvancedExcelRenderer(engine=engine, progress=events.append, progress_interval=100)
+    
+    renderer.create_collapsible_report({'title': "Отчет", 'sections': SECTIONS})
+    renderer.save_report(tmp_path / "report.xlsx")
+    
+    rows_written = [event['rows_written'] for event in events]
+    assert rows_written == sorted(rows_written)
+    assert [event['section_title'] for event in events if event['rows_written'] == 100] == ["Таблица"]
+    assert {event['phase'] for event in events} == {'render', 'save', 'done'}
+    last = events[-1]
+    assert (last['phase'], last['section_index'], last['sections_total']) == ('done', 2, 2)
+    assert (last['rows_written'], last['rows_total'], last['eta']) == (500, 500, 0.0)
+
+
+def test_cancel_from_callback_stops_render():
+    token = CancellationToken()
+    
+    def progress(state):
+        if state['rows_written'] >= 100:
+            token.cancel()
+    
+    renderer = AdvancedExcelRenderer(progress=progress, progress_interval=100, cancel_token=token)
+    
+    with pytest.raises(ReportCancelledError):
+        renderer.create_collapsible_report({'title': "Отчет", 'sections': SECTIONS})
+    assert renderer.wb is None
+
+
+def test_parent_token_cancels_child():
+    parent = CancellationToken()
+    child = CancellationToken(parent=parent)
+    
+    child.raise_if_cancelled()
+    parent.cancel()
+    
+    assert child.cancelled
+    with pytest.raises(ReportCancelledError):
+        AdvancedExcelRenderer(cancel_token=child).create_collapsible_report({'title': "Отчет", 'sections': SECTIONS})
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Тесты бэкендов записи: значения, группировка и таблицы одинаковы на всех движках
+"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from conftest import ENGINES, workbook_snapshot
+
+
+SECTIONS = [
+    {'title': "Таблица", 'type': 'table', 'data': pd.DataFrame({
+        'name': ["A", "B", "C"],
+        'amount': [1.5, float('nan'), 3],
+        'day': pd.to_datetime([date(2024, 1, 31), None, date(2024, 3, 1)]),
+    })},
+    {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'amount': 'sum'},
+     'groups': [{'title': "g1", 'data': [{'name': "x", 'amount': 1}]},
+                {'title': "g2", 'data': [{'name': "y", 'amount': 2}], 'collapsed': True}]},
+]
+
+
+def values_snapshot(wb):
+    """Снимок книги без имен стилей (xlsxwriter не записывает именованные стили ячеек)"""
+    snapshot = workbook_snapshot(wb)
+    for sheet in snapshot:
+        sheet['cells'] = [(coordinate, value, number_format) for coordinate, value, _, number_format in sheet['cells']
+                          if value is not None]
+    return snapshot
+
+
+@pytest.mark.parametrize('engine', ENGINES[1:])
+def test_engine_matches_openpyxl(render_report, engine):
+    expected = values_snapshot(render_report(SECTIONS))
+    
+    assert values_snapshot(render_report(SECTIONS, engine)) == expected
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Тесты кеша отрисованных секций: вставка фрагментов совпадает с отрисовкой
+"""
+
+import pytest
+from openpyxl import load_workbook
+
+from advanced_report_generator import AdvancedExcelRenderer
+from conftest import ENGINES, workbook_snapshot
+from section_cache import SectionCache
+
+
+SALES = [{'region': f"R{i % 3}", 'city': f"C{i % 5}", 'sales': i, 'share': i / 10} for i in range(30)]
+
+SECTIONS = [
+    {'title': "Таблица", 'type': 'table', 'data': SALES, 'row_styles': {'number': 'number_style'}},
+    {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'sales': 'sum'},
+     'groups': [{'title': "g1", 'data': SALES[:10]}, {'title': "g2", 'data': SALES[10:], 'collapsed': True}]},
+    {'title': "Сводка", 'type': 'pivot', 'data': SALES, 'group_by': ['region', 'city'],
+     'aggregates': {'sales': 'sum', 'share': 'average'}},
+]
+
+
+def render(tmp_path, sections, engine, section_cache=None, name="report"):
+    renderer = AdvancedExcelRenderer(engine=engine, section_cache=section_cache)
+    renderer.create_collapsible_report({'title': "Отчет", 'sections': sections})
+    path = tmp_path / f"{name}.xlsx"
+    renderer.save_report(path)
+    return workbook_snapshot(load_workbook(path))
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_replayed_sections_match_uncached(tmp_path, engine):
+    cache = SectionCache(str(tmp_path / "cache"))
+    render(tmp_path, SECTIONS, engine, cache, "first")
+    assert (cache.hits, cache.stored) == (0, 3)
+    
+    # Новая секция в начале сдвигает все закешированные секции вниз
+    shifted = [{'title': "Новая", 'type': 'table', 'data': SALES[:4]}] + SECTIONS
+    cached = render(tmp_path, shifted, engine, cache, "cached")
+    
+    assert cache.hits == 3
+    assert cached == render(tmp_path, shifted, engine, name="uncached")
+
+
+def test_changed_section_rendered_again(tmp_path):
+    cache = SectionCache(str(tmp_path / "cache"))
+    render(tmp_path, SECTIONS, 'openpyxl', cache)
+    
+    changed = [dict(SECTIONS[0], data=SALES[:-1])] + SECTIONS[1:]
+    render(tmp_path, changed, 'openpyxl', cache)
+    
+    assert cache.hits == 2
+    assert cache.remove_unused() == 0
+    assert SectionCache(str(tmp_path / "cache")).remove_unused() == 4
+
+
+def test_lazy_data_without_fingerprint_not_cached(tmp_path):
+    cache = SectionCache(str(tmp_path / "cache"))
+    section = {'title': "Поток", 'type': 'table', 'data': iter(SALES)}
+    
+    assert cache.section_key(section) is None
+    render(tmp_path, [section], 'openpyxl', cache)
+    assert cache.stored == 0
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Тесты хранения строк таблиц: общие строки книги и строки в ячейках
+"""
+
+import re
+from zipfile import ZipFile
+
+import pytest
+from openpyxl import load_workbook
+
+from advanced_report_generator import AdvancedExcelRenderer
+
+
+SHARED_STRINGS_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"
+
+ROWS = [{'order_id': f"ORD-{i:05d}", 'status': ("новый", "оплачен", "отгружен")[i % 3], 'amount': i}
+        for i in range(300)]
+
+
+def render(tmp_path, engine, string_storage=None):
+    section = {'title': "Заказы", 'type': 'table', 'data': ROWS}
+    if string_storage is not None:
+        section['string_storage'] = string_storage
+    renderer = AdvancedExcelRenderer(engine=engine)
+    renderer.create_collapsible_report({'title': "Отчет", 'sections': [section]})
+    path = tmp_path / f"{engine}.xlsx"
+    renderer.save_report(path)
+    return path
+
+
+def shared_strings(path):
+    """Значения таблицы общих строк книги (пустой список - таблицы нет)"""
+    with ZipFile(path) as archive:
+        if 'xl/sharedStrings.xml' not in archive.namelist():
+            return []
+        xml = archive.read('xl/sharedStrings.xml').decode('utf-8')
+    return re.findall(r"<t[^>]*>([^<]*)</t>", xml)
+
+
+def assert_rows_read_back(path):
+    ws = load_workbook(path).active
+    rows = [row for row in ws.iter_rows(max_col=3, values_only=True)
+            if isinstance(row[0], str) and row[0].startswith("ORD-")]
+    assert rows == [(row['order_id'], row['status'], row['amount']) for row in ROWS]
+
+
+@pytest.mark.parametrize('engine', ('fast', 'xlsxwriter'))
+def test_auto_storage_shares_repeated_column(tmp_path, engine):
+    path = render(tmp_path, engine)
+    
+    strings = shared_strings(path)
+    assert {"новый", "оплачен", "отгружен"} <= set(strings)
+    assert "ORD-00001" not in strings
+    assert_rows_read_back(path)
+
+
+def test_fast_engine_links_shared_strings_to_workbook(tmp_path):
+    path = render(tmp_path, 'fast')
+    
+    with ZipFile(path) as archive:
+        rels = archive.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        content_types = archive.read('[Content_Types].xml').decode('utf-8')
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    
+    # Excel находит таблицу общих строк по связи книги
+    assert re.search(rf'<Relationship [^>]*Target="sharedStrings.xml"[^>]*Type="{SHARED_STRINGS_TYPE}"', rels) or \
+        re.search(rf'<Relationship [^>]*Type="{SHARED_STRINGS_TYPE}"[^>]*Target="sharedStrings.xml"', rels)
+    assert 'PartName="/xl/sharedStrings.xml"' in content_types
+    assert 't="s"' in sheet
+
+
+def test_fast_engine_inline_storage_writes_no_shared_strings(tmp_path):
+    path = render(tmp_path, 'fast', string_storage='inline')
+    
+    with ZipFile(path) as archive:
+        rels = archive.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        assert 'xl/sharedStrings.xml' not in archive.namelist()
+    assert SHARED_STRINGS_TYPE not in rels
+    assert_rows_read_back(path)
+
+
+@pytest.mark.parametrize('engine', ('fast', 'xlsxwriter'))
+def test_per_column_storage(tmp_path, engine):
+    path = render(tmp_path, engine, string_storage={'order_id': 'shared', '*': 'inline'})
+    
+    strings = shared_strings(path)
+    assert "ORD-00299" in strings
+    assert "оплачен" not in strings
+    assert_rows_read_back(path)
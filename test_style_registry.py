@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Тесты реестра именованных стилей: стили отчета, интернирование описаний и снимок таблицы стилей
+"""
+
+from openpyxl import Workbook, load_workbook
+
+from advanced_report_generator import AdvancedExcelRenderer
+from style_registry import BASE_STYLES, StyleRegistry
+
+
+ROWS = [{'name': "a", 'amount': 1.5}, {'name': "b", 'amount': 2}]
+
+STYLES = {
+    'money': {'font': {'size': 10}, 'number_format': '#,##0.00 ₽', 'border': 'thin'},
+    # Описание совпадает со встроенным data_style
+    'plain': dict(BASE_STYLES['data_style']),
+}
+
+
+def test_report_styles_applied_to_rows(tmp_path):
+    renderer = AdvancedExcelRenderer()
+    renderer.create_collapsible_report({'title': "Отчет", 'styles': STYLES, 'sections': [
+        {'title': "Продажи", 'type': 'table', 'data': ROWS, 'row_styles': {'number': 'money', 'text': 'plain'}},
+    ]})
+    renderer.save_report(tmp_path / "report.xlsx")
+    
+    wb = load_workbook(tmp_path / "report.xlsx")
+    ws = wb.active
+    
+    assert wb.named_styles.count('money') == 1
+    assert 'plain' not in wb.named_styles
+    assert (ws['B6'].style, ws['B6'].number_format) == ('money', '#,##0.00 ₽')
+    assert ws['A6'].style == 'data_style'
+
+
+def test_unknown_row_style_falls_back(render_report, capsys):
+    wb = render_report([{'title': "Продажи", 'type': 'table', 'data': ROWS, 'row_styles': {'number': 'missing'}}])
+    
+    assert "неизвестный стиль 'missing'" in capsys.readouterr().out
+    assert wb.active['B6'].style == 'number_style'
+
+
+def test_stylesheet_snapshot_shared_by_new_workbooks():
+    registry = StyleRegistry()
+    first, second = Workbook(), Workbook()
+    
+    names = registry.attach(first, {'red': {'fill': 'FF0000'}})
+    
+    assert registry.attach(second, {'red': {'fill': 'FF0000'}}) == names
+    assert len(registry._stylesheets) == 1
+    assert second.named_styles == first.named_styles == ['Normal', *BASE_STYLES, 'red']
+    assert first._fills is not second._fills
+    assert list(first._fills) == list(second._fills)
+    second.active['A1'].style = 'red'
+    assert second.active['A1'].fill.start_color.rgb == '00FF0000'
+    assert first.active['A1'].style == 'Normal'
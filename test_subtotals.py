@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Тесты итогов групп секций grouped_data
+"""
+
+import pytest
+
+from conftest import ENGINES, labelled_rows
+
+
+SALES = [
+    {'region': "Север", 'city': "A", 'sales': 10},
+    {'region': "Север", 'city': "B", 'sales': 20},
+    {'region': "Юг", 'city': "C", 'sales': 5},
+    {'region': "Юг", 'city': "C", 'sales': 7},
+]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_group_subtotals(render_report, subtotal_at, engine):
+    section = {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'sales': 'sum'},
+               'groups': [{'title': "g1", 'data': SALES[:2]}, {'title': "g2", 'data': SALES[2:]}]}
+    
+    wb = render_report([section], engine)
+    
+    assert subtotal_at(wb, "Σ Итого: g1", 4) == 30
+    assert subtotal_at(wb, "Σ Итого: g2", 4) == 12
+    assert subtotal_at(wb, "Σ Итого по секции", 4) == 42
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_group_subtotals_across_continuation_sheets(render_report, subtotal_at, engine):
+    rows = [{'id': i, 'sales': 1} for i in range(100)]
+    section = {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'sales': 'sum'},
+               'groups': [{'title': "большая", 'data': rows}, {'title': "малая", 'data': rows[:3]}]}
+    
+    wb = render_report([section], engine, max_rows_per_sheet=40)
+    
+    assert subtotal_at(wb, "Σ Итого: большая", 3) == 100
+    assert subtotal_at(wb, "Σ Итого: малая", 3) == 3
+    assert subtotal_at(wb, "Σ Итого по секции", 3) == 103
+
+
+def test_grand_total_skips_groups_without_column(render_report, subtotal_at):
+    # Во второй группе на месте sales - колонка qty: ее значения не входят в общий итог
+    section = {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'sales': 'sum'},
+               'groups': [{'title': "g1", 'data': [{'id': 1, 'sales': 5}, {'id': 2, 'sales': 5}]},
+                          {'title': "g2", 'data': [{'id': 3, 'qty': 1000}]},
+                          {'title': "g3", 'data': [{'id': 4, 'sales': 5}]}]}
+    
+    wb = render_report([section])
+    
+    assert subtotal_at(wb, "Σ Итого по секции", 3) == 15
+    # Группа без колонок итогов не получает пустую строку итогов
+    labels = labelled_rows(wb)
+    assert "Σ Итого: g2" not in labels
+    assert "Σ Итого: g3" in labels
+
+
+def test_plain_mode_formulas(render_report):
+    section = {'title': "Группы", 'type': 'grouped_data', 'subtotals': {'sales': 'max'}, 'subtotal_mode': 'plain',
+               'groups': [{'title': "g1", 'data': SALES[:2]}, {'title': "g2", 'data': SALES[2:]}]}
+    
+    wb = render_report([section])
+    ws, row = labelled_rows(wb)["Σ Итого по секции"]
+    
+    assert ws.cell(row=row, column=4).value.startswith("=MAX(")
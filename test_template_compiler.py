@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Тесты предкомпиляции шаблонов и кеша скомпилированных шаблонов
+"""
+
+import pandas as pd
+import pytest
+
+import template_compiler
+from advanced_report_generator import create_complex_report_template, generate_sample_data, render_template_with_data
+from template_compiler import COMPILED_EXTENSION, compile_template, template_hash
+
+
+@pytest.fixture(autouse=True)
+def empty_compiled_cache():
+    template_compiler._compiled_templates.clear()
+    yield
+    template_compiler._compiled_templates.clear()
+
+
+def test_compiled_matches_recursive_rendering():
+    template = create_complex_report_template(save_path=None)
+    context = generate_sample_data()
+    
+    assert compile_template(template).render(context) == render_template_with_data(template, context)
+
+
+def test_template_hash_is_canonical():
+    assert template_hash({'a': 1, 'b': [1, 2]}) == template_hash({'b': [1, 2], 'a': 1})
+    assert template_hash({1: "x"}) != template_hash({"1": "x"})
+    assert template_hash([True]) != template_hash([1])
+    assert template_hash([1]) != template_hash([1.0])
+    assert template_hash({'a': "b"}) != template_hash({'ab': ""})
+    # Ключи разных типов допустимы
+    assert template_hash({1: "x", "1": "y", None: "z"}) == template_hash({None: "z", "1": "y", 1: "x"})
+
+
+def test_changed_template_invalidates_cache():
+    first = compile_template({'title': "{{name}}", 'rows': 1})
+    
+    assert compile_template({'rows': 1, 'title': "{{name}}"}) is first
+    changed = compile_template({'title': "{{name}}!", 'rows': 1})
+    assert changed is not first
+    assert changed.render({'name': "Отчет"}) == {'title': "Отчет!", 'rows': 1}
+
+
+def test_memory_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(template_compiler, 'COMPILED_CACHE_SIZE', 2)
+    first, second = compile_template({'n': 1}), compile_template({'n': 2})
+    
+    assert compile_template({'n': 1}) is first
+    compile_template({'n': 3})
+    
+    assert compile_template({'n': 1}) is first
+    assert compile_template({'n': 2}) is not second
+
+
+def test_disk_cache_reused_by_new_process(tmp_path):
+    template = {'title': "{{name}}", 'total': "{{summary.total}}"}
+    compile_template(template, cache_dir=tmp_path)
+    template_compiler._compiled_templates.clear()
+    
+    compiled = compile_template(template, cache_dir=tmp_path)
+    
+    assert [path.suffix for path in tmp_path.iterdir()] == [COMPILED_EXTENSION]
+    assert compiled.source is None
+    assert compiled.render({'name': "Отчет", 'summary': {'total': 5}}) == {'title': "Отчет", 'total': 5}
+
+
+def test_unencodable_values_are_not_cached(tmp_path):
+    frame = pd.DataFrame({'a': [1, 2]})
+    template = {'title': "{{name}}", 'data': frame}
+    
+    compiled = compile_template(template, cache_dir=tmp_path)
+    
+    assert compile_template({'title': "{{name}}", 'data': pd.DataFrame({'a': [3, 4]})}) is not compiled
+    assert compiled.render({'name': "Отчет"})['data'] is frame
+    assert not template_compiler._compiled_templates
+    assert not list(tmp_path.iterdir())
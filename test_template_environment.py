@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Тесты общего окружения Jinja2 строк шаблонов
+"""
+
+from datetime import date
+
+from advanced_report_generator import render_template_with_data
+from template_environment import TemplateEnvironment, get_template_environment
+
+
+def test_sandbox_blocks_private_attributes(capsys):
+    environment = TemplateEnvironment()
+    text = "{{ ''.__class__.__mro__[1].__subclasses__() }}"
+    
+    assert environment.render_value(text, {}) == text
+    assert "Ошибка рендеринга шаблона" in capsys.readouterr().out
+
+
+def test_data_reference_keeps_value_type():
+    environment = TemplateEnvironment()
+    rows = [{'a': 1}]
+    
+    assert environment.render_value("{{ rows }}", {'rows': rows}) is rows
+    assert environment.render_value("{{ summary.items.1 }}", {'summary': {'items': [5, 7]}}) == 7
+    assert environment.render_value("Всего: {{ total }}", {'total': 3}) == "Всего: 3"
+
+
+def test_formatting_filters():
+    environment = TemplateEnvironment()
+    context = {'revenue': 1234567.891, 'share': 0.1234, 'day': date(2024, 3, 1), 'iso': "2024-03-01T10:30:00"}
+    
+    assert environment.render("{{ revenue|number(2) }}", context) == "1 234 567,89"
+    assert environment.render("{{ share|percent }}", context) == "12,3%"
+    assert environment.render("{{ day|date }} {{ iso|datetime }}", context) == "01.03.2024 01.03.2024 10:30"
+
+
+def test_template_compiled_once_and_bytecode_cached(tmp_path):
+    environment = TemplateEnvironment(bytecode_cache_dir=str(tmp_path))
+    
+    assert environment.get_template("{{ a }}+{{ b }}") is environment.get_template("{{ a }}+{{ b }}")
+    assert list(tmp_path.iterdir())
+    assert TemplateEnvironment(bytecode_cache_dir=str(tmp_path)).render("{{ a }}+{{ b }}", {'a': 1, 'b': 2}) == "1+2"
+
+
+def test_report_templates_use_shared_environment():
+    template = {'title': "Выручка {{ revenue|number }}", 'items': ["{{ items }}"]}
+    
+    report = render_template_with_data(template, {'revenue': 1500, 'items': [1, 2]})
+    
+    assert report == {'title': "Выручка 1 500", 'items': [[1, 2]]}
+    assert get_template_environment() is get_template_environment()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Тесты заполнения книг-шаблонов: подстановки, именованные ячейки и сдвиг содержимого под областями
+"""
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+from openpyxl.workbook.defined_name import DefinedName
+from openpyxl.worksheet.table import Table
+
+from advanced_report_generator import AdvancedExcelRenderer
+from workbook_templates import clear_template_cache, load_workbook_template
+
+
+ROWS = [{'name': "a", 'amount': 1}, {'name': "b", 'amount': 2}, {'name': "c", 'amount': 3.5}]
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    """Шаблон: заголовок с подстановкой, именованная ячейка, таблица на одну строку, итог и подвал под ней"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Отчет"
+    ws['A1'] = "Отчет за {{ period }}"
+    ws['A3'], ws['B3'] = "name", "amount"
+    ws['B4'] = 0
+    ws['B4'].font = Font(bold=True)
+    ws['B4'].number_format = '0.00'
+    ws.add_table(Table(displayName='Sales', ref='A3:B4'))
+    ws['A6'], ws['B6'] = "Итого", "=SUM(B4:B4)"
+    ws.merge_cells('A7:B7')
+    ws['A7'] = "Подвал"
+    wb.defined_names['Footer'] = DefinedName('Footer', attr_text="'Отчет'!$A$7")
+    wb.defined_names['manager'] = DefinedName('manager', attr_text="'Отчет'!$B$2")
+    path = tmp_path / "template.xlsx"
+    wb.save(path)
+    yield path
+    clear_template_cache()
+
+
+def fill(tmp_path, template_path, engine, rows):
+    renderer = AdvancedExcelRenderer(engine=engine)
+    renderer.fill_template(template_path, {'period': "март", 'manager': "Иванов", 'Sales': rows})
+    path = tmp_path / f"{engine}.xlsx"
+    renderer.save_report(path)
+    return load_workbook(path)
+
+
+@pytest.mark.parametrize('engine', ('openpyxl', 'fast'))
+@pytest.mark.parametrize('make_rows', (list, iter), ids=('list', 'iterator'))
+def test_rows_shift_content_below_anchor(tmp_path, template_path, engine, make_rows):
+    wb = fill(tmp_path, template_path, engine, make_rows(ROWS))
+    ws = wb.active
+    
+    assert ws['A1'].value == "Отчет за март"
+    assert ws['B2'].value == "Иванов"
+    assert [[cell.value for cell in row] for row in ws['A4:B6']] == [["a", 1], ["b", 2], ["c", 3.5]]
+    assert all(ws[f"B{row}"].font.b and ws[f"B{row}"].number_format == '0.00' for row in range(4, 7))
+    assert ws.tables['Sales'].ref == 'A3:B6'
+    assert (ws['A8'].value, ws['B8'].value) == ("Итого", "=SUM(B4:B6)")
+    assert [str(merged) for merged in ws.merged_cells.ranges] == ['A9:B9']
+    assert wb.defined_names['Footer'].attr_text == "'Отчет'!$A$9"
+
+
+def test_template_read_once_and_not_modified(tmp_path, template_path):
+    template = load_workbook_template(template_path)
+    
+    fill(tmp_path, template_path, 'openpyxl', ROWS)
+    
+    assert load_workbook_template(template_path) is template
+    assert template.workbook['Отчет'].tables['Sales'].ref == 'A3:B4'
+    assert template.workbook['Отчет']['A1'].value == "Отчет за {{ period }}"
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Заполнение готовых книг-шаблонов Excel (.xlsx)
+
+Шаблон - книга, подготовленная дизайнером: логотипы, стили, настройки
+печати. Шаблон читается openpyxl один раз на процесс (кеш по пути, размеру
+и времени изменения файла), и при чтении в нем находятся ячейки
+с подстановками {{ ... }}, именованные диапазоны и таблицы Excel. Для каждого
+отчета книга шаблона копируется в памяти и заполняется данными:
+
+- ячейки с {{ ... }} рендерятся с данными отчета; ссылка на данные целиком
+  ("{{ revenue }}") подставляется значением с его типом (число, дата)
+- именованная ячейка получает значение data[имя]
+- таблица Excel или именованный диапазон, для которых в данных есть строки
+  (список, DataFrame, итератор), - область привязки: строки пишутся бэкендом
+  записи рендерера с первой строки области с оформлением ее ячеек,
+  а содержимое листа ниже области сдвигается на число добавленных строк
+  (ссылки формул, объединения, таблицы, изображения и графики - вместе с ним)
+"""
+
+import os
+import re
+import threading
+from copy import copy, deepcopy
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.formatting.formatting import ConditionalFormattingList
+from openpyxl.formula.tokenizer import Token, Tokenizer
+from openpyxl.styles import NamedStyle
+from openpyxl.utils.cell import coordinate_from_string, quote_sheetname, range_boundaries
+from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet.table import TableList
+
+from style_registry import _copy_indexed_list
+from template_environment import get_template_environment
+
+
+# Префикс именованных стилей, созданных по ячейкам областей привязки
+TEMPLATE_STYLE_PREFIX = 'template_style_'
+
+# Ссылка на строку или ячейку в диапазоне формулы: ($)(колонка)($)(строка)
+_ROW_REFERENCE_PATTERN = re.compile(r'^(\$?[A-Za-z]{0,3})(\$?)(\d+)$')
+
+# Шаблоны процесса: {абсолютный путь: ((размер, время изменения), шаблон)}
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+class TemplateAnchor:
+    """Область привязки строк данных: таблица Excel или именованный диапазон"""
+    
+    def __init__(self, name, sheet, min_row, min_col, max_row, max_col, columns=None, styles=None):
+        """
+        Args:
+            name: Имя таблицы или диапазона (ключ данных отчета)
+            sheet: Название листа
+            min_row, min_col, max_row, max_col: Строки данных области (без заголовка и итогов таблицы)
+            columns: Названия колонок таблицы Excel (строки-словари раскладываются по ним)
+            styles: Пары имен стилей (числа, остальные значения) по колонкам области
+        """
+        self.name = name
+        self.sheet = sheet
+        self.min_row = min_row
+        self.min_col = min_col
+        self.max_row = max_row
+        self.max_col = max_col
+        self.columns = columns
+        self.styles = styles
+
+
+class WorkbookTemplate:
+    """Разобранная книга-шаблон: подстановки, именованные ячейки и области привязки"""
+    
+    def __init__(self, path):
+        """
+        Args:
+            path: Путь к файлу шаблона .xlsx
+        """
+        self.path = path
+        self.workbook = load_workbook(path)
+        
+        # Ячейки с подстановками: (лист, строка, колонка, строка шаблона)
+        self.placeholders = []
+        for ws in self.workbook.worksheets:
+            for (row, col_idx), cell in ws._cells.items():
+                value = cell._value
+                if isinstance(value, str) and ('{{' in value or '{%' in value):
+                    self.placeholders.append((ws.title, row, col_idx, value))
+        
+        # Именованные ячейки {имя: (лист, строка, колонка)} и области привязки {имя: TemplateAnchor}
+        self.cells = {}
+        self.anchors = {}
+        self._anchor_styles = {}
+        
+        for ws in self.workbook.worksheets:
+            for table in ws.tables.values():
+                min_col, min_row, max_col, max_row = range_boundaries(table.ref)
+                first_row = min_row + (1 if table.headerRowCount is None else table.headerRowCount)
+                last_row = max(first_row, max_row - (table.totalsRowCount or 0))
+                columns = [column.name for column in table.tableColumns]
+                self.anchors[table.displayName] = self._anchor(table.displayName, ws, first_row, min_col,
+                                                               last_row, max_col, columns)
+        
+        defined_names = list(self.workbook.defined_names.items())
+        for ws in self.workbook.worksheets:
+            defined_names += list(ws.defined_names.items())
+        for name, defined_name in defined_names:
+            try:
+                destinations = list(defined_name.destinations)
+            except Exception:
+                continue  # Имя задано формулой или константой
+            if len(destinations) != 1 or destinations[0][0] not in self.workbook.sheetnames or name in self.anchors:
+                continue
+            
+            sheet, reference = destinations[0]
+            min_col, min_row, max_col, max_row = range_boundaries(reference.replace('$', ''))
+            ws = self.workbook[sheet]
+            if min_row == max_row and min_col == max_col:
+                self.cells[name] = (sheet, min_row, min_col)
+            self.anchors[name] = self._anchor(name, ws, min_row, min_col, max_row, max_col)
+    
+    def _anchor(self, name, ws, min_row, min_col, max_row, max_col, columns=None):
+        """Область привязки со стилями первой строки (стили создаются в книге шаблона один раз)"""
+        styles = []
+        for col_idx in range(min_col, max_col + 1):
+            style_name = self._anchor_style(ws._cells.get((min_row, col_idx)))
+            styles.append((style_name, style_name))
+        return TemplateAnchor(name, ws.title, min_row, min_col, max_row, max_col, columns, styles)
+    
+    def _anchor_style(self, cell):
+        """Именованный стиль с оформлением ячейки области (одинаковое оформление - один стиль)"""
+        if cell is None or isinstance(cell, MergedCell) or not cell.has_style:
+            return 'Normal'
+        
+        key = tuple(cell._style)
+        name = self._anchor_styles.get(key)
+        if name is None:
+            name = self._anchor_styles[key] = f"{TEMPLATE_STYLE_PREFIX}{len(self._anchor_styles) + 1}"
+            self.workbook.add_named_style(NamedStyle(
+                name=name, font=copy(cell.font), fill=copy(cell.fill), border=copy(cell.border),
+                alignment=copy(cell.alignment), number_format=cell.number_format, protection=copy(cell.protection)
+            ))
+        return name
+    
+    def clone(self):
+        """Копия книги шаблона для заполнения"""
+        return clone_workbook(self.workbook)
+    
+    def fill(self, workbook, data, writer, environment=None, progress=None):
+        """
+        Заполнение копии книги шаблона данными отчета
+        
+        Args:
+            workbook: Копия книги шаблона (clone)
+            data: Данные отчета: значения подстановок, именованных ячеек и строки областей
+            writer: Бэкенд записи строк областей (ReportWriter)
+            environment: TemplateEnvironment (по умолчанию - общее окружение процесса)
+            progress: ProgressTracker отчета (области привязки считаются секциями)
+        """
+        if environment is None:
+            environment = get_template_environment()
+        
+        for sheet, row, col_idx, text in self.placeholders:
+            cell = workbook[sheet]._cells.get((row, col_idx))
+            if cell is not None:
+                cell.value = environment.render_value(text, data)
+        
+        for name, (sheet, row, col_idx) in self.cells.items():
+            if name in data and not _is_rows(data[name]):
+                workbook[sheet].cell(row=row, column=col_idx).value = data[name]
+        
+        # Области заполняются сверху вниз: сдвиги строк учитываются в положении следующих областей
+        anchors = sorted(
+            (anchor for anchor in self.anchors.values() if anchor.name in data and _is_rows(data[anchor.name])),
+            key=lambda anchor: (self.workbook.sheetnames.index(anchor.sheet), anchor.min_row, anchor.min_col)
+        )
+        if progress is not None:
+            sized = all(hasattr(data[anchor.name], '__len__') for anchor in anchors)
+            progress.start(len(anchors), sum(len(data[anchor.name]) for anchor in anchors) if sized else None)
+        
+        shifts = {}
+        for anchor in anchors:
+            if progress is not None:
+                progress.start_section(anchor.name)
+            offset = sum(delta for last_row, delta in shifts.get(anchor.sheet, ()) if anchor.min_row > last_row)
+            ws = workbook[anchor.sheet]
+            last_row, delta = _fill_anchor(workbook, ws, anchor, anchor.min_row + offset, data[anchor.name], writer,
+                                           progress)
+            if delta:
+                shifts.setdefault(anchor.sheet, []).append((last_row - offset, delta))
+
+
+def _is_rows(value):
+    """Значение - строки области (список, DataFrame или итератор строк)"""
+    if isinstance(value, (str, bytes, dict)):
+        return False
+    return isinstance(value, (list, tuple, pd.DataFrame)) or hasattr(value, '__next__')
+
+
+def _iter_values(rows, columns):
+    """Списки значений строк области (словари раскладываются по колонкам таблицы)"""
+    if isinstance(rows, pd.DataFrame):
+        if columns:
+            rows = rows.reindex(columns=columns)
+        yield from dataframe_to_rows(rows, index=False, header=False)
+        return
+    
+    for row in rows:
+        if isinstance(row, dict):
+            yield [row.get(column) for column in columns] if columns else list(row.values())
+        else:
+            yield list(row)
+
+
+def _fill_anchor(workbook, ws, anchor, first_row, rows, writer, progress=None):
+    """
+    Запись строк в область привязки со сдвигом содержимого ниже нее
+    
+    Returns:
+        (последняя строка области в шаблоне с учетом предыдущих сдвигов, число добавленных строк)
+    """
+    last_row = first_row + anchor.max_row - anchor.min_row
+    
+    # Ячейки и объединения области заменяются строками данных
+    for row in range(first_row, last_row + 1):
+        for col_idx in range(anchor.min_col, anchor.max_col + 1):
+            ws._cells.pop((row, col_idx), None)
+    for merged in list(ws.merged_cells.ranges):
+        if merged.min_row >= first_row and merged.max_row <= last_row:
+            ws.merged_cells.remove(merged)
+    
+    # Итератор пишется потоком, если ниже области нет ячеек; иначе строки читаются заранее,
+    # чтобы сдвинуть содержимое до записи
+    sized = hasattr(rows, '__len__')
+    if not sized and any(row > last_row for row, _ in ws._cells):
+        rows, sized = list(rows), True
+    
+    height = last_row - first_row + 1
+    if sized:
+        delta = max(0, len(rows) - height)
+        if delta:
+            shift_rows(workbook, ws, first_row, last_row, delta)
+    
+    styles = anchor.styles
+    count = 0
+    next_report = progress.interval if progress is not None else 0
+    for values in _iter_values(rows, anchor.columns):
+        row_styles = styles if len(values) <= len(styles) else styles + [styles[-1]] * (len(values) - len(styles))
+        writer.write_row(ws, first_row + count, anchor.min_col, values, row_styles)
+        count += 1
+        if count == next_report:
+            progress.advance(progress.interval)
+            next_report += progress.interval
+    if progress is not None:
+        progress.advance(count % progress.interval)
+    
+    if not sized:
+        delta = max(0, count - height)
+        if delta:
+            shift_rows(workbook, ws, first_row, last_row, delta, move_cells=False)
+    return last_row, delta
+
+
+def shift_rows(workbook, ws, first_row, last_row, delta, move_cells=True):
+    """
+    Вставка delta строк в конец области first_row..last_row листа ws
+    
+    Как при вставке строк в Excel: ячейки, объединения, высоты строк, изображения
+    и графики ниже области сдвигаются; ссылки формул книги, таблицы, условное
+    форматирование, проверки данных и именованные диапазоны, охватывающие
+    область, расширяются.
+    """
+    def shift(reference):
+        return _shift_reference(reference, first_row, last_row, delta)
+    
+    if move_cells:
+        cells = sorted(ws._cells.items(), key=lambda item: item[0][0] > last_row)
+        ws._cells.clear()
+        for (row, col_idx), cell in cells:
+            if row > last_row:
+                row = cell.row = row + delta
+            ws._cells[(row, col_idx)] = cell
+    
+    for merged in ws.merged_cells.ranges:
+        if merged.min_row > last_row:
+            merged.shift(row_shift=delta)
+    
+    dimensions = [(row, dimension) for row, dimension in ws.row_dimensions.items() if row > last_row]
+    for row, _ in dimensions:
+        del ws.row_dimensions[row]
+    for row, dimension in dimensions:
+        dimension.index = row + delta
+        ws.row_dimensions[row + delta] = dimension
+    
+    for drawing in ws._images + ws._charts:
+        _shift_drawing_anchor(drawing, last_row, delta)
+    
+    for table in ws.tables.values():
+        table.ref = shift(table.ref)
+        if table.autoFilter is not None:
+            table.autoFilter.ref = table.ref
+    if ws.auto_filter.ref:
+        ws.auto_filter.ref = shift(ws.auto_filter.ref)
+    
+    conditional_formatting = ws.conditional_formatting
+    ws.conditional_formatting = ConditionalFormattingList()
+    for formatting in conditional_formatting:
+        ranges = ' '.join(shift(str(cell_range)) for cell_range in formatting.sqref.ranges)
+        for rule in formatting.rules:
+            rule.formula = [_shift_formula(formula, ws.title, True, first_row, last_row, delta)
+                            for formula in rule.formula]
+            ws.conditional_formatting.add(ranges, rule)
+    
+    for validation in ws.data_validations.dataValidation:
+        validation.sqref = ' '.join(shift(str(cell_range)) for cell_range in validation.sqref.ranges)
+    
+    if ws._print_area:
+        ws.print_area = [shift(str(cell_range)) for cell_range in ws._print_area.ranges]
+    
+    # Формулы всех листов и именованные диапазоны, ссылающиеся на лист
+    for sheet in workbook.worksheets:
+        own_sheet = sheet is ws
+        for cell in sheet._cells.values():
+            if cell.data_type == 'f' and isinstance(cell._value, str):
+                cell._value = _shift_formula(cell._value, ws.title, own_sheet, first_row, last_row, delta)
+    
+    for defined_names in [workbook.defined_names] + [sheet.defined_names for sheet in workbook.worksheets]:
+        for defined_name in defined_names.values():
+            if defined_name.attr_text:
+                defined_name.attr_text = _shift_formula(defined_name.attr_text, ws.title, False,
+                                                        first_row, last_row, delta, prefix='')
+
+
+def _shift_formula(formula, sheet_title, own_sheet, first_row, last_row, delta, prefix='='):
+    """
+    Формула со сдвинутыми ссылками на строки листа sheet_title
+    
+    Args:
+        formula: Текст формулы (prefix - ее начало: "=" у формул ячеек, "" у диапазонов имен)
+        own_sheet: Формула на самом листе (ссылки без имени листа относятся к нему)
+    """
+    text = formula[len(prefix):] if prefix and formula.startswith(prefix) else formula
+    try:
+        tokenizer = Tokenizer('=' + text)
+    except Exception:
+        return formula
+    
+    changed = False
+    for token in tokenizer.items:
+        if token.type != Token.OPERAND or token.subtype != Token.RANGE:
+            continue
+        sheet, separator, reference = token.value.rpartition('!')
+        if separator:
+            refers_to_sheet = sheet.strip("'").replace("''", "'") == sheet_title
+        else:
+            refers_to_sheet = own_sheet
+        if not refers_to_sheet:
+            continue
+        shifted = _shift_reference(reference, first_row, last_row, delta)
+        if shifted != reference:
+            token.value = f"{sheet}{separator}{shifted}"
+            changed = True
+    
+    if not changed:
+        return formula
+    rendered = tokenizer.render()[1:]
+    return f"{prefix}{rendered}" if formula.startswith(prefix) else rendered
+
+
+def _shift_reference(reference, first_row, last_row, delta):
+    """
+    Диапазон ("A5", "$A$5:$C$9", "5:9") после вставки delta строк в конец
+    области first_row..last_row: ссылки ниже области сдвигаются, диапазон,
+    охватывающий область, расширяется
+    """
+    parts = reference.split(':')
+    if len(parts) > 2:
+        return reference
+    
+    matches = [_ROW_REFERENCE_PATTERN.match(part) for part in parts]
+    if not all(matches):
+        return reference  # Колонки целиком, именованные ссылки и т.п.
+    rows = [int(match.group(3)) for match in matches]
+    
+    shifted = []
+    for index, (match, row) in enumerate(zip(matches, rows)):
+        expands = index == 1 and row == last_row and rows[0] <= first_row
+        if row > last_row or expands:
+            row += delta
+        shifted.append(f"{match.group(1)}{match.group(2)}{row}")
+    return ':'.join(shifted)
+
+
+def _shift_drawing_anchor(drawing, last_row, delta):
+    """Сдвиг привязки изображения или графика, расположенного ниже строки last_row"""
+    anchor = drawing.anchor
+    if isinstance(anchor, str):
+        column, row = coordinate_from_string(anchor)
+        if row > last_row:
+            drawing.anchor = f"{column}{row + delta}"
+        return
+    
+    # Строки привязок openpyxl отсчитываются от нуля
+    marker = getattr(anchor, '_from', None)
+    if marker is not None and marker.row + 1 > last_row:
+        marker.row += delta
+    to = getattr(anchor, 'to', None)
+    if to is not None and to.row + 1 > last_row:
+        to.row += delta
+
+
+def clone_workbook(workbook):
+    """
+    Копия книги openpyxl в памяти
+    
+    Списки стилей и таблицы листов копируются отдельно (deepcopy нарушает
+    их внутренние индексы), ячейки - напрямую, без deepcopy каждого объекта.
+    """
+    memo = {}
+    for value in vars(workbook).values():
+        if isinstance(value, IndexedList):
+            memo[id(value)] = _copy_indexed_list(value)
+    for ws in workbook.worksheets:
+        memo[id(ws._tables)] = TableList({
+            name: deepcopy(table, memo) for name, table in dict.items(ws._tables)
+        })
+        memo[id(ws._cells)] = {}
+    
+    clone = deepcopy(workbook, memo)
+    
+    for ws, cloned_ws in zip(workbook.worksheets, clone.worksheets):
+        cells = cloned_ws._cells
+        for (row, col_idx), cell in ws._cells.items():
+            if isinstance(cell, MergedCell):
+                cloned = MergedCell(cloned_ws, row, col_idx)
+                cloned._style = copy(cell._style)
+            else:
+                cloned = Cell(cloned_ws, row=row, column=col_idx, style_array=copy(cell._style))
+                cloned._value = cell._value
+                cloned.data_type = cell.data_type
+                if cell._hyperlink is not None:
+                    cloned._hyperlink = deepcopy(cell._hyperlink, memo)
+                if cell._comment is not None:
+                    cloned.comment = copy(cell._comment)
+            cells[(row, col_idx)] = cloned
+    return clone
+
+
+def load_workbook_template(path):
+    """
+    Шаблон из кеша процесса (перечитывается при изменении файла)
+    
+    Args:
+        path: Путь к файлу шаблона .xlsx
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    
+    cached = _templates.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    
+    template = WorkbookTemplate(path)
+    with _templates_lock:
+        _templates[path] = (version, template)
+    return template
+
+
+def clear_template_cache():
+    """Очистка кеша шаблонов процесса"""
+    with _templates_lock:
+        _templates.clear()
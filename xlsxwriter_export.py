@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""
+Запись книги openpyxl через xlsxwriter
+
+Книга, построенная рендерером в openpyxl, переписывается в xlsxwriter: ячейки
+и строки хранилищ FastRowStore, стили, объединения, ширина колонок и группировка
+строк, таблицы Excel, условное форматирование, гиперссылки, графики и изображения.
+В режиме constant_memory xlsxwriter держит в памяти только текущую строку листа
+и сбрасывает готовые строки во временный файл, поэтому строки каждого листа
+пишутся строго по возрастанию номеров, а все, что относится к строке (высота
+и группировка, объединения, заголовки таблиц), - до перехода к следующей.
+В этом режиме xlsxwriter пишет строки в ячейках (inlineStr); значения
+SharedString (колонки, которые рендерер хранит общими строками) записываются
+в таблицу общих строк книги.
+"""
+
+from io import BytesIO
+
+from openpyxl.cell.cell import ERROR_CODES, MergedCell
+from openpyxl.compat.numbers import NUMERIC_TYPES
+from openpyxl.utils.cell import column_index_from_string, range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, to_excel
+from PIL import Image as PILImage
+
+try:
+    import xlsxwriter
+    from xlsxwriter.worksheet import CellStringTuple, Worksheet
+except ImportError:  # Бэкенд xlsxwriter недоступен
+    xlsxwriter = None
+    Worksheet = object
+
+from chart_layout import EMU_PER_CM, EMU_PER_PIXEL, column_width_emu
+from fast_xlsx_writer import DATE_TYPES, EXCEL_MAX_STRING_LENGTH, SharedString, merge_store_rows
+
+
+# Стили линий границ openpyxl -> индексы xlsxwriter
+BORDER_STYLES = {
+    'thin': 1, 'medium': 2, 'dashed': 3, 'dotted': 4, 'thick': 5, 'double': 6, 'hair': 7,
+    'mediumDashed': 8, 'dashDot': 9, 'mediumDashDot': 10, 'dashDotDot': 11,
+    'mediumDashDotDot': 12, 'slantDashDot': 13,
+}
+
+HORIZONTAL_ALIGNMENTS = {
+    'left': 'left', 'center': 'center', 'right': 'right', 'fill': 'fill', 'justify': 'justify',
+    'centerContinuous': 'center_across', 'distributed': 'distributed',
+}
+
+VERTICAL_ALIGNMENTS = {
+    'top': 'top', 'center': 'vcenter', 'bottom': 'bottom', 'justify': 'vjustify',
+    'distributed': 'vdistributed',
+}
+
+UNDERLINE_STYLES = {'single': 1, 'double': 2, 'singleAccounting': 33, 'doubleAccounting': 34}
+
+# Операторы правил cellIs openpyxl -> критерии xlsxwriter
+CELL_IS_CRITERIA = {
+    'greaterThan': '>', 'lessThan': '<', 'greaterThanOrEqual': '>=', 'lessThanOrEqual': '<=',
+    'equal': '==', 'notEqual': '!=', 'between': 'between', 'notBetween': 'not between',
+}
+
+# Типы графиков openpyxl (tagname) -> типы xlsxwriter
+CHART_TYPES = {
+    'lineChart': 'line',
+    'pieChart': 'pie',
+    'areaChart': 'area',
+    'scatterChart': 'scatter',
+    'doughnutChart': 'doughnut',
+    'radarChart': 'radar',
+}
+
+
+class _SharedStringCell(tuple):
+    """Ячейка листа xlsxwriter со ссылкой на таблицу общих строк: (индекс, формат)"""
+    
+    __slots__ = ()
+
+
+class _ExportWorksheet(Worksheet):
+    """
+    Лист xlsxwriter для переноса книги openpyxl
+    
+    В режиме constant_memory пишет общие строки индексами и не хранит параметры
+    уже записанных строк: set_row запоминает каждую сгруппированную строку,
+    и без этого память росла бы с числом строк листа.
+    """
+    
+    def _write_single_row(self, current_row_num=0):
+        row_num = self.previous_row
+        super()._write_single_row(current_row_num)
+        
+        # Параметры записанной строки больше не нужны; размер видимой строки
+        # по умолчанию не влияет на положение изображений и графиков
+        self.set_rows.pop(row_num, None)
+        size = self.row_sizes.get(row_num)
+        if size is not None and not size[1] and size[0] == self.default_row_height:
+            del self.row_sizes[row_num]
+    
+    def _write_cell(self, row, col, cell):
+        if type(cell) is not _SharedStringCell:
+            return super()._write_cell(row, col, cell)
+        
+        # Вне режима constant_memory xlsxwriter пишет строку ячейки как индекс общей строки
+        constant_memory, self.constant_memory = self.constant_memory, False
+        try:
+            return super()._write_cell(row, col, CellStringTuple(*cell))
+        finally:
+            self.constant_memory = constant_memory
+
+
+def _write_shared_string(worksheet, row, col, value, cell_format):
+    """Запись строки в таблицу общих строк книги (строка и колонка с 0)"""
+    if not worksheet.constant_memory:
+        worksheet.write_string(row, col, value, cell_format)
+        return
+    if worksheet._check_dimensions(row, col):
+        return
+    if row > worksheet.previous_row:
+        worksheet._write_single_row(row)
+    index = worksheet.str_table._get_shared_string_index(value)
+    worksheet.table[row][col] = _SharedStringCell((index, cell_format))
+
+
+def _color(color):
+    """Цвет openpyxl ('00RRGGBB') в формате xlsxwriter ('#RRGGBB'); цвета темы не переносятся"""
+    if color is None or getattr(color, 'type', None) != 'rgb' or not isinstance(color.rgb, str):
+        return None
+    return '#' + color.rgb[-6:]
+
+
+def _style_properties(font, fill, border, alignment, number_format, protection):
+    """Свойства формата xlsxwriter по стилю ячейки openpyxl"""
+    properties = {}
+    
+    if font is not None:
+        properties['font_name'] = font.name
+        properties['font_size'] = font.sz
+        properties['bold'] = bool(font.b)
+        properties['italic'] = bool(font.i)
+        properties['font_strikeout'] = bool(font.strike)
+        if font.u:
+            properties['underline'] = UNDERLINE_STYLES.get(font.u, 1)
+        properties['font_color'] = _color(font.color)
+    
+    if fill is not None and getattr(fill, 'patternType', None) == 'solid':
+        properties['pattern'] = 1
+        properties['bg_color'] = _color(fill.fgColor)
+    
+    if border is not None:
+        for side_name in ('left', 'right', 'top', 'bottom'):
+            side = getattr(border, side_name)
+            if side is not None and side.style:
+                properties[side_name] = BORDER_STYLES.get(side.style, 1)
+                properties[f'{side_name}_color'] = _color(side.color)
+    
+    if alignment is not None:
+        properties['align'] = HORIZONTAL_ALIGNMENTS.get(alignment.horizontal)
+        properties['valign'] = VERTICAL_ALIGNMENTS.get(alignment.vertical)
+        properties['text_wrap'] = bool(alignment.wrap_text)
+        properties['shrink'] = bool(alignment.shrink_to_fit)
+        if alignment.indent:
+            properties['indent'] = int(alignment.indent)
+        if alignment.text_rotation:
+            properties['rotation'] = int(alignment.text_rotation)
+    
+    if number_format and number_format != 'General':
+        properties['num_format'] = number_format
+    
+    if protection is not None:
+        properties['locked'] = protection.locked is not False
+        properties['hidden'] = bool(protection.hidden)
+    
+    return {key: value for key, value in properties.items() if value not in (None, False)}
+
+
+class _FormatCache:
+    """Форматы xlsxwriter, созданные один раз на набор стилей openpyxl"""
+    
+    def __init__(self, workbook, book):
+        self.workbook = workbook
+        self.book = book
+        self._cell_formats = {}
+        self._named_formats = {}
+    
+    def cell_format(self, cell):
+        """Формат ячейки openpyxl (None для ячейки без стиля)"""
+        if not cell.has_style:
+            return None
+        
+        key = tuple(cell._style)
+        cell_format = self._cell_formats.get(key)
+        if cell_format is None:
+            cell_format = self._cell_formats[key] = self.book.add_format(_style_properties(
+                cell.font, cell.fill, cell.border, cell.alignment, cell.number_format, cell.protection
+            ))
+        return cell_format
+    
+    def named_format(self, name):
+        """Формат именованного стиля книги (стили строк хранилищ)"""
+        cell_format = self._named_formats.get(name)
+        if cell_format is None:
+            style = self.workbook._named_styles[name]
+            cell_format = self._named_formats[name] = self.book.add_format(_style_properties(
+                style.font, style.fill, style.border, style.alignment, style.number_format, style.protection
+            ))
+        return cell_format
+    
+    def differential_format(self, dxf):
+        """Формат правила условного форматирования"""
+        if dxf is None:
+            return None
+        return self.book.add_format(_style_properties(dxf.font, dxf.fill, dxf.border, dxf.alignment, None, None))
+
+
+def _write_value(worksheet, row, col, value, cell_format, epoch):
+    """Запись значения по правилам определения типа openpyxl (строка и колонка с 0)"""
+    if value is None:
+        if cell_format is not None:
+            worksheet.write_blank(row, col, None, cell_format)
+        return
+    
+    value_type = type(value)
+    if value_type is SharedString:
+        _write_shared_string(worksheet, row, col, value, cell_format)
+    elif value_type is str:
+        value = value[:EXCEL_MAX_STRING_LENGTH]
+        if len(value) > 1 and value.startswith('='):
+            worksheet.write_formula(row, col, value, cell_format)
+        elif value in ERROR_CODES:
+            worksheet.write_formula(row, col, '=' + value, cell_format, value)
+        else:
+            worksheet.write_string(row, col, value, cell_format)
+    elif value_type is bool:
+        worksheet.write_boolean(row, col, value, cell_format)
+    elif isinstance(value, NUMERIC_TYPES):
+        if value != value or value in (float('inf'), float('-inf')):
+            worksheet.write_blank(row, col, None, cell_format)
+        else:
+            worksheet.write_number(row, col, value, cell_format)
+    elif isinstance(value, DATE_TYPES):
+        if getattr(value, 'tzinfo', None) is not None:
+            raise TypeError("Excel does not support timezones in datetimes. "
+                            "The tzinfo in the datetime/time object must be set to None.")
+        serial = to_excel(value, epoch)
+        if serial is None:
+            # NaT pandas: пустая ячейка, как у openpyxl
+            worksheet.write_blank(row, col, None, cell_format)
+        else:
+            worksheet.write_number(row, col, serial, cell_format)
+    else:
+        worksheet.write(row, col, value, cell_format)
+
+
+def _title_text(title):
+    """Текст заголовка графика или оси openpyxl"""
+    if title is None or title.tx is None or title.tx.rich is None:
+        return None
+    return ''.join(run.t for paragraph in title.tx.rich.p for run in (paragraph.r or []))
+
+
+def _series_options(series):
+    """Ряд графика openpyxl в параметрах add_series"""
+    options = {}
+    if series.val is not None and series.val.numRef is not None:
+        options['values'] = '=' + series.val.numRef.f
+    if series.cat is not None:
+        reference = series.cat.numRef or series.cat.strRef
+        if reference is not None:
+            options['categories'] = '=' + reference.f
+    if series.tx is not None:
+        if series.tx.strRef is not None:
+            options['name'] = '=' + series.tx.strRef.f
+        elif series.tx.v:
+            options['name'] = series.tx.v
+    return options
+
+
+def _chart_type(chart):
+    if chart.tagname == 'barChart':
+        return {'type': 'column' if chart.barDir == 'col' else 'bar'}
+    return {'type': CHART_TYPES.get(chart.tagname, 'column')}
+
+
+def _convert_chart(book, chart):
+    """График openpyxl (с наложенными графиками) в график xlsxwriter"""
+    xl_chart = book.add_chart(_chart_type(chart))
+    for series in chart.series:
+        xl_chart.add_series(_series_options(series))
+    
+    title = _title_text(chart.title)
+    if title:
+        xl_chart.set_title({'name': title})
+    
+    if chart.tagname not in ('pieChart', 'doughnutChart'):
+        x_title, y_title = _title_text(chart.x_axis.title), _title_text(chart.y_axis.title)
+        if x_title:
+            xl_chart.set_x_axis({'name': x_title})
+        if y_title:
+            xl_chart.set_y_axis({'name': y_title})
+    
+    # Наложенные графики (chart += second); вспомогательная ось - с отличающимся axId
+    for overlay in chart._charts[1:]:
+        secondary = overlay.y_axis.axId != chart.y_axis.axId
+        xl_overlay = book.add_chart(_chart_type(overlay))
+        for series in overlay.series:
+            xl_overlay.add_series(dict(_series_options(series), y2_axis=secondary))
+        axis_title = _title_text(overlay.y_axis.title)
+        if axis_title:
+            (xl_overlay.set_y2_axis if secondary else xl_overlay.set_y_axis)({'name': axis_title})
+        xl_chart.combine(xl_overlay)
+    
+    return xl_chart
+
+
+def _anchor_position(anchor):
+    """Строка, колонка (с 0) и смещения в пикселях привязки openpyxl"""
+    if isinstance(anchor, str):
+        min_col, min_row, _, _ = range_boundaries(anchor)
+        return min_row - 1, min_col - 1, 0, 0
+    marker = anchor._from
+    return marker.row, marker.col, int(marker.rowOff / EMU_PER_PIXEL), int(marker.colOff / EMU_PER_PIXEL)
+
+
+def _insert_charts(book, ws, worksheet):
+    for chart in ws._charts:
+        row, col, y_offset, x_offset = _anchor_position(chart.anchor)
+        ext = getattr(chart.anchor, 'ext', None)
+        if ext is not None:
+            width, height = ext.width / EMU_PER_PIXEL, ext.height / EMU_PER_PIXEL
+        else:
+            width, height = chart.width * EMU_PER_CM / EMU_PER_PIXEL, chart.height * EMU_PER_CM / EMU_PER_PIXEL
+        
+        xl_chart = _convert_chart(book, chart)
+        xl_chart.set_size({'width': round(width), 'height': round(height)})
+        worksheet.insert_chart(row, col, xl_chart, {'x_offset': x_offset, 'y_offset': y_offset})
+
+
+def _insert_images(ws, worksheet):
+    for index, image in enumerate(ws._images, 1):
+        data = image._data()
+        original_width, original_height = PILImage.open(BytesIO(data)).size
+        row, col, y_offset, x_offset = _anchor_position(image.anchor)
+        worksheet.insert_image(row, col, f"image{index}.{image.format.lower()}", {
+            'image_data': BytesIO(data),
+            'x_scale': image.width / original_width,
+            'y_scale': image.height / original_height,
+            'x_offset': x_offset,
+            'y_offset': y_offset,
+        })
+
+
+def _number_or_formula(value):
+    """Значение cfvo: число или формула"""
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _conditional_options(rule, formats):
+    """Правило условного форматирования openpyxl в параметрах conditional_format"""
+    if rule.type == 'colorScale':
+        cfvo, colors = rule.colorScale.cfvo, rule.colorScale.color
+        options = {'type': '2_color_scale' if len(cfvo) == 2 else '3_color_scale'}
+        for prefix, value, color in zip(('min', 'mid', 'max') if len(cfvo) == 3 else ('min', 'max'), cfvo, colors):
+            options[f'{prefix}_type'] = value.type
+            options[f'{prefix}_color'] = _color(color)
+            if value.val is not None:
+                options[f'{prefix}_value'] = _number_or_formula(value.val)
+        return options
+    
+    if rule.type == 'dataBar':
+        return {'type': 'data_bar', 'bar_color': _color(rule.dataBar.color),
+                'bar_only': rule.dataBar.showValue is False}
+    
+    cell_format = formats.differential_format(rule.dxf)
+    if rule.type == 'cellIs':
+        options = {'type': 'cell', 'criteria': CELL_IS_CRITERIA.get(rule.operator, '>'), 'format': cell_format}
+        if len(rule.formula) > 1:
+            options['minimum'], options['maximum'] = rule.formula[:2]
+        else:
+            options['value'] = rule.formula[0]
+        return options
+    if rule.type == 'top10':
+        options = {'type': 'bottom' if rule.bottom else 'top', 'value': rule.rank, 'format': cell_format}
+        if rule.percent:
+            options['criteria'] = '%'
+        return options
+    if rule.type == 'expression':
+        return {'type': 'formula', 'criteria': '=' + rule.formula[0], 'format': cell_format}
+    
+    print(f"Предупреждение: условное форматирование '{rule.type}' не поддерживается движком xlsxwriter")
+    return None
+
+
+def _add_conditional_formatting(ws, worksheet, formats):
+    for conditional_formatting in ws.conditional_formatting:
+        ranges = str(conditional_formatting.sqref).split()
+        for rule in conditional_formatting.rules:
+            options = _conditional_options(rule, formats)
+            if options is None:
+                continue
+            if len(ranges) > 1:
+                options['multi_range'] = ' '.join(ranges)
+            worksheet.conditional_format(ranges[0], options)
+
+
+def _add_table(worksheet, table, header_formats):
+    """
+    Таблица Excel на строке заголовков (вызывается, пока эта строка - текущая)
+    
+    xlsxwriter не создает таблицы в режиме constant_memory и запоминает каждую
+    ячейку диапазона для проверки пересечений. Поэтому таблица добавляется
+    на строке заголовков и одной строке данных, а затем получает полный диапазон.
+    """
+    min_col, min_row, max_col, max_row = range_boundaries(table.ref)
+    names = [column.name for column in table.tableColumns]
+    style = table.tableStyleInfo
+    options = {
+        'name': table.displayName,
+        'autofilter': table.autoFilter is not None,
+        'columns': [{'header': name} for name in names],
+    }
+    if style is not None:
+        options.update(style=style.name, first_column=bool(style.showFirstColumn),
+                       last_column=bool(style.showLastColumn), banded_rows=bool(style.showRowStripes),
+                       banded_columns=bool(style.showColumnStripes))
+    
+    constant_memory, worksheet.constant_memory = worksheet.constant_memory, False
+    try:
+        result = worksheet.add_table(min_row - 1, min_col - 1, min(max_row, min_row + 1) - 1, max_col - 1, options)
+    finally:
+        worksheet.constant_memory = constant_memory
+    if result != 0:
+        return
+    
+    xl_table = worksheet.tables[-1]
+    xl_table['range'] = xl_table['a_range'] = table.ref
+    if xl_table.get('autofilter'):
+        xl_table['autofilter'] = table.ref
+    
+    # Заголовки, записанные add_table вне режима constant_memory, хранят индекс общей строки:
+    # перезаписываем их строками текущей строки листа
+    for col_idx, (name, header_format) in enumerate(zip(names, header_formats), min_col - 1):
+        worksheet.write_string(min_row - 1, col_idx, name, header_format)
+
+
+def _write_worksheet(ws, worksheet, store, formats, epoch):
+    """Перенос листа openpyxl (и строк его хранилища) в лист xlsxwriter"""
+    for letter, dimensions in ws.column_dimensions.items():
+        if dimensions.width or dimensions.hidden or dimensions.outline_level:
+            first = column_index_from_string(letter)
+            last = max(first, dimensions.max or 0)
+            # Ширина в пикселях, как ее считает раскладка графиков (xlsxwriter иначе добавляет отступ)
+            pixels = column_width_emu(ws, first) // EMU_PER_PIXEL if dimensions.width else None
+            worksheet.set_column_pixels(first - 1, last - 1, pixels, None,
+                                        {'hidden': bool(dimensions.hidden), 'level': dimensions.outline_level or 0})
+    
+    # Высота и группировка строк openpyxl (группировка хранилища читается диапазонами при записи строк)
+    row_options = {
+        row: (dimensions.ht, dimensions.outline_level or 0, bool(dimensions.hidden))
+        for row, dimensions in ws.row_dimensions.items()
+        if dimensions.ht is not None or dimensions.outline_level or dimensions.hidden
+    }
+    
+    merges = {}
+    for merged in ws.merged_cells.ranges:
+        merges.setdefault(merged.min_row, []).append(merged)
+    tables = {}
+    for table in ws.tables.values():
+        _, min_row, _, _ = range_boundaries(table.ref)
+        tables.setdefault(min_row, []).append(table)
+    
+    # Ячейки openpyxl по строкам в порядке колонок
+    cells_by_row = {}
+    for (row, col_idx), cell in sorted(ws._cells.items()):
+        if not isinstance(cell, MergedCell):
+            cells_by_row.setdefault(row, []).append(cell)
+    
+    write_string, write_number = worksheet.write_string, worksheet.write_number
+    rows = cells_by_row.keys() | row_options.keys() | merges.keys() | tables.keys()
+    
+    # Строки хранилища (в том числе выгруженные на диск) и его группировка читаются потоком
+    for row, stored, outline in merge_store_rows(rows, store):
+        options = row_options.get(row)
+        if outline is not None:
+            height, row_level, row_hidden = options or (None, 0, False)
+            options = (height, max(row_level, outline[0]), row_hidden or outline[1])
+        if options is not None:
+            height, level, hidden = options
+            if worksheet.constant_memory and row not in cells_by_row and stored is None:
+                # В режиме constant_memory строка без ячеек записывается, только если
+                # она текущая при переходе к следующей строке
+                worksheet._write_single_row(row - 1)
+            worksheet.set_row(row - 1, height, None, {'level': level, 'hidden': hidden})
+        
+        cell_formats = {}
+        for cell in cells_by_row.get(row, ()):
+            cell_format = cell_formats[cell.column] = formats.cell_format(cell)
+            if cell.hyperlink is not None:
+                hyperlink = cell.hyperlink
+                url = f"internal:{hyperlink.location}" if hyperlink.location else hyperlink.target
+                worksheet.write_url(row - 1, cell.column - 1, url, cell_format,
+                                    None if cell.value is None else str(cell.value), hyperlink.tooltip)
+            else:
+                _write_value(worksheet, row - 1, cell.column - 1, cell.value, cell_format, epoch)
+        
+        if stored is not None:
+            first_column, values, styles = stored
+            if type(styles) is list:
+                # Стили по колонкам: у каждой ячейки своя пара стилей
+                for col_idx, (value, (number_style, other_style)) in enumerate(zip(values, styles), first_column - 1):
+                    style = number_style if isinstance(value, (int, float)) else other_style
+                    _write_value(worksheet, row - 1, col_idx, value, formats.named_format(style), epoch)
+            else:
+                number_format, other_format = formats.named_format(styles[0]), formats.named_format(styles[1])
+                for col_idx, value in enumerate(values, first_column - 1):
+                    value_type = type(value)
+                    # Частые типы пишутся напрямую, остальные - по общим правилам
+                    if value_type is str and value[:1] != '=' and value not in ERROR_CODES and \
+                            len(value) <= EXCEL_MAX_STRING_LENGTH:
+                        write_string(row - 1, col_idx, value, other_format)
+                    elif value_type is SharedString:
+                        _write_shared_string(worksheet, row - 1, col_idx, value, other_format)
+                    elif (value_type is int or value_type is float) and value - value == 0:
+                        write_number(row - 1, col_idx, value, number_format)
+                    else:
+                        cell_format = number_format if isinstance(value, (int, float)) else other_format
+                        _write_value(worksheet, row - 1, col_idx, value, cell_format, epoch)
+        
+        # Объединения и таблицы оформляются, пока их первая строка - текущая
+        for merged in merges.get(row, ()):
+            first_cell = ws._cells.get((merged.min_row, merged.min_col))
+            worksheet.merge_range(merged.min_row - 1, merged.min_col - 1, merged.max_row - 1, merged.max_col - 1,
+                                  None if first_cell is None else first_cell.value,
+                                  None if first_cell is None else cell_formats.get(merged.min_col))
+        for table in tables.get(row, ()):
+            min_col, _, max_col, _ = range_boundaries(table.ref)
+            _add_table(worksheet, table, [cell_formats.get(col_idx) for col_idx in range(min_col, max_col + 1)])
+    
+    _add_conditional_formatting(ws, worksheet, formats)
+    _insert_charts(formats.book, ws, worksheet)
+    _insert_images(ws, worksheet)
+    
+    if ws.freeze_panes:
+        worksheet.freeze_panes(ws.freeze_panes)
+    if ws.sheet_state != 'visible':
+        worksheet.hide()
+
+
+def save_workbook(workbook, stores, filename, constant_memory=True):
+    """
+    Сохранение книги openpyxl со строками хранилищ листов через xlsxwriter
+    
+    Args:
+        workbook: Книга openpyxl
+        stores: Словарь {лист: FastRowStore}
+        filename: Путь или файловый объект
+        constant_memory: Сбрасывать строки листа на диск по мере записи
+    """
+    book = xlsxwriter.Workbook(filename, {
+        'constant_memory': constant_memory,
+        'date_1904': workbook.epoch == CALENDAR_MAC_1904,
+    })
+    formats = _FormatCache(workbook, book)
+    
+    try:
+        active = workbook.active
+        for ws in workbook.worksheets:
+            worksheet = book.add_worksheet(ws.title, worksheet_class=_ExportWorksheet)
+            _write_worksheet(ws, worksheet, stores.get(ws), formats, workbook.epoch)
+            if ws is active:
+                worksheet.activate()
+    finally:
+        book.close()
+    return True